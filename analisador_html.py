@@ -0,0 +1,305 @@
+"""
+Leitura de páginas sem navegador: links, texto visível e JSON embutido.
+Usa só o html.parser da biblioteca padrão.
+"""
+import json
+import re
+import unicodedata
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+
+def normalizar_texto(s: str) -> str:
+    """Sem acentos, minúsculo e sem espaços nas pontas, para comparar nomes e textos da página."""
+    s = unicodedata.normalize("NFD", s or "")
+    return "".join(c for c in s if unicodedata.category(c) != "Mn").lower().strip()
+
+
+class _Coletor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []
+        self.scripts = []
+        self.textos = []
+        self._link_atual = None
+        self._script_atual = None
+        self._ignorar = 0
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {k: (v or "") for k, v in attrs}
+        if tag == "a":
+            self._link_atual = {"attrs": attrs, "texto": [], "img": None}
+            self.links.append(self._link_atual)
+        elif tag == "img" and self._link_atual is not None and self._link_atual["img"] is None:
+            self._link_atual["img"] = attrs
+        elif tag == "script":
+            self._script_atual = {"attrs": attrs, "conteudo": []}
+            self.scripts.append(self._script_atual)
+            self._ignorar += 1
+        elif tag in ("style", "noscript", "template"):
+            self._ignorar += 1
+
+    def handle_endtag(self, tag):
+        if tag == "a":
+            self._link_atual = None
+        elif tag == "script":
+            self._script_atual = None
+            self._ignorar = max(0, self._ignorar - 1)
+        elif tag in ("style", "noscript", "template"):
+            self._ignorar = max(0, self._ignorar - 1)
+
+    def handle_data(self, data):
+        if self._script_atual is not None:
+            self._script_atual["conteudo"].append(data)
+            return
+        if self._ignorar:
+            return
+        if self._link_atual is not None:
+            self._link_atual["texto"].append(data)
+        if data.strip():
+            self.textos.append(data.strip())
+
+
+def analisar(html: str) -> _Coletor:
+    coletor = _Coletor()
+    coletor.feed(html or "")
+    coletor.close()
+    return coletor
+
+def links(html: str, base_url: str) -> list:
+    """
+    Todos os <a href> da página, com href absoluto:
+    [{"href", "classes", "texto", "attrs", "img"}] (img: atributos do
+    primeiro <img> dentro do link, ou None).
+    """
+    resultado = []
+    for link in analisar(html).links:
+        href = link["attrs"].get("href")
+        if not href or href.startswith(("#", "javascript:", "mailto:")):
+            continue
+        resultado.append({
+            "href": urljoin(base_url, href.strip()),
+            "classes": link["attrs"].get("class", "").split(),
+            "texto": " ".join(" ".join(link["texto"]).split()),
+            "attrs": link["attrs"],
+            "img": link["img"],
+        })
+    return resultado
+
+def texto(html: str) -> str:
+    """Texto visível da página, um bloco por linha (sem scripts e estilos)."""
+    return "\n".join(analisar(html).textos)
+
+def jsons_embutidos(html: str) -> list:
+    """Conteúdo de <script type="application/json"> e __NEXT_DATA__ já decodificado."""
+    dados = []
+    for script in analisar(html).scripts:
+        tipo = script["attrs"].get("type", "")
+        if "json" not in tipo and script["attrs"].get("id") != "__NEXT_DATA__":
+            continue
+        try:
+            dados.append(json.loads("".join(script["conteudo"])))
+        except ValueError:
+            continue
+    return dados
+
+class _TextosDaClasse(HTMLParser):
+    def __init__(self, classe: str):
+        super().__init__(convert_charrefs=True)
+        self.classe = classe
+        self.textos = []
+        self._tag = None
+        self._profundidade = 0
+        self._atual = []
+
+    def handle_starttag(self, tag, attrs):
+        if self._tag is not None:
+            if tag == self._tag:
+                self._profundidade += 1
+            return
+        if self.classe in (dict(attrs).get("class") or "").split():
+            self._tag, self._profundidade, self._atual = tag, 1, []
+
+    def handle_endtag(self, tag):
+        if self._tag is None or tag != self._tag:
+            return
+        self._profundidade -= 1
+        if not self._profundidade:
+            self.textos.append(" ".join(" ".join(self._atual).split()))
+            self._tag = None
+
+    def handle_data(self, data):
+        if self._tag is not None:
+            self._atual.append(data)
+
+
+def textos_da_classe(html: str, classe: str) -> list:
+    """Texto de cada elemento que tem a classe CSS `classe`, na ordem da página."""
+    coletor = _TextosDaClasse(classe)
+    coletor.feed(html or "")
+    coletor.close()
+    return coletor.textos
+
+class _Cartoes(HTMLParser):
+    def __init__(self, atributo: str, valor: str):
+        super().__init__(convert_charrefs=True)
+        self.atributo = atributo
+        self.valor = valor
+        self.cartoes = []
+        self._tag = None
+        self._profundidade = 0
+        self._no_titulo = 0
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {k: (v or "") for k, v in attrs}
+        if self._tag is None:
+            if attrs.get(self.atributo) == self.valor:
+                self._tag, self._profundidade = tag, 1
+                self.cartoes.append({"titulo": [], "links": []})
+            return
+        if tag == self._tag:
+            self._profundidade += 1
+        if tag == "h1":
+            self._no_titulo += 1
+        elif tag == "a" and attrs.get("href"):
+            self.cartoes[-1]["links"].append(attrs["href"])
+
+    def handle_endtag(self, tag):
+        if self._tag is None:
+            return
+        if tag == "h1":
+            self._no_titulo = max(0, self._no_titulo - 1)
+        if tag == self._tag:
+            self._profundidade -= 1
+            if not self._profundidade:
+                self._tag, self._no_titulo = None, 0
+
+    def handle_data(self, data):
+        if self._no_titulo:
+            self.cartoes[-1]["titulo"].append(data)
+
+
+def cartoes(html: str, base_url: str, atributo: str, valor: str) -> list:
+    """
+    Elementos com atributo=valor (ex.: data-testid="store-card"), na ordem da
+    página: [{"titulo": texto do <h1>, "links": [hrefs absolutos]}].
+    """
+    coletor = _Cartoes(atributo, valor)
+    coletor.feed(html or "")
+    coletor.close()
+    return [{"titulo": " ".join("".join(c["titulo"]).split()),
+             "links": [urljoin(base_url, h.strip()) for h in c["links"]]} for c in coletor.cartoes]
+
+# Tags que fecham um <p> aberto, como no parser do navegador
+_FECHAM_P = {"address", "article", "aside", "blockquote", "div", "dl", "fieldset", "footer", "form",
+             "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "main", "nav", "ol", "p", "pre",
+             "section", "table", "ul"}
+
+class _TextosDasTags(HTMLParser):
+    def __init__(self, tags):
+        super().__init__(convert_charrefs=True)
+        self.tags = set(tags)
+        self.elementos = []
+        self._abertos = []
+        self._divs = []
+        self._ignorar = 0
+
+    def _fechar(self, tag):
+        for i in range(len(self._abertos) - 1, -1, -1):
+            if self._abertos[i]["tag"] == tag:
+                del self._abertos[i:]
+                return
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _FECHAM_P:
+            self._fechar("p")
+        if tag == "div":
+            self._divs.append(dict(attrs).get("class") or "")
+        elif tag == "br":
+            self.handle_data("\n")
+        elif tag in ("script", "style", "noscript", "template"):
+            self._ignorar += 1
+        if tag in self.tags:
+            elemento = {"tag": tag, "partes": [], "dentro_de": list(self._divs)}
+            self.elementos.append(elemento)
+            self._abertos.append(elemento)
+
+    def handle_endtag(self, tag):
+        if tag == "div":
+            self._fechar("p")
+            if self._divs:
+                self._divs.pop()
+        elif tag in ("script", "style", "noscript", "template"):
+            self._ignorar = max(0, self._ignorar - 1)
+        self._fechar(tag)
+
+    def handle_data(self, data):
+        if not self._ignorar:
+            for elemento in self._abertos:
+                elemento["partes"].append(data)
+
+
+def textos_das_tags(html: str, tags) -> list:
+    """
+    Texto de cada elemento com uma das `tags`, na ordem da página, juntando
+    os filhos como o .text do Selenium: [{"tag", "texto", "dentro_de"}]
+    (dentro_de: o atributo class de cada <div> que contém o elemento).
+    """
+    coletor = _TextosDasTags(tags)
+    coletor.feed(html or "")
+    coletor.close()
+    resultado = []
+    for elemento in coletor.elementos:
+        linhas = (" ".join(l.split()) for l in "".join(elemento["partes"]).split("\n"))
+        resultado.append({"tag": elemento["tag"], "texto": "\n".join(l for l in linhas if l),
+                          "dentro_de": elemento["dentro_de"]})
+    return resultado
+
+_EXTENSAO_IMAGEM = re.compile(r"\.(?:jpe?g|png|webp|gif|avif)(?:[?#]|$)", re.I)
+
+# Atributos em que galerias e lightboxes guardam a imagem original
+_ATRIBUTOS_TAMANHO_CHEIO = ("data-full", "data-full-url", "data-large_image", "data-large-file",
+                            "data-orig-file", "data-zoom-image", "data-original")
+
+def maior_do_srcset(srcset: str) -> str:
+    """URL de maior largura (ou densidade) de um srcset; "" se vazio."""
+    melhor, maior = "", -1.0
+    for candidato in (srcset or "").split(","):
+        partes = candidato.split()
+        if not partes:
+            continue
+        descritor = partes[1] if len(partes) > 1 else "1x"
+        try:
+            valor = float(descritor[:-1])
+        except ValueError:
+            continue
+        if valor > maior:
+            melhor, maior = partes[0], valor
+    return melhor
+
+def imagem_em_tamanho_cheio(attrs: dict, base_url: str, img: dict = None) -> str:
+    """
+    URL da imagem em tamanho cheio de um link de galeria: o href, os
+    atributos data-* de lightbox e o maior item do srcset, do link e do
+    <img> dentro dele (`img`), antes do src (que costuma ser a miniatura).
+    """
+    img = img or {}
+    candidatos = [attrs.get("href", "")]
+    for origem in (attrs, img):
+        candidatos += [origem.get(a, "") for a in _ATRIBUTOS_TAMANHO_CHEIO]
+        candidatos += [maior_do_srcset(origem.get("srcset", "") or origem.get("data-srcset", ""))]
+    candidatos += [img.get("data-src", ""), img.get("src", "")]
+    for candidato in candidatos:
+        candidato = (candidato or "").strip()
+        if candidato and _EXTENSAO_IMAGEM.search(candidato):
+            return urljoin(base_url, candidato)
+    return None
+
+def urls_no_texto(conteudo: str, padrao: str) -> list:
+    """URLs que contenham `padrao` (regex) em qualquer lugar do HTML/JSON, sem repetir."""
+    vistos = []
+    for m in re.finditer(r"""[^"'\s<>()]*""" + padrao + r"""[^"'\s<>()&]*""", conteudo or ""):
+        url = m.group(0).replace("\\/", "/")
+        if url not in vistos:
+            vistos.append(url)
+    return vistos
@@ -0,0 +1,99 @@
+"""
+Armazém de encartes endereçado por conteúdo.
+
+Cada arquivo é gravado uma única vez em ARMAZEM_DIR/<sha256[:2]>/<sha256><ext>;
+as pastas por varejista/loja recebem hardlinks para esse blob. O mesmo jpeg
+de duas lojas (ou de duas semanas) ocupa espaço e escrita em disco uma vez só.
+Com ARMAZEM=0 os arquivos voltam a ser gravados diretamente no destino.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import uuid
+from pathlib import Path
+
+from pastas import BASE_OUTPUT
+
+ARMAZEM_DIR = Path(os.environ.get("ARMAZEM_DIR", str(BASE_OUTPUT / ".armazem"))).resolve()
+ARMAZEM_ATIVO = os.environ.get("ARMAZEM", "1") != "0"
+
+TAMANHO_BLOCO = 1024 * 1024
+
+
+def hash_arquivo(caminho: Path) -> str:
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(TAMANHO_BLOCO), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+def caminho_blob(digest: str, extensao: str = "") -> Path:
+    return ARMAZEM_DIR / digest[:2] / f"{digest}{extensao.lower()}"
+
+def vincular(blob: Path, destino: Path):
+    """Faz `destino` apontar para `blob` (hardlink, ou cópia se o link não for possível)."""
+    destino = Path(destino)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        if destino.exists() and os.path.samefile(blob, destino):
+            return
+    except OSError:
+        pass
+
+    # Cria o link com nome temporário e renomeia por cima, para o destino nunca ficar pela metade.
+    # O nome é único por chamada: threads do mesmo processo podem ligar o mesmo destino.
+    temporario = destino.with_name(f".{destino.name}.{uuid.uuid4().hex}.link")
+    try:
+        try:
+            os.link(blob, temporario)
+        except OSError:
+            # Outro sistema de arquivos (ARMAZEM_DIR fora do OUTPUT_DIR) ou FS sem hardlink
+            shutil.copyfile(blob, temporario)
+        os.replace(temporario, destino)
+    finally:
+        temporario.unlink(missing_ok=True)
+
+def publicar_arquivo(origem: Path, destino: Path) -> Path:
+    """
+    Move `origem` (um arquivo completo, ex.: o .part de um download) para o
+    armazém e liga `destino` a ele. Se o conteúdo já existir, `origem` é
+    descartado e nada novo é gravado.
+    """
+    origem, destino = Path(origem), Path(destino)
+    if not ARMAZEM_ATIVO:
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(origem, destino)
+        return destino
+
+    blob = caminho_blob(hash_arquivo(origem), destino.suffix)
+    if blob.exists():
+        origem.unlink()
+    else:
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.replace(origem, blob)
+        except OSError:
+            shutil.move(str(origem), str(blob))
+    vincular(blob, destino)
+    return blob
+
+def publicar_bytes(dados: bytes, destino: Path) -> Path:
+    """Como publicar_arquivo, para conteúdo que está em memória (screenshots)."""
+    destino = Path(destino)
+    if not ARMAZEM_ATIVO:
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        destino.write_bytes(dados)
+        return destino
+
+    blob = caminho_blob(hashlib.sha256(dados).hexdigest(), destino.suffix)
+    if not blob.exists():
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        fd, temporario = tempfile.mkstemp(dir=blob.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(dados)
+        # mkstemp cria com 0600; os encartes precisam das permissões normais de arquivo
+        os.chmod(temporario, 0o644)
+        os.replace(temporario, blob)
+    vincular(blob, destino)
+    return blob
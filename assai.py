@@ -1,13 +1,22 @@
-import time
-import requests
-from pathlib import Path
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait, Select
+from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from navegador import criar_driver
+from downloads import FilaDownloads
+from catalogo import Catalogo, selecionar_por_catalogo
+from similaridade import IndicePerceptual, indexar_arquivos
+from manifesto import Manifesto
+from pastas import BASE_OUTPUT as OUTPUT_DIR
+from checkpoint import Checkpoint
+from esperas import (aguardar_dom_estavel, aguardar_elemento_parado, aguardar_rede_ociosa,
+                     resumo as resumo_esperas)
+import telemetria
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import json
 import re
 import os
+import threading
 
 
 LOJAS_PARA_PROCESSAR = [
@@ -35,18 +44,37 @@ LOJAS_PARA_PROCESSAR = [
     {"estado": "Bahia", "loja": "Salvador Paralela", "regiao": "Capital"},
 ]
 
-BASE_URL = "https://www.assai.com.br/ofertas"
+BASE_URL = os.getenv("ASSAI_BASE_URL", "https://www.assai.com.br/ofertas")
 
-OUTPUT_DIR = Path(os.getenv("OUTPUT_DIR", "/github/workspace/encartes"))
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 print(f"[assai.py] Pasta de saída: {OUTPUT_DIR}")
 
-options = webdriver.ChromeOptions()
-options.add_argument("--start-maximized")
-driver = webdriver.Chrome(options=options)
-wait = WebDriverWait(driver, 30)
+# Número de sessões de navegador independentes. Cada sessão tem seus próprios
+# cookies e seleção de loja e processa uma fatia de LOJAS_PARA_PROCESSAR.
+ASSAI_SESSOES = max(1, int(os.getenv("ASSAI_SESSOES", "1")))
 
-def encontrar_data():
+# Valores das opções de estado/região/loja já encontradas em execuções anteriores
+CATALOGO = Catalogo("assai")
+
+# Validade e URLs da última execução bem-sucedida de cada loja. As lojas
+# processadas ficam em LOJAS_CONCLUIDAS até a fila confirmar os downloads.
+MANIFESTO = Manifesto("assai")
+LOJAS_CONCLUIDAS = []
+
+# Lojas e jornais já concluídos por uma execução interrompida
+CHECKPOINT = Checkpoint("assai")
+
+# Spans por fase (telemetria.py), gravados no fim da execução
+telemetria.iniciar("assai")
+
+# Jornais vistos nesta execução: URLs das páginas -> [(pasta da loja, número do jornal)]
+JORNAIS = {}
+_LOCK_JORNAIS = threading.Lock()
+
+def iniciar_driver():
+    return criar_driver("assai", headless=False)
+
+def encontrar_data(driver):
     try:
         enc_data = WebDriverWait(driver, 10).until(
             EC.presence_of_all_elements_located((By.XPATH, '//div[contains(@class, "ofertas-tab-validade")]'))
@@ -61,160 +89,299 @@ def encontrar_data():
             return nome_pasta
     return "sem_data"
 
-def aguardar_elemento(seletor, by=By.CSS_SELECTOR, timeout=15):
+def aguardar_elemento(driver, seletor, by=By.CSS_SELECTOR, timeout=15):
     return WebDriverWait(driver, timeout).until(EC.presence_of_element_located((by, seletor)))
 
-def clicar_elemento(seletor, by=By.CSS_SELECTOR):
-    element = wait.until(EC.element_to_be_clickable((by, seletor)))
+def clicar_elemento(driver, seletor, by=By.CSS_SELECTOR):
+    element = WebDriverWait(driver, 30).until(EC.element_to_be_clickable((by, seletor)))
     driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", element)
-    time.sleep(1)
+    aguardar_elemento_parado(driver, element)
     element.click()
 
-def scroll_down_and_up():
+def scroll_down_and_up(driver):
     driver.execute_script("window.scrollTo(0, document.body.scrollHeight/3);")
-    time.sleep(1)
+    aguardar_dom_estavel(driver, quieto=0.3)
     driver.execute_script("window.scrollTo(0, 1);")
-    time.sleep(1)
+    aguardar_dom_estavel(driver, quieto=0.3)
+
+# Links de download das páginas no slider do jornal aberto
+XPATH_PAGINAS = "//a[contains(@class, 'download') and contains(@href, '.jpeg')]"
+
+def abrir_jornal(driver, i):
+    clicar_elemento(driver, f"//button[contains(., 'Jornal de Ofertas {i}')]", By.XPATH)
+    aguardar_rede_ociosa(driver)
+    aguardar_elemento(driver, "div.ofertas-slider", timeout=30)
+
+def paginas_no_slider(driver) -> list:
+    """Links das páginas já no slider do jornal aberto."""
+    return [u for u in (a.get_attribute("href") for a in driver.find_elements(By.XPATH, XPATH_PAGINAS)) if u]
+
+def amostra_dos_jornais(driver) -> list:
+    """
+    Páginas já no slider de cada jornal da loja (até o 5º, como os
+    downloads), para o manifesto notar mudança em qualquer um deles.
+    Abre cada jornal e volta ao primeiro.
+    """
+    amostra = paginas_no_slider(driver)
+    jornais = min(5, len(driver.find_elements(By.XPATH, "//button[contains(., 'Jornal de Ofertas')]")))
+    if jornais <= 1:
+        return amostra
+    for i in range(2, jornais + 1):
+        try:
+            abrir_jornal(driver, i)
+            amostra += paginas_no_slider(driver)
+        except Exception:
+            print(f" Jornal {i} indisponível na amostra.")
+    abrir_jornal(driver, 1)
+    return amostra
 
-def baixar_encartes(jornal_num, download_dir):
+def baixar_encartes(driver, jornal_num, download_dir, fila):
+    """Envia para a fila as páginas do jornal aberto. Devolve os futuros dos downloads."""
+    wait = WebDriverWait(driver, 30)
     page_num = 1
     downloaded_urls = set()
+    futuros = []
     while True:
-        print(f"  Baixando página {page_num} do jornal {jornal_num}...")
-        links_download = wait.until(
-            EC.presence_of_all_elements_located(
-                (By.XPATH, "//a[contains(@class, 'download') and contains(@href, '.jpeg')]")
-            )
-        )
-        current_page_urls = []
-        for link in links_download:
-            url = link.get_attribute("href")
-            if url and url not in downloaded_urls:
-                current_page_urls.append(url)
-                downloaded_urls.add(url)
-
-        if not current_page_urls and page_num > 1:
-            break
-
-        for idx, url in enumerate(current_page_urls, start=1):
-            response = requests.get(url)
-            if response.status_code == 200:
+        with telemetria.span("pagina", pagina=page_num):
+            print(f"  Baixando página {page_num} do jornal {jornal_num}...")
+            with telemetria.span("descoberta"):
+                links_download = wait.until(EC.presence_of_all_elements_located((By.XPATH, XPATH_PAGINAS)))
+                current_page_urls = []
+                for link in links_download:
+                    url = link.get_attribute("href")
+                    if url and url not in downloaded_urls:
+                        current_page_urls.append(url)
+                        downloaded_urls.add(url)
+
+            if not current_page_urls and page_num > 1:
+                break
+
+            # Os downloads seguem em segundo plano enquanto o navegador avança o slider
+            for idx, url in enumerate(current_page_urls, start=1):
                 # Usa a página do jornal e o índice da página atual para nomear o arquivo
-                file_path = download_dir / f"encarte_jornal_{jornal_num}_pagina_{page_num}_{idx}_{int(time.time())}.jpg"
-                with open(file_path, "wb") as f:
-                    f.write(response.content)
-                print(f"  Encarte {file_path.name} salvo.")
-            else:
-                print(f"Falha no download: {url} (Status: {response.status_code})")
+                # (nome estável entre execuções: o conteúdo repetido vira hardlink no armazém)
+                file_path = download_dir / f"encarte_jornal_{jornal_num}_pagina_{page_num}_{idx}.jpg"
+                futuros.append(fila.enviar(url, file_path))
 
-        try:
-            next_button = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "button.slick-next")))
-            driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", next_button)
-            time.sleep(1)
-            next_button.click()
-            time.sleep(2)
-            page_num += 1
-        except:
-            break
-
-def select_by_visible_text_contains(select_el, target_text, timeout=10):
-    WebDriverWait(driver, timeout).until(lambda d: len(select_el.find_elements(By.TAG_NAME, "option")) > 0)
-    sel = Select(select_el)
-    opts = select_el.find_elements(By.TAG_NAME, "option")
-    alvo_norm = target_text.strip().lower()
-    for o in opts:
-        if alvo_norm in o.text.strip().lower():
-            sel.select_by_visible_text(o.text)
-            return True
-    return False
-
-# --- Lógica Principal (Ajustada para iterar sobre a nova lista) ---
-try:
-    driver.get(BASE_URL)
-    time.sleep(2)
+            try:
+                next_button = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "button.slick-next")))
+                driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", next_button)
+                aguardar_elemento_parado(driver, next_button)
+                next_button.click()
+                # Espera a transição do slider terminar
+                aguardar_dom_estavel(driver, quieto=0.3, nome="slider")
+                page_num += 1
+            except:
+                break
 
-    try:
-        clicar_elemento("button.ot-close-icon")
-    except:
-        pass
+    registrar_jornal(download_dir.name, jornal_num, downloaded_urls)
+    return futuros
+
+def registrar_jornal(pasta_loja: str, jornal_num: int, urls):
+    if not urls:
+        return
+    with _LOCK_JORNAIS:
+        JORNAIS.setdefault(tuple(sorted(urls)), []).append((pasta_loja, jornal_num))
+
+def relatorio_jornais():
+    """Lista (e grava em jornais_compartilhados.json) os jornais que mais de uma loja recebeu."""
+    compartilhados = [
+        {"paginas": len(urls), "lojas": [{"pasta": pasta, "jornal": num} for pasta, num in sorted(lojas)]}
+        for urls, lojas in JORNAIS.items() if len(lojas) > 1
+    ]
+    if not compartilhados:
+        return
+    print(f"\nJornais compartilhados: {len(compartilhados)}")
+    for jornal in compartilhados:
+        lojas = ", ".join(f"{l['pasta']} (jornal {l['jornal']})" for l in jornal["lojas"])
+        print(f"  {jornal['paginas']} página(s): {lojas}")
+    (OUTPUT_DIR / "jornais_compartilhados.json").write_text(
+        json.dumps(compartilhados, ensure_ascii=False, indent=1), encoding="utf-8")
 
-    clicar_elemento("a.seletor-loja")
-    time.sleep(1)
+def chave_loja(item) -> str:
+    return f"{item['estado']} | {item['regiao'] or ''} | {item['loja']}"
 
-    # Iterar sobre a nova lista de dicionários
-    for item in LOJAS_PARA_PROCESSAR:
-        estado = item["estado"]
-        loja = item["loja"]
-        regiao = item["regiao"]
-        
-        print(f"\n--- Processando: {estado} - {loja} (Região: {regiao or 'N/A'}) ---")
+def voltar_ao_seletor(driver):
+    """Recarrega a página e reabre o seletor de loja, depois de um erro no meio de uma loja."""
+    with telemetria.span("navegar", url=BASE_URL):
+        driver.get(BASE_URL)
+    aguardar_rede_ociosa(driver)
+    clicar_elemento(driver, "a.seletor-loja")
+    aguardar_dom_estavel(driver)
 
+def processar_loja(driver, item, fila):
+    estado = item["estado"]
+    loja = item["loja"]
+    regiao = item["regiao"]
+    chave = chave_loja(item)
+    
+    print(f"\n--- Processando: {estado} - {loja} (Região: {regiao or 'N/A'}) ---")
+
+    with telemetria.span("selecionar_loja"):
         # 1. Selecionar Estado
-        estado_select = aguardar_elemento("select.estado")
-        Select(estado_select).select_by_visible_text(estado)
-        time.sleep(1)
+        estado_select = aguardar_elemento(driver, "select.estado")
+        if not selecionar_por_catalogo(driver, estado_select, CATALOGO, ("estado", estado), estado):
+            raise RuntimeError(f"Não encontrei o estado '{estado}'")
+        aguardar_dom_estavel(driver)
 
         # 2. Selecionar Região (se aplicável)
         if regiao:
             try:
                 # O seletor de região deve aparecer se o estado o exigir (ex: Bahia)
-                regiao_select_element = aguardar_elemento("select.regiao", timeout=15)
-                Select(regiao_select_element).select_by_visible_text(regiao)
+                regiao_select_element = aguardar_elemento(driver, "select.regiao", timeout=15)
+                if not selecionar_por_catalogo(driver, regiao_select_element, CATALOGO, ("regiao", estado, regiao), regiao):
+                    raise RuntimeError(f"Região '{regiao}' não encontrada")
                 # Espera as lojas da região carregarem
-                aguardar_elemento("select.loja option[value]", timeout=20)
-                time.sleep(0.5)
+                aguardar_elemento(driver, "select.loja option[value]", timeout=20)
+                aguardar_dom_estavel(driver)
             except Exception as e:
                 # Loga o erro, mas continua, caso a região não seja realmente um select
                 print(f" Não foi possível selecionar a região '{regiao}' para {estado}. Tentando continuar...")
 
         # 3. Selecionar Loja
-        loja_select = aguardar_elemento("select.loja", timeout=20)
-        # Tenta seleção exata; se falhar, usa "contains" (mais robusto)
-        try:
-            Select(loja_select).select_by_visible_text(loja)
-        except:
-            ok = select_by_visible_text_contains(loja_select, loja)
-            if not ok:
-                raise RuntimeError(f"Não encontrei a loja '{loja}' no estado {estado}")
+        loja_select = aguardar_elemento(driver, "select.loja", timeout=20)
+        # Usa o valor do catálogo; na falta, texto exato ou "contains" (mais robusto)
+        if not selecionar_por_catalogo(driver, loja_select, CATALOGO, ("loja", estado, regiao, loja), loja):
+            raise RuntimeError(f"Não encontrei a loja '{loja}' no estado {estado}")
 
-        time.sleep(0.8)
+        aguardar_dom_estavel(driver)
 
         # 4. Confirmar Seleção
-        clicar_elemento("button.confirmar")
-        time.sleep(1)
+        clicar_elemento(driver, "button.confirmar")
+        aguardar_rede_ociosa(driver)
 
-        # 5. Processar Encartes
-        aguardar_elemento("div.ofertas-slider", timeout=30)
-        data_nome = encontrar_data()
+    # 5. Processar Encartes
+    with telemetria.span("descoberta"):
+        aguardar_elemento(driver, "div.ofertas-slider", timeout=30)
+        data_nome = encontrar_data(driver)
 
         nome_loja = loja.replace(' ', '_').replace('(', '').replace(')', '')
         download_dir = OUTPUT_DIR / f"encartes_{nome_loja}_{data_nome}"
-        os.makedirs(download_dir, exist_ok=True)
 
-        # Baixa o primeiro jornal
-        scroll_down_and_up()
-        baixar_encartes(1, download_dir)
+        # Validade + páginas de todos os jornais já no slider: se nada mudou, a loja é pulada.
+        # Sem execução anterior para comparar, a amostra sai dos próprios downloads abaixo,
+        # sem abrir cada jornal duas vezes.
+        amostra = amostra_dos_jornais(driver) if MANIFESTO.tem_registro(chave) else None
+
+    if amostra is not None and MANIFESTO.inalterado(chave, data_nome, amostra):
+        print(f" Validade e encartes de {loja} inalterados desde a última execução; pulando.")
+        CHECKPOINT.marcar(chave)
+        clicar_elemento(driver, "a.seletor-loja")
+        aguardar_dom_estavel(driver)
+        return
+    os.makedirs(download_dir, exist_ok=True)
+
+    # Baixa o primeiro jornal (a não ser que a execução interrompida já o tenha concluído)
+    futuros = []
+    vistas = []
+    if CHECKPOINT.concluido(f"{chave} | jornal 1"):
+        print("  Jornal 1 já concluído na execução anterior.")
+    else:
+        with telemetria.span("jornal", jornal=1):
+            vistas += paginas_no_slider(driver)
+            scroll_down_and_up(driver)
+            futuros_jornal = baixar_encartes(driver, 1, download_dir, fila)
+        CHECKPOINT.marcar_quando_concluir(f"{chave} | jornal 1", futuros_jornal)
+        futuros += futuros_jornal
 
-        # Baixa os jornais subsequentes
-        for i in range(2, 6):
+    # Baixa os jornais subsequentes
+    for i in range(2, 6):
+        if CHECKPOINT.concluido(f"{chave} | jornal {i}"):
+            print(f"  Jornal {i} já concluído na execução anterior.")
+            continue
+        try:
+            with telemetria.span("jornal", jornal=i):
+                abrir_jornal(driver, i)
+                vistas += paginas_no_slider(driver)
+                scroll_down_and_up(driver)
+                futuros_jornal = baixar_encartes(driver, i, download_dir, fila)
+            CHECKPOINT.marcar_quando_concluir(f"{chave} | jornal {i}", futuros_jornal)
+            futuros += futuros_jornal
+        except Exception as e:
+            print(f" Jornal {i} indisponível para {loja}. Tentando próximo.")
+
+    # A loja conta como concluída quando os downloads dela terminarem
+    CHECKPOINT.marcar_quando_concluir(chave, futuros)
+    with _LOCK_JORNAIS:
+        LOJAS_CONCLUIDAS.append((chave, data_nome, vistas if amostra is None else amostra, futuros))
+
+    # 6. Voltar para o Seletor de Loja para a próxima iteração
+    clicar_elemento(driver, "a.seletor-loja")
+    aguardar_dom_estavel(driver)
+
+def processar_lojas(lojas, fila, sessao=1):
+    """Processa uma lista de lojas numa sessão de navegador própria."""
+    driver = iniciar_driver()
+    try:
+        with telemetria.span("navegar", url=BASE_URL, sessao=sessao):
+            driver.get(BASE_URL)
+        aguardar_rede_ociosa(driver)
+
+        try:
+            clicar_elemento(driver, "button.ot-close-icon")
+        except:
+            pass
+
+        clicar_elemento(driver, "a.seletor-loja")
+        aguardar_dom_estavel(driver)
+
+        for item in lojas:
+            if CHECKPOINT.concluido(chave_loja(item)):
+                print(f"\n--- {item['loja']}: concluída na execução anterior; pulando. ---")
+                continue
+            # Uma loja com problema não derruba as outras: registra a falha e segue
             try:
-                clicar_elemento(f"//button[contains(., 'Jornal de Ofertas {i}')]", By.XPATH)
-                time.sleep(3)
-                aguardar_elemento("div.ofertas-slider", timeout=30)
-                scroll_down_and_up()
-                baixar_encartes(i, download_dir)
+                with telemetria.span("loja", estado=item["estado"], loja=item["loja"], sessao=sessao):
+                    processar_loja(driver, item, fila)
             except Exception as e:
-                print(f" Jornal {i} indisponível para {loja}. Tentando próximo.")
-        
-        # 6. Voltar para o Seletor de Loja para a próxima iteração
-        clicar_elemento("a.seletor-loja")
-        time.sleep(2)
+                print(f"\nErro na loja {item['loja']} (sessão {sessao}): {e}")
+                nome_loja = item["loja"].replace(' ', '_').replace('(', '').replace(')', '')
+                driver.save_screenshot(str(OUTPUT_DIR / f"erro_{nome_loja}.png"))
+                CHECKPOINT.marcar(chave_loja(item), ok=False, erro=str(e))
+                voltar_ao_seletor(driver)
 
-    print("\nTodos os encartes foram processados!")
+    except Exception as e:
+        print(f"\nErro crítico (sessão {sessao}): {str(e)}")
+        nome_erro = "erro_encartes.png" if ASSAI_SESSOES == 1 else f"erro_encartes_sessao{sessao}.png"
+        driver.save_screenshot(str(OUTPUT_DIR / nome_erro))
+
+    finally:
+        driver.quit()
 
-except Exception as e:
-    print(f"\nErro crítico: {str(e)}")
-    driver.save_screenshot(str(OUTPUT_DIR / "erro_encartes.png"))
+def main():
+    fila = FilaDownloads(pular_existentes=CHECKPOINT.retomando)
+    sessoes = min(ASSAI_SESSOES, len(LOJAS_PARA_PROCESSAR))
+    try:
+        if sessoes <= 1:
+            processar_lojas(LOJAS_PARA_PROCESSAR, fila)
+        else:
+            # Cada sessão fica com uma fatia intercalada das lojas; as pastas
+            # encartes_<loja>_<data> continuam as mesmas da execução sequencial.
+            fatias = [LOJAS_PARA_PROCESSAR[i::sessoes] for i in range(sessoes)]
+            print(f"Dividindo {len(LOJAS_PARA_PROCESSAR)} lojas em {sessoes} sessões.")
+            with ThreadPoolExecutor(max_workers=sessoes) as pool:
+                for futuro in [pool.submit(processar_lojas, fatia, fila, n) for n, fatia in enumerate(fatias, start=1)]:
+                    futuro.result()
+    finally:
+        # Só termina depois que a fila de downloads esvaziar
+        fila.aguardar()
+        relatorio_jornais()
+        # Só entra no manifesto a loja cujos downloads terminaram todos
+        for chave, validade, amostra, futuros in LOJAS_CONCLUIDAS:
+            arquivos = [f.result() for f in futuros]
+            if arquivos and all(arquivos):
+                MANIFESTO.registrar(chave, validade, amostra, arquivos)
+        MANIFESTO.salvar()
+        CHECKPOINT.finalizar([chave_loja(item) for item in LOJAS_PARA_PROCESSAR])
+        # Lojas com o mesmo jornal aparecem no relatório de páginas repetidas
+        indice = IndicePerceptual("assai")
+        indexar_arquivos(indice, [destino for _, destino in fila.concluidos])
+        indice.relatorio()
+        indice.salvar()
+        CATALOGO.salvar()
+        resumo_esperas()
+
+    print("\nTodos os encartes foram processados!")
 
-finally:
-    driver.quit()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,23 @@
 # -*- coding: utf-8 -*-
 import os
 import re
-import time
-import requests
-import unicodedata
-from pathlib import Path
-from selenium import webdriver
+import json
+from urllib.parse import urljoin
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
+from navegador import criar_driver
+from downloads import motor_compartilhado, nova_sessao
+import analisador_html
+from analisador_html import normalizar_texto
+from catalogo import Catalogo, selecionar_por_catalogo
+from manifesto import Manifesto
+from checkpoint import Checkpoint
+from esperas import (aguardar_dom_estavel, aguardar_elemento_parado, aguardar_rede_ociosa,
+                     resumo as resumo_esperas)
+import telemetria
+from pastas import BASE_OUTPUT
 
-BASE_OUTPUT = Path(os.environ.get("OUTPUT_DIR", str(Path.cwd() / "Encartes"))).resolve()
 ENCARTE_DIR = BASE_OUTPUT / "Atacadao"
 ENCARTE_DIR.mkdir(parents=True, exist_ok=True)
 print(f"[atacadao.py] Pasta de saída: {ENCARTE_DIR}")
@@ -30,18 +37,31 @@ LOJAS_ESTADOS = {
     "PB": [("João Pessoa", "João Pessoa Bessa")]
 }
 
-BASE_URL = "https://www.atacadao.com.br/institucional/nossas-lojas"
+BASE_URL = os.environ.get("ATACADAO_BASE_URL", "https://www.atacadao.com.br/institucional/nossas-lojas")
 
+# "auto": resolve loja -> encartes por HTTP e só abre o Chrome para as lojas que não resolver.
+# "navegador": sempre usa o localizador de lojas no Chrome, como antes.
+ATACADAO_MODO = os.environ.get("ATACADAO_MODO", "auto")
+
+PADRAO_FLYER = r"Flyer/\?id="
+
+# Valores de cidade e URLs das páginas de loja encontradas em execuções anteriores
+CATALOGO = Catalogo("atacadao")
+
+# Encartes baixados com sucesso na última execução, por loja
+MANIFESTO = Manifesto("atacadao")
+
+# Lojas já concluídas por uma execução interrompida
+CHECKPOINT = Checkpoint("atacadao")
+
+# Spans por fase (telemetria.py), gravados no fim da execução
+telemetria.iniciar("atacadao")
 
-def strip_accents(s: str) -> str:
-    if not s:
-        return ""
-    return "".join(c for c in unicodedata.normalize("NFD", s) if unicodedata.category(c) != "Mn").lower().strip()
 
 def click_robusto(driver, el) -> bool:
     try:
         driver.execute_script("arguments[0].scrollIntoView({block:'center'});", el)
-        time.sleep(0.15)
+        aguardar_elemento_parado(driver, el)
         el.click()
         return True
     except Exception:
@@ -52,28 +72,27 @@ def click_robusto(driver, el) -> bool:
             return False
         
 def build_headless_chrome():
-    options = webdriver.ChromeOptions()
-    options.add_argument("--headless=new")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--disable-features=VizDisplayCompositor")
-    options.add_argument("--window-size=1920,1080")
-    options.add_argument("--lang=pt-BR,pt")
-    options.add_argument(
-        "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-    )
-    return webdriver.Chrome(options=options)
-
-driver = build_headless_chrome()
-wait = WebDriverWait(driver, 25)
+    # Só o localizador de lojas e os hrefs dos encartes: sem imagens nem fontes
+    return criar_driver("atacadao", perfil="descoberta")
+
+# O Chrome só é aberto quando alguma loja precisa do localizador (ver garantir_navegador)
+driver = None
+wait = None
+
+def garantir_navegador():
+    global driver, wait
+    if driver is None:
+        driver = build_headless_chrome()
+        wait = WebDriverWait(driver, 25)
+        with telemetria.span("navegar", url=BASE_URL):
+            driver.get(BASE_URL)
+        clicar_confirmar()
 
 def clicar_confirmar():
     try:
         btn = wait.until(EC.element_to_be_clickable((By.XPATH, "//button[normalize-space()='Confirmar']")))
         click_robusto(driver, btn)
-        time.sleep(0.4)
+        aguardar_dom_estavel(driver, quieto=0.3)
     except Exception:
         pass
 
@@ -81,36 +100,29 @@ def selecionar_uf_cidade(uf: str, cidade: str):
     # UF por value
     uf_sel = wait.until(EC.presence_of_element_located((By.XPATH, "//select[contains(@class, 'md:w-[96px]')]")))
     Select(uf_sel).select_by_value(uf)
-    time.sleep(0.6)
+    # As cidades da UF chegam por uma requisição
+    aguardar_rede_ociosa(driver, quieto=0.3, nome="cidades")
 
-    # Cidade: tenta exato; se falhar, usa contém/sem acento
+    # Cidade: valor do catálogo; na falta, exato ou contém/sem acento
     cid_sel = wait.until(EC.presence_of_element_located((By.XPATH, "//select[contains(@class, 'md:w-[360px]')]")))
-    alvo = strip_accents(cidade)
-    try:
-        Select(cid_sel).select_by_visible_text(cidade)
-    except Exception:
-        opts = cid_sel.find_elements(By.TAG_NAME, "option")
-        escolha = None
-        for o in opts:
-            if alvo in strip_accents(o.text):
-                escolha = o.text
-                break
-        if not escolha:
-            raise RuntimeError(f"Cidade '{cidade}' não encontrada para UF {uf}")
-        Select(cid_sel).select_by_visible_text(escolha)
-    time.sleep(0.8)
-
-def clicar_loja_por_nome(loja_nome: str):
-    alvo = strip_accents(loja_nome)
+    if not selecionar_por_catalogo(driver, cid_sel, CATALOGO, ("cidade", uf, cidade), cidade):
+        raise RuntimeError(f"Cidade '{cidade}' não encontrada para UF {uf}")
+    aguardar_dom_estavel(driver, quieto=0.3)
+
+def clicar_loja_por_nome(loja_nome: str, chave_catalogo=None):
+    alvo = normalizar_texto(loja_nome)
     wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, "[data-testid='store-card']")))
     cards = driver.find_elements(By.CSS_SELECTOR, "[data-testid='store-card']")
     for card in cards:
         try:
             titulo_el = card.find_element(By.TAG_NAME, "h1")
             titulo = titulo_el.text
-            if alvo in strip_accents(titulo):
+            if alvo in normalizar_texto(titulo):
                 botao = card.find_element(By.TAG_NAME, "a")
                 print(f"Acessando loja: {titulo}")
+                href = botao.get_attribute("href")
+                if chave_catalogo and href:
+                    CATALOGO.definir(chave_catalogo, {"titulo": titulo, "url": href})
                 if click_robusto(driver, botao):
                     return titulo
         except Exception:
@@ -120,62 +132,232 @@ def clicar_loja_por_nome(loja_nome: str):
 
 def baixar_encartes(uf: str, cidade: str, loja_nome: str):
     print("Buscando encartes...")
-    time.sleep(2)
+    with telemetria.span("descoberta"):
+        aguardar_rede_ociosa(driver, nome="pagina_loja")
+        aguardar_dom_estavel(driver, quieto=0.3)
+        links = driver.find_elements(By.XPATH, "//a[contains(@href, 'Flyer/?id=')]")
+        urls = [link.get_attribute("href") for link in links]
+    return salvar_encartes(uf, cidade, loja_nome, urls, driver.current_url)
 
-    links = driver.find_elements(By.XPATH, "//a[contains(@href, 'Flyer/?id=')]")
-    if not links:
+def salvar_encartes(uf: str, cidade: str, loja_nome: str, urls: list, referer: str) -> bool:
+    if not urls:
         print("Nenhum link de encarte encontrado.")
-        return
+        return False
 
+    # Pasta e chave do manifesto saem do nome configurado em LOJAS_ESTADOS, não do
+    # título lido no site, para serem as mesmas por HTTP e pelo navegador
     loja_segura = re.sub(r'[\\/*?:"<>|,\n\r]+', "_", loja_nome).strip().replace(" ", "_")
     pasta_destino = ENCARTE_DIR / uf / cidade / loja_segura
-    pasta_destino.mkdir(parents=True, exist_ok=True)
 
-    sess = requests.Session()
-    sess.headers.update({
-        "User-Agent": "Mozilla/5.0",
-        "Referer": driver.current_url,  # ajuda quando o host valida origem
-    })
+    # O Atacadão não publica a validade; os ids dos encartes mudam quando sai um novo
+    chave_manifesto = f"{uf}/{cidade}/{loja_segura}"
+    if MANIFESTO.inalterado(chave_manifesto, None, urls):
+        print(f" Encartes de {loja_nome} inalterados desde a última execução; pulando.")
+        return True
+    pasta_destino.mkdir(parents=True, exist_ok=True)
 
     vistos = set()
-    for i, link in enumerate(links, start=1):
-        url = link.get_attribute("href")
+    arquivos = []
+    a_baixar = []
+    for i, url in enumerate(urls, start=1):
         if not url or url in vistos:
             continue
         vistos.add(url)
 
         nome_arquivo = f"encarte_{i}.pdf"
         caminho = pasta_destino / nome_arquivo
+        if CHECKPOINT.arquivo_pronto(url, caminho):
+            print(f" Já baixado: {caminho}")
+            arquivos.append(caminho)
+            continue
+        a_baixar.append((url, caminho))
+
+    # Todos os encartes da loja ao mesmo tempo; Referer ajuda quando o host valida origem
+    falhou = False
+    for r in motor_compartilhado().baixar_todos(a_baixar, headers={"Referer": referer}, timeout=40):
+        if r["ok"]:
+            print(f" Baixado: {r['destino']}")
+            arquivos.append(r["destino"])
+            CHECKPOINT.marcar_arquivo(r["url"], r["destino"])
+        else:
+            print(f"Erro ao baixar {r['url']}: {r['erro']}")
+            falhou = True
+    if falhou:
+        raise RuntimeError(f"{len(vistos) - len(arquivos)} encarte(s) de {loja_nome} não baixado(s)")
+    MANIFESTO.registrar(chave_manifesto, None, urls, arquivos)
+    return True
+
+
+_CHAVES_NOME = ("name", "nome", "title", "titulo", "storeName", "friendlyName")
+_CHAVES_LINK = ("url", "link", "href", "path", "slug", "storeUrl", "pageUrl")
+
+def _lojas_no_json(dado):
+    """Percorre o JSON embutido procurando objetos com cara de loja (nome + link)."""
+    if isinstance(dado, dict):
+        nome = next((dado[k] for k in _CHAVES_NOME if isinstance(dado.get(k), str)), None)
+        link = next((dado[k] for k in _CHAVES_LINK if isinstance(dado.get(k), str)), None)
+        if nome and link:
+            yield nome, link, dado
+        for valor in dado.values():
+            yield from _lojas_no_json(valor)
+    elif isinstance(dado, list):
+        for valor in dado:
+            yield from _lojas_no_json(valor)
+
+def _candidatos_loja(html: str, loja_nome: str) -> list:
+    """
+    [(titulo, url_da_loja, [urls de encarte já conhecidas])] na página de lojas:
+    objetos do JSON embutido com o nome exato da loja e os store-cards cujo
+    título a contém (o mesmo critério de clicar_loja_por_nome).
+    """
+    alvo = normalizar_texto(loja_nome)
+    candidatos = []
+    for dado in analisador_html.jsons_embutidos(html):
+        for nome, link, obj in _lojas_no_json(dado):
+            if normalizar_texto(nome) in (alvo, f"atacadao {alvo}"):
+                # Às vezes os encartes já vêm no próprio objeto da loja
+                flyers = analisador_html.urls_no_texto(json.dumps(obj), PADRAO_FLYER)
+                candidatos.append((nome, urljoin(BASE_URL + "/", link), flyers))
+    for cartao in analisador_html.cartoes(html, BASE_URL, "data-testid", "store-card"):
+        if alvo in normalizar_texto(cartao["titulo"]) and cartao["links"]:
+            candidatos.append((cartao["titulo"], cartao["links"][0], []))
+    return candidatos
+
+def resolver_encartes_http(sessao, html: str, loja_nome: str):
+    """
+    Resolve loja -> links de encarte sem navegador: procura a loja no HTML e
+    no JSON embutido da página de lojas (`html`) e lê os links Flyer/?id= da
+    página da loja. Devolve (titulo, url_da_loja, [urls]) ou None.
+    """
+    for titulo, url_loja, flyers in _candidatos_loja(html, loja_nome):
+        if not flyers:
+            pagina = sessao.get(url_loja, timeout=20)
+            if not pagina.ok:
+                continue
+            flyers = analisador_html.urls_no_texto(pagina.text, PADRAO_FLYER)
+        if flyers:
+            return titulo, url_loja, [urljoin(url_loja, f) for f in flyers]
+    return None
+
+def atualizar_catalogo_http(catalogo: Catalogo):
+    """Refaz, por HTTP, as URLs das páginas das lojas de LOJAS_ESTADOS."""
+    html = nova_sessao().get(BASE_URL, timeout=20).text
+    for uf, lista_lojas in LOJAS_ESTADOS.items():
+        for cidade, loja_nome in lista_lojas:
+            for titulo, url_loja, _ in _candidatos_loja(html, loja_nome)[:1]:
+                catalogo.definir(("loja", uf, cidade, loja_nome), {"titulo": titulo, "url": url_loja})
+
+def processar_loja_catalogada(sessao, uf: str, cidade: str, loja_nome: str) -> bool:
+    """Vai direto à página da loja guardada no catálogo, sem passar pelo localizador."""
+    chave = ("loja", uf, cidade, loja_nome)
+    loja = CATALOGO.obter(chave)
+    if not loja:
+        return False
+
+    if ATACADAO_MODO != "navegador":
         try:
-            r = sess.get(url, timeout=40)
-            r.raise_for_status()
-            with open(caminho, "wb") as f:
-                f.write(r.content)
-            print(f" Baixado: {caminho}")
+            with telemetria.span("navegar", url=loja["url"], modo="http"):
+                pagina = sessao.get(loja["url"], timeout=20)
+                pagina.raise_for_status()
+            with telemetria.span("descoberta", modo="http"):
+                urls = [urljoin(loja["url"], f) for f in analisador_html.urls_no_texto(pagina.text, PADRAO_FLYER)]
         except Exception as e:
-            print(f"Erro ao baixar {url}: {e}")
+            print(f" Página da loja do catálogo indisponível por HTTP: {e}")
+            urls = []
+        if urls:
+            print(f"Loja do catálogo: {loja['titulo']} ({len(urls)} encarte(s))")
+            return salvar_encartes(uf, cidade, loja_nome, urls, loja["url"])
+
+    garantir_navegador()
+    print(f"Acessando loja do catálogo: {loja['titulo']}")
+    with telemetria.span("navegar", url=loja["url"]):
+        driver.get(loja["url"])
+    if baixar_encartes(uf, cidade, loja_nome):
+        return True
+    print(" Entrada do catálogo desatualizada; usando o localizador.")
+    CATALOGO.remover(chave)
+    return False
+
+def processar_loja_navegador(uf: str, cidade: str, loja_nome: str):
+    garantir_navegador()
+    with telemetria.span("navegar", url=BASE_URL):
+        driver.get(BASE_URL)
+    with telemetria.span("selecionar_loja"):
+        aguardar_rede_ociosa(driver)
+        clicar_confirmar()
+        selecionar_uf_cidade(uf, cidade)
+        loja_encontrada = clicar_loja_por_nome(loja_nome, ("loja", uf, cidade, loja_nome))
+
+    if not loja_encontrada:
+        raise RuntimeError(f"Loja '{loja_nome}' não encontrada no localizador")
+    # Sem encartes a loja não vai para o checkpoint: a página pode só não ter carregado
+    if not baixar_encartes(uf, cidade, loja_nome):
+        raise RuntimeError(f"Nenhum encarte encontrado para '{loja_nome}'")
+
+def processar_loja(sessao_http, html_lojas, uf: str, cidade: str, loja_nome: str):
+    if processar_loja_catalogada(sessao_http, uf, cidade, loja_nome):
+        return
+
+    # Loja fora do catálogo: refaz o catálogo em segundo plano enquanto segue
+    CATALOGO.atualizar_em_segundo_plano(atualizar_catalogo_http)
+
+    if html_lojas is not None:
+        try:
+            with telemetria.span("descoberta", modo="http"):
+                resolvido = resolver_encartes_http(sessao_http, html_lojas, loja_nome)
+        except Exception as e:
+            print(f" Resolução por HTTP falhou: {e}")
+            resolvido = None
+        if resolvido:
+            titulo, url_loja, urls = resolvido
+            print(f"Loja resolvida por HTTP: {titulo} ({len(urls)} encarte(s))")
+            CATALOGO.definir(("loja", uf, cidade, loja_nome), {"titulo": titulo, "url": url_loja})
+            salvar_encartes(uf, cidade, loja_nome, urls, url_loja)
+            return
+        print(" Loja não resolvida por HTTP; usando o navegador.")
+
+    processar_loja_navegador(uf, cidade, loja_nome)
 
 
 try:
-    driver.get(BASE_URL)
-    clicar_confirmar()
+    sessao_http = nova_sessao()
+    html_lojas = None
+    if ATACADAO_MODO != "navegador":
+        try:
+            with telemetria.span("navegar", url=BASE_URL, modo="http"):
+                resp = sessao_http.get(BASE_URL, timeout=20)
+                resp.raise_for_status()
+            html_lojas = resp.text
+        except Exception as e:
+            print(f" Página de lojas indisponível por HTTP ({e}); usando o navegador.")
 
     for uf, lista_lojas in LOJAS_ESTADOS.items():
         for cidade, loja_nome in lista_lojas:
             print(f"\n Estado: {uf} | Cidade: {cidade} | Loja: {loja_nome}")
-            driver.get(BASE_URL)
-            time.sleep(1.5)
-            clicar_confirmar()
-            selecionar_uf_cidade(uf, cidade)
-            loja_encontrada = clicar_loja_por_nome(loja_nome)
-            
-            if loja_encontrada:
-                baixar_encartes(uf, cidade, loja_encontrada)
-                time.sleep(0.5)
+            chave = f"{uf} | {cidade} | {loja_nome}"
+            if CHECKPOINT.concluido(chave):
+                print(" Loja concluída na execução anterior; pulando.")
+                continue
+            # Uma loja com problema não derruba as outras: registra a falha e segue
+            try:
+                with telemetria.span("loja", uf=uf, cidade=cidade, loja=loja_nome):
+                    processar_loja(sessao_http, html_lojas, uf, cidade, loja_nome)
+                CHECKPOINT.marcar(chave)
+            except Exception as e:
+                print(f" Erro na loja {loja_nome}: {e}")
+                CHECKPOINT.marcar(chave, ok=False, erro=str(e))
+
+    CHECKPOINT.finalizar([f"{uf} | {cidade} | {loja_nome}"
+                          for uf, lista_lojas in LOJAS_ESTADOS.items() for cidade, loja_nome in lista_lojas])
 
 except Exception as e:
     print(f" Erro geral: {e}")
 
 finally:
+    CATALOGO.aguardar_atualizacao()
+    CATALOGO.salvar()
+    MANIFESTO.salvar()
+    resumo_esperas()
     print(" Execução finalizada")
-    driver.quit()
\ No newline at end of file
+    if driver is not None:
+        driver.quit()
\ No newline at end of file
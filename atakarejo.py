@@ -1,50 +1,58 @@
 import os
 import re
-import time
-import requests
-from pathlib import Path
-from selenium import webdriver
+from concurrent.futures import ThreadPoolExecutor
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from navegador import criar_driver
+from esperas import aguardar_rede_ociosa, resumo as resumo_esperas
+from downloads import motor_compartilhado, nova_sessao
+import analisador_html
+from manifesto import Manifesto
+from checkpoint import Checkpoint
+import telemetria
+from pastas import BASE_OUTPUT
 
-BASE_OUTPUT = Path(os.environ.get("OUTPUT_DIR", str(Path.cwd() / "Encartes"))).resolve()
 ENCARTE_DIR = BASE_OUTPUT / "Atakarejo"
 ENCARTE_DIR.mkdir(parents=True, exist_ok=True)
 print(f"Pasta base de saída: {ENCARTE_DIR}")
 
+BASE_URL = os.environ.get("ATAKAREJO_BASE_URL", "https://atakarejo.com.br").rstrip("/")
+
 CIDADES_ALVO = [
     {
         "nome": "Vitoria-da-Conquista",
-        "url": "https://atakarejo.com.br/cidade/vitoria-da-conquista",
+        "url": f"{BASE_URL}/cidade/vitoria-da-conquista",
     },
     {
         "nome": "Salvador",
-        "url": "https://atakarejo.com.br/cidades/salvador/",
+        "url": f"{BASE_URL}/cidades/salvador/",
     },
 ]
 
+# "auto": lê as páginas das cidades por HTTP, todas ao mesmo tempo, e só abre o
+# Chrome para as cidades em que o HTML não trouxer os PDFs. "navegador": sempre pelo Chrome.
+ATAKAREJO_MODO = os.environ.get("ATAKAREJO_MODO", "auto")
+
+_DATA = r"\d{1,2}/\d{1,2}/\d{2,4}"
+
 def build_headless_chrome():
-    """Configura e retorna uma instância do Chrome em modo headless."""
-    options = webdriver.ChromeOptions()
-    options.add_argument("--headless=new")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--disable-features=VizDisplayCompositor")
-    options.add_argument("--window-size=1920,1080")
-    options.add_argument("--lang=pt-BR,pt")
-    options.add_argument(
-        "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-    )
-    return webdriver.Chrome(options=options)
+    """Chrome headless só para ler os links dos PDFs e a validade (sem imagens)."""
+    return criar_driver("atakarejo", perfil="descoberta")
 
 def slugify(s: str) -> str:
     s = re.sub(r"[\\/*?:\"<>|\r\n]+", "_", s)
     s = re.sub(r"\s+", "_", s.strip())
     return s[:80] if s else "sem_data"
 
+def validade_entre(textos) -> str:
+    """Slug do primeiro texto com "validade" ou uma data; None se nenhum tiver."""
+    for txt in textos:
+        txt = (txt or "").strip()
+        if txt and ("validade" in txt.lower() or re.search(_DATA, txt)):
+            return slugify(txt)
+    return None
+
 def encontrar_data_validade(driver, wait) -> str:
     candidatos = [
         (By.XPATH, "//h3[contains(translate(., 'VALIDEADE', 'valideade'), 'validade') or contains(., 'Validade')]"),
@@ -54,85 +62,200 @@ def encontrar_data_validade(driver, wait) -> str:
     for by, xp in candidatos:
         try:
             elems = wait.until(EC.presence_of_all_elements_located((by, xp)))
-            for e in elems:
-                txt = (e.text or "").strip()
-                if txt and ("validade" in txt.lower() or re.search(r"\d{1,2}/\d{1,2}/\d{2,4}", txt)):
-                    return slugify(txt)
+            slug = validade_entre(e.text for e in elems)
+            if slug:
+                return slug
         except:
             pass
 
     try:
         body = driver.find_element(By.TAG_NAME, "body").text
-        m = re.search(r"(validade.*?)(\d{1,2}/\d{1,2}/\d{2,4}.*)$", body, flags=re.I | re.S)
-        if m:
-            return slugify(m.group(0))
+        return validade_no_texto(body)
     except:
         pass
 
     return "sem_data"
 
-def baixar_pdf(url: str, destino: Path):
-    try:
-        resp = requests.get(url, timeout=30)
-        resp.raise_for_status()
-        with open(destino, "wb") as f:
-            f.write(resp.content)
-        print(f"Baixado: {destino.name}")
-    except Exception as e:
-        print(f"Erro ao baixar {url}: {e}")
+def validade_no_html(html: str) -> str:
+    """encontrar_data_validade sobre o HTML: os mesmos candidatos, na mesma ordem, elemento a elemento."""
+    elementos = analisador_html.textos_das_tags(html, ("h3", "p"))
+    candidatos = [
+        [e["texto"] for e in elementos if e["tag"] == "h3" and "validade" in e["texto"].lower()],
+        [e["texto"] for e in elementos if e["tag"] == "p" and ("Validade" in e["texto"] or "VALIDADE" in e["texto"])],
+        [e["texto"] for e in elementos if any("validade" in c or "oferta" in c for c in e["dentro_de"])],
+    ]
+    for textos in candidatos:
+        slug = validade_entre(textos)
+        if slug:
+            return slug
+    return validade_no_texto(analisador_html.texto(html))
 
-def processar_cidade(driver, wait, cidade_info: dict):
-    """Executa o processo de busca e download para uma cidade específica."""
-    cidade_nome = cidade_info["nome"]
-    url_cidade = cidade_info["url"]
+def validade_no_texto(texto: str) -> str:
+    """Último recurso: "validade" seguida da primeira data (e da data final, se houver) no texto da página."""
+    m = re.search(r"validade.{0,40}?" + _DATA + r"(?:\s*(?:a|até|à|-)\s*" + _DATA + r")?", texto, flags=re.I | re.S)
+    if m:
+        # Quebras de linha e espaços contam igual, venha o texto do Chrome ou do HTML
+        return slugify(" ".join(m.group(0).split()))
+    return "sem_data"
 
-    print(f"\n---Processando cidade: **{cidade_nome}** ({url_cidade}) ---")
+# Validade e PDFs da última execução bem-sucedida de cada cidade
+MANIFESTO = Manifesto("atakarejo")
 
-    try:
+# Cidades já concluídas por uma execução interrompida
+CHECKPOINT = Checkpoint("atakarejo")
+
+# Spans por fase (telemetria.py), gravados no fim da execução
+telemetria.iniciar("atakarejo")
+
+def baixar_pdfs(itens) -> list:
+    """Baixa [(url, destino)] ao mesmo tempo pelo motor de downloads. Devolve os destinos baixados."""
+    baixados = []
+    for r in motor_compartilhado().baixar_todos(itens, timeout=30):
+        if r["ok"]:
+            print(f"Baixado: {r['destino'].name}")
+            baixados.append(r["destino"])
+            CHECKPOINT.marcar_arquivo(r["url"], r["destino"])
+        else:
+            print(f"Erro ao baixar {r['url']}: {r['erro']}")
+    return baixados
+
+def ler_cidade_http(sessao, url_cidade: str):
+    """(hrefs dos encartes, validade) lidos do HTML da página, ou None se não houver PDFs nele."""
+    with telemetria.span("navegar", url=url_cidade, modo="http"):
+        resp = sessao.get(url_cidade, timeout=20)
+        resp.raise_for_status()
+    with telemetria.span("descoberta", modo="http"):
+        hrefs = [l["href"] for l in analisador_html.links(resp.text, url_cidade)
+                 if "button-download-ofertas" in l["classes"] or ".pdf" in l["href"]]
+        if not any(h.endswith(".pdf") for h in hrefs):
+            return None
+        return hrefs, validade_no_html(resp.text)
+
+def ler_cidade_navegador(url_cidade: str):
+    garantir_navegador()
+    with telemetria.span("navegar", url=url_cidade):
         driver.get(url_cidade)
 
+    with telemetria.span("descoberta"):
         # Espera pelos links de download
         links = wait.until(EC.presence_of_all_elements_located(
             (By.XPATH, '//a[contains(@class, "button-download-ofertas") or contains(@href, ".pdf")]')
         ))
-        print(f"{len(links)} encarte(s) encontrado(s) na página.")
-
         validade_slug = encontrar_data_validade(driver, wait)
-        
-        # Cria a pasta de destino com Cidade/Validade
-        pasta_destino = (ENCARTE_DIR / cidade_nome / validade_slug)
-        pasta_destino.mkdir(parents=True, exist_ok=True)
-        print(f"Pasta de destino: {pasta_destino.relative_to(BASE_OUTPUT)}")
-
-        vistos = set()
-        for i, link in enumerate(links, start=1):
-            url_pdf = link.get_attribute("href")
-            if not url_pdf or not url_pdf.endswith(".pdf") or url_pdf in vistos:
-                continue
-            vistos.add(url_pdf)
-
-            nome = f"encarte_{i}.pdf"
-            caminho = pasta_destino / nome
-            print(f" Tentando baixar encarte {i}/{len(links)}...")
-            baixar_pdf(url_pdf, caminho)
+        return [link.get_attribute("href") for link in links], validade_slug
+
+def salvar_cidade(cidade_nome: str, hrefs: list, validade_slug: str):
+    """Baixa os PDFs da cidade e marca o checkpoint."""
+    print(f"{cidade_nome}: {len(hrefs)} encarte(s) encontrado(s) na página.")
+    urls_pdf = [u for u in hrefs if u and u.endswith(".pdf")]
+    if MANIFESTO.inalterado(cidade_nome, validade_slug, urls_pdf):
+        print(f"Validade e encartes de {cidade_nome} inalterados desde a última execução; pulando.")
+        CHECKPOINT.marcar(cidade_nome)
+        return
+
+    # Cria a pasta de destino com Cidade/Validade
+    pasta_destino = (ENCARTE_DIR / cidade_nome / validade_slug)
+    pasta_destino.mkdir(parents=True, exist_ok=True)
+    print(f"Pasta de destino: {pasta_destino.relative_to(BASE_OUTPUT)}")
+
+    vistos = set()
+    arquivos = []
+    a_baixar = []
+    for i, url_pdf in enumerate(hrefs, start=1):
+        if not url_pdf or not url_pdf.endswith(".pdf") or url_pdf in vistos:
+            continue
+        vistos.add(url_pdf)
+
+        nome = f"encarte_{i}.pdf"
+        caminho = pasta_destino / nome
+        if CHECKPOINT.arquivo_pronto(url_pdf, caminho):
+            print(f" Encarte {i} já baixado na execução anterior.")
+            arquivos.append(caminho)
+            continue
+        a_baixar.append((url_pdf, caminho))
+    if a_baixar:
+        print(f" Baixando {len(a_baixar)} encarte(s) de {cidade_nome}...")
+        arquivos += baixar_pdfs(a_baixar)
+
+    if len(arquivos) == len(vistos):
+        MANIFESTO.registrar(cidade_nome, validade_slug, urls_pdf, arquivos)
+        CHECKPOINT.marcar(cidade_nome)
+    else:
+        CHECKPOINT.marcar(cidade_nome, ok=False, erro=f"{len(vistos) - len(arquivos)} PDF(s) não baixado(s)")
+
+def processar_cidade_http(sessao, cidade_info: dict) -> bool:
+    """Cidade inteira sem navegador. False se o HTML não trouxe os PDFs (o Chrome tenta depois)."""
+    cidade_nome = cidade_info["nome"]
+    with telemetria.span("cidade", cidade=cidade_nome, modo="http"):
+        try:
+            lido = ler_cidade_http(sessao, cidade_info["url"])
+        except Exception as e:
+            print(f"  {cidade_nome} indisponível por HTTP: {e}")
+            return False
+        if lido is None:
+            return False
+        print(f"\n---Cidade **{cidade_nome}** lida por HTTP ({cidade_info['url']}) ---")
+        try:
+            salvar_cidade(cidade_nome, *lido)
+        except Exception as e:
+            print(f"  Erro ao processar {cidade_nome}: {e}")
+            CHECKPOINT.marcar(cidade_nome, ok=False, erro=str(e))
+        return True
 
+def processar_cidade(cidade_info: dict):
+    """Executa o processo de busca e download para uma cidade específica, pelo navegador."""
+    cidade_nome = cidade_info["nome"]
+    url_cidade = cidade_info["url"]
+
+    print(f"\n---Processando cidade: **{cidade_nome}** ({url_cidade}) ---")
+
+    try:
+        with telemetria.span("cidade", cidade=cidade_nome):
+            salvar_cidade(cidade_nome, *ler_cidade_navegador(url_cidade))
     except Exception as e:
         print(f"  Erro ao processar {cidade_nome}: {e}")
-        time.sleep(2)
-
+        CHECKPOINT.marcar(cidade_nome, ok=False, erro=str(e))
+        if driver is not None:
+            # Deixa a página com erro terminar de carregar antes da próxima cidade
+            aguardar_rede_ociosa(driver, nome="cidade_com_erro")
 
 
+# O Chrome só é aberto quando alguma cidade não resolve por HTTP (ver garantir_navegador)
+driver = None
+wait = None
 
-driver = build_headless_chrome()
-wait = WebDriverWait(driver, 20)
+def garantir_navegador():
+    global driver, wait
+    if driver is None:
+        driver = build_headless_chrome()
+        wait = WebDriverWait(driver, 20)
 
 try:
+    pendentes = []
     for cidade in CIDADES_ALVO:
-        processar_cidade(driver, wait, cidade)
+        if CHECKPOINT.concluido(cidade["nome"]):
+            print(f"\n{cidade['nome']}: concluída na execução anterior; pulando.")
+            continue
+        pendentes.append(cidade)
+
+    if ATAKAREJO_MODO != "navegador" and pendentes:
+        sessao = nova_sessao(len(pendentes))
+        with ThreadPoolExecutor(max_workers=len(pendentes), thread_name_prefix="cidade") as pool:
+            resolvidas = list(pool.map(lambda cidade: processar_cidade_http(sessao, cidade), pendentes))
+        pendentes = [cidade for cidade, ok in zip(pendentes, resolvidas) if not ok]
+        if pendentes:
+            print(f"\n{len(pendentes)} cidade(s) sem PDFs no HTML; usando o navegador.")
+
+    for cidade in pendentes:
+        processar_cidade(cidade)
+    CHECKPOINT.finalizar([cidade["nome"] for cidade in CIDADES_ALVO])
 
 except Exception as e:
     print(f"\nErro geral inesperado: {e}")
 
 finally:
+    MANIFESTO.salvar()
+    resumo_esperas()
     print("\nExecução finalizada.")
-    driver.quit()
\ No newline at end of file
+    if driver is not None:
+        driver.quit()
@@ -0,0 +1,74 @@
+"""
+Confere que os scripts com modo sem navegador gravam nas mesmas pastas nos
+dois modos: roda cada um contra os sites falsos com <VAREJISTA>_MODO=auto
+(HTTP) e =navegador (Chrome) e compara as árvores de pastas de saída. Uma
+diferença (validade ou nome de loja lidos de outro jeito) faria a troca de
+modo baixar tudo de novo numa segunda árvore.
+
+    python bench/conferir_modos.py             # todos
+    python bench/conferir_modos.py atakarejo
+
+Sai com código 1 se alguma árvore diferir.
+"""
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+
+from executar import rodar
+from sites import SitesFalsos
+
+# Varejista -> variável que escolhe o modo
+MODOS = {
+    "atacadao": "ATACADAO_MODO",
+    "atakarejo": "ATAKAREJO_MODO",
+}
+
+
+def pastas(saida: Path) -> set:
+    return {str(p.relative_to(saida)) for p in saida.rglob("*") if p.is_dir()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara as pastas de saída dos modos HTTP e navegador.")
+    parser.add_argument("varejistas", nargs="*", help=f"padrão: todos ({', '.join(MODOS)})")
+    parser.add_argument("--limite", type=float, default=600, help="tempo máximo por execução, em segundos")
+    args = parser.parse_args(argv)
+    desconhecidos = set(args.varejistas) - set(MODOS)
+    if desconhecidos:
+        parser.error(f"varejista(s) sem modo HTTP: {', '.join(sorted(desconhecidos))}")
+
+    sites = SitesFalsos(latencia=0, atraso_pagina=0)
+    sites.iniciar()
+    pasta = Path(tempfile.mkdtemp(prefix="bench-modos-"))
+    print(f"Sites falsos em {sites.base}; saídas e logs em {pasta}")
+
+    diferentes = []
+    try:
+        for varejista in args.varejistas or list(MODOS):
+            arvores = {}
+            for modo in ("auto", "navegador"):
+                r = rodar(varejista, sites, pasta, args.limite, nome=f"{varejista}-{modo}",
+                          env_extra={MODOS[varejista]: modo})
+                arvores[modo] = pastas(r["saida"])
+                print(f" {varejista} ({modo}): código {r['codigo']}, {len(arvores[modo])} pasta(s)")
+            if arvores["auto"] != arvores["navegador"]:
+                diferentes.append(varejista)
+                for pasta_so, modo in ((arvores["auto"] - arvores["navegador"], "auto"),
+                                       (arvores["navegador"] - arvores["auto"], "navegador")):
+                    for p in sorted(pasta_so):
+                        print(f"   só no modo {modo}: {p}")
+            elif not arvores["auto"]:
+                diferentes.append(varejista)
+                print(f"   nenhuma pasta gravada; veja os logs em {pasta}")
+    finally:
+        sites.parar()
+
+    if diferentes:
+        print(f"\nPastas diferentes entre os modos: {', '.join(diferentes)}")
+        sys.exit(1)
+    print("\nMesmas pastas nos dois modos.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Benchmark offline: roda cada script contra os sites falsos (bench/sites.py)
+e mede tempo total, tempo em esperas (esperas.py), bytes gravados, bytes
+servidos e pico de memória (RSS) de cada varejista, comparando com um
+baseline gravado.
+
+    python bench/executar.py                         # todos os varejistas
+    python bench/executar.py cometa gbarbosa --latencia 200 --atraso-pagina 3000
+    python bench/executar.py --gravar-baseline       # grava bench/baseline.json
+
+Cada script roda num processo próprio, com OUTPUT_DIR e CACHE_DIR novos
+(sem manifesto nem checkpoint de execuções anteriores) e CHROME_HEADLESS=1.
+A saída de cada um fica em <pasta temporária>/<varejista>.log.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from sites import VAREJISTAS, SitesFalsos
+
+RAIZ = Path(__file__).resolve().parent.parent
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+METRICAS = ("tempo", "espera", "gravados", "servidos", "rss")
+
+
+def bytes_gravados(pasta: Path) -> int:
+    """Bytes dos arquivos em `pasta`, contando cada inode uma vez (o armazem usa hardlinks)."""
+    vistos, total = set(), 0
+    for arquivo in pasta.rglob("*"):
+        if not arquivo.is_file():
+            continue
+        st = arquivo.stat()
+        if (st.st_dev, st.st_ino) not in vistos:
+            vistos.add((st.st_dev, st.st_ino))
+            total += st.st_size
+    return total
+
+
+def _encerrar(varejista: str, processo, limite: float):
+    print(f" {varejista}: passou de {limite:.0f}s; encerrando.")
+    processo.kill()
+
+
+def rodar(varejista: str, sites: SitesFalsos, pasta: Path, limite: float, nome: str = None,
+          env_extra: dict = None) -> dict:
+    """Roda o script de `varejista` em pasta / `nome` (padrão: o próprio varejista)."""
+    nome = nome or varejista
+    saida = pasta / nome / "Encartes"
+    cache = pasta / nome / "cache"
+    esperas = pasta / nome / "esperas.json"
+    saida.mkdir(parents=True)
+    env = dict(os.environ, OUTPUT_DIR=str(saida), CACHE_DIR=str(cache), ESPERAS_JSON=str(esperas),
+               CHROME_HEADLESS="1", PYTHONUNBUFFERED="1", **sites.variaveis(), **(env_extra or {}))
+
+    sites.zerar_contadores()
+    inicio = time.monotonic()
+    with open(pasta / f"{nome}.log", "wb") as log:
+        processo = subprocess.Popen([sys.executable, str(RAIZ / f"{varejista}.py")], cwd=str(pasta / nome),
+                                    env=env, stdout=log, stderr=subprocess.STDOUT)
+        relogio = threading.Timer(limite, _encerrar, (varejista, processo, limite))
+        relogio.start()
+        try:
+            # wait4 (e não processo.wait) para ter o rusage do filho; ru_maxrss vem em KB no Linux
+            _, status, uso = os.wait4(processo.pid, 0)
+        finally:
+            relogio.cancel()
+        processo.returncode = os.waitstatus_to_exitcode(status)
+    tempo = time.monotonic() - inicio
+
+    try:
+        espera = sum(e["total"] for e in json.loads(esperas.read_text(encoding="utf-8")).values())
+    except (OSError, ValueError):
+        espera = None
+    return {
+        "tempo": tempo,
+        "espera": espera,
+        "gravados": bytes_gravados(saida),
+        "servidos": sites.bytes_servidos.get(varejista, 0),
+        "rss": uso.ru_maxrss * 1024,
+        "codigo": processo.returncode,
+        "saida": saida,
+    }
+
+
+def _formatar(metrica: str, valor) -> str:
+    if valor is None:
+        return "-"
+    if metrica in ("tempo", "espera"):
+        return f"{valor:.1f}s"
+    return f"{valor / 1024 / 1024:.1f} MB"
+
+
+def _variacao(atual, anterior):
+    if atual is None or not anterior:
+        return None
+    return (atual - anterior) / anterior * 100
+
+
+def relatorio(resultados: dict, baseline: dict, tolerancia: float) -> list:
+    """Imprime a tabela e devolve os (varejista, métrica, variação) acima da tolerância."""
+    print(f"\n{'varejista':<14}" + "".join(f"{m:>20}" for m in METRICAS) + "  código")
+    regressoes = []
+    for varejista, r in resultados.items():
+        linha = f"{varejista:<14}"
+        for metrica in METRICAS:
+            celula = _formatar(metrica, r[metrica])
+            variacao = _variacao(r[metrica], baseline.get(varejista, {}).get(metrica))
+            if variacao is not None:
+                celula += f" ({variacao:+.0f}%)"
+                if variacao > tolerancia:
+                    regressoes.append((varejista, metrica, variacao))
+            linha += f"{celula:>20}"
+        print(linha + f"  {r['codigo']:>6}")
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline dos scripts contra sites falsos.")
+    parser.add_argument("varejistas", nargs="*", help=f"padrão: todos ({', '.join(VAREJISTAS)})")
+    parser.add_argument("--latencia", type=float, default=50, help="latência de cada requisição, em ms")
+    parser.add_argument("--atraso-pagina", type=float, default=1000,
+                        help="quanto o script de terceiros segura o load de cada página, em ms")
+    parser.add_argument("--paginas", type=int, default=4, help="páginas por encarte")
+    parser.add_argument("--jornais", type=int, default=3, help="jornais por loja do Assaí")
+    parser.add_argument("--limite", type=float, default=1800, help="tempo máximo por script, em segundos")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--gravar-baseline", action="store_true", help="grava os resultados como novo baseline")
+    parser.add_argument("--tolerancia", type=float, default=10,
+                        help="variação (%%) acima do baseline tratada como regressão")
+    args = parser.parse_args(argv)
+    desconhecidos = set(args.varejistas) - set(VAREJISTAS)
+    if desconhecidos:
+        parser.error(f"varejista(s) desconhecido(s): {', '.join(sorted(desconhecidos))}")
+    args.varejistas = args.varejistas or list(VAREJISTAS)
+    parametros = {"latencia": args.latencia, "atraso_pagina": args.atraso_pagina,
+                  "paginas": args.paginas, "jornais": args.jornais}
+
+    try:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        baseline = {}
+    if not baseline and not args.gravar_baseline:
+        print(f"Sem baseline em {args.baseline}; rode com --gravar-baseline para criar.")
+    elif baseline and baseline.get("_parametros") != parametros:
+        print(f"Aviso: o baseline foi gravado com outros parâmetros: {baseline.get('_parametros')}")
+
+    sites = SitesFalsos(args.latencia / 1000, args.atraso_pagina / 1000, args.paginas, args.jornais)
+    sites.iniciar()
+    pasta = Path(tempfile.mkdtemp(prefix="bench-supermercados-"))
+    print(f"Sites falsos em {sites.base}; saídas e logs em {pasta}")
+
+    resultados = {}
+    try:
+        for varejista in args.varejistas:
+            print(f"\n=== {varejista} ===")
+            resultados[varejista] = r = rodar(varejista, sites, pasta, args.limite)
+            print(f" {r['tempo']:.1f}s, código {r['codigo']} (log em {pasta / varejista}.log)")
+    finally:
+        sites.parar()
+
+    regressoes = relatorio(resultados, baseline, args.tolerancia)
+
+    if args.gravar_baseline:
+        baseline.update({v: {m: r[m] for m in METRICAS} for v, r in resultados.items() if r["codigo"] == 0})
+        baseline["_parametros"] = parametros
+        args.baseline.write_text(json.dumps(baseline, indent=1, sort_keys=True), encoding="utf-8")
+        print(f"\nBaseline gravado em {args.baseline}")
+    elif regressoes:
+        print(f"\nAcima da tolerância de {args.tolerancia:.0f}%:")
+        for varejista, metrica, variacao in regressoes:
+            print(f"  {varejista} {metrica}: {variacao:+.0f}%")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,581 @@
+"""
+Sites falsos dos varejistas, servidos localmente, com os mesmos contratos de
+DOM que os scripts usam (seletores, textos, atributos e fluxo de cliques).
+As imagens e PDFs dos encartes são gerados na hora.
+
+    python bench/sites.py --porta 8765 --latencia 50 --atraso-pagina 1500
+
+imprime as variáveis *_BASE_URL para rodar um script contra os sites falsos.
+A latência vale para toda requisição; o atraso de página é um script de
+"terceiros" (analytics) que segura o evento load de cada página HTML.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import unicodedata
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from string import Template
+from urllib.parse import parse_qs, urlsplit
+
+from PIL import Image, ImageDraw
+
+# Caminho de cada varejista no servidor e a variável que o script lê
+VAREJISTAS = {
+    "assai": ("ASSAI_BASE_URL", "/assai/ofertas"),
+    "atacadao": ("ATACADAO_BASE_URL", "/atacadao/institucional/nossas-lojas"),
+    "atakarejo": ("ATAKAREJO_BASE_URL", "/atakarejo"),
+    "cometa": ("COMETA_BASE_URL", "/cometa/ofertas/"),
+    "frangolandia": ("FRANGOLANDIA_BASE_URL", "/frangolandia/encartes/"),
+    "gbarbosa": ("GBARBOSA_BASE_URL", "/gbarbosa/ofertas/"),
+    "novoatacarejo": ("NOVOATACAREJO_BASE_URL", "/novoatacarejo/oferta/"),
+}
+
+VALIDADE = "Ofertas válidas de 10/10 a 16/10/2025"
+
+# Estado -> região ("" sem região) -> lojas. Inclui as lojas de assai.LOJAS_PARA_PROCESSAR.
+LOJAS_ASSAI = {
+    "Maranhão": {"": ["Assaí Angelim", "Assaí São Luís Cohama"]},
+    "Alagoas": {"": ["Assaí Maceió Farol", "Assaí Arapiraca"]},
+    "Ceará": {"": ["Assaí Bezerra M (Fortaleza)", "Assaí Juazeiro do Norte"]},
+    "Pará": {"": ["Assaí Belém", "Assaí Ananindeua"]},
+    "Paraíba": {"": ["Assaí João Pessoa Geisel", "Assaí Campina Grande"]},
+    "Pernambuco": {"": ["Assaí Avenida Recife", "Assaí Olinda"]},
+    "Piauí": {"": ["Assaí Teresina", "Assaí Parnaíba"]},
+    "Sergipe": {"": ["Assaí Aracaju", "Assaí Nossa Senhora do Socorro"]},
+    "Bahia": {"Capital": ["Salvador Paralela", "Assaí Salvador Iguatemi"],
+              "Interior": ["Assaí Vitória da Conquista", "Assaí Feira de Santana"]},
+}
+
+# UF -> cidade -> lojas. Inclui as lojas de atacadao.LOJAS_ESTADOS.
+LOJAS_ATACADAO = {
+    "PA": {"Belém": ["Belém Portal da Amazônia", "Belém Augusto Montenegro"]},
+    "PE": {"Recife": ["Recife Avenida Recife", "Recife Imbiribeira"]},
+    "BA": {"Salvador": ["Salvador Garibaldi", "Salvador Paralela"],
+           "Vitória Da Conquista": ["Vitória da Conquista Brumado"]},
+    "AL": {"Maceió": ["Maceió Praia", "Maceió Tabuleiro"]},
+    "MA": {"São Luís": ["São Luís"]},
+    "CE": {"Fortaleza": ["Fortaleza Fátima", "Fortaleza Messejana"]},
+    "PI": {"Teresina": ["Teresina Primavera"]},
+    "SE": {"Aracaju": ["Aracaju Tancredo Neves"]},
+    "PB": {"João Pessoa": ["João Pessoa Bessa"]},
+}
+
+ESTILO = """
+body { margin: 0; font-family: sans-serif; background: #f3f3f3; }
+button, a { font-size: 16px; margin: 4px; }
+.oculto { display: none !important; }
+"""
+
+
+def slug(texto: str) -> str:
+    texto = unicodedata.normalize("NFD", texto)
+    texto = "".join(c for c in texto if unicodedata.category(c) != "Mn").lower()
+    return re.sub(r"[^a-z0-9]+", "-", texto).strip("-")
+
+
+def imagem_falsa(nome: str, largura: int = 1000, altura: int = 1400, formato: str = "JPEG") -> bytes:
+    """Página de encarte falsa: blocos coloridos determinísticos por `nome` (hashes perceptuais distintos)."""
+    aleatorio = random.Random(nome)
+    img = Image.new("RGB", (largura, altura), tuple(aleatorio.randint(200, 255) for _ in range(3)))
+    desenho = ImageDraw.Draw(img)
+    desenho.rectangle([0, 0, largura, altura // 8], fill=tuple(aleatorio.randint(0, 200) for _ in range(3)))
+    for _ in range(24):
+        x, y = aleatorio.randint(0, largura - 200), aleatorio.randint(altura // 8, altura - 200)
+        desenho.rectangle([x, y, x + aleatorio.randint(80, 300), y + aleatorio.randint(80, 300)],
+                          fill=tuple(aleatorio.randint(0, 255) for _ in range(3)))
+        desenho.text((x + 10, y + 10), f"R$ {aleatorio.randint(1, 99)},{aleatorio.randint(0, 99):02d}",
+                     fill=(0, 0, 0))
+    desenho.text((20, 20), nome, fill=(255, 255, 255))
+    buffer = BytesIO()
+    img.save(buffer, format=formato, quality=85)
+    return buffer.getvalue()
+
+
+def pdf_falso(nome: str, paginas: int = 4, tamanho: int = 400 * 1024) -> bytes:
+    """PDF válido com `paginas` páginas de texto, completado até ~`tamanho` bytes."""
+    objetos = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    filhos = []
+    for n in range(1, paginas + 1):
+        conteudo = f"BT /F1 24 Tf 72 720 Td ({nome} - pagina {n}) Tj ET".encode()
+        objetos.append(f"<< /Length {len(conteudo)} >>\nstream\n{conteudo.decode()}\nendstream")
+        objetos.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objetos)} 0 R >>")
+        filhos.append(f"{len(objetos)} 0 R")
+    objetos[1] = f"<< /Type /Pages /Kids [{' '.join(filhos)}] /Count {paginas} >>"
+
+    saida = BytesIO()
+    saida.write(b"%PDF-1.4\n")
+    posicoes = []
+    for i, obj in enumerate(objetos, start=1):
+        posicoes.append(saida.tell())
+        saida.write(f"{i} 0 obj\n{obj}\nendobj\n".encode())
+    aleatorio = random.Random(nome)
+    while saida.tell() < tamanho:
+        saida.write(b"% " + bytes(aleatorio.choice(b"abcdefghij0123456789") for _ in range(1022)) + b"\n")
+    xref = saida.tell()
+    saida.write(f"xref\n0 {len(objetos) + 1}\n0000000000 65535 f \n".encode())
+    for pos in posicoes:
+        saida.write(f"{pos:010d} 00000 n \n".encode())
+    saida.write(f"trailer\n<< /Size {len(objetos) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return saida.getvalue()
+
+
+def _pagina(titulo: str, corpo: str, **valores) -> str:
+    """HTML completo com o script de "terceiros" lento no fim (segura o load, não o DOMContentLoaded)."""
+    return Template("""<!DOCTYPE html>
+<html lang="pt-BR"><head><meta charset="utf-8"><title>$titulo</title><style>$estilo</style></head>
+<body>
+$corpo
+<script async src="/terceiros/www.google-analytics.com/analytics.js"></script>
+</body></html>""").substitute(titulo=titulo, estilo=ESTILO, corpo=Template(corpo).substitute(**valores))
+
+
+# --- Assaí: seletor de estado/região/loja, slider slick e abas de jornal ---
+
+_ASSAI = """
+<div id="cookies"><button class="ot-close-icon" onclick="document.getElementById('cookies').remove()">x</button></div>
+<a class="seletor-loja" href="#" onclick="abrirSeletor(); return false;">Selecione sua loja</a>
+<div id="seletor" class="oculto">
+  <select class="estado" onchange="escolherEstado(this.value)"><option>Estado</option>$estados</select>
+  <div id="caixa-regiao" class="oculto">
+    <select class="regiao" onchange="carregarLojas()"><option>Região</option>
+      <option value="Capital">Capital</option><option value="Interior">Interior</option></select>
+  </div>
+  <select class="loja"><option>Loja</option></select>
+  <button class="confirmar" onclick="confirmar()">Confirmar</button>
+</div>
+<div id="ofertas"></div>
+<script>
+function el(s) { return document.querySelector(s); }
+function abrirSeletor() {
+  el('#seletor').classList.remove('oculto');
+  el('select.estado').selectedIndex = 0;
+  el('#caixa-regiao').classList.add('oculto');
+  el('select.loja').innerHTML = '<option>Loja</option>';
+}
+function escolherEstado(estado) {
+  el('select.loja').innerHTML = '<option>Loja</option>';
+  if (estado === 'Bahia') { el('#caixa-regiao').classList.remove('oculto'); el('select.regiao').selectedIndex = 0; }
+  else { el('#caixa-regiao').classList.add('oculto'); carregarLojas(); }
+}
+function carregarLojas() {
+  var estado = el('select.estado').value;
+  var regiao = el('#caixa-regiao').classList.contains('oculto') ? '' : el('select.regiao').value;
+  fetch('/assai/api/lojas?estado=' + encodeURIComponent(estado) + '&regiao=' + encodeURIComponent(regiao))
+    .then(function (r) { return r.json(); })
+    .then(function (lojas) {
+      el('select.loja').innerHTML = '<option>Loja</option>' + lojas.map(function (l) {
+        return '<option value="' + l.id + '">' + l.nome + '</option>';
+      }).join('');
+    });
+}
+function confirmar() {
+  var estado = el('select.estado').value;
+  el('#seletor').classList.add('oculto');
+  fetch('/assai/api/jornais?estado=' + encodeURIComponent(estado)).then(function (r) { return r.json(); })
+    .then(function (jornais) { window.jornais = jornais; mostrarJornal(1); });
+}
+function mostrarJornal(n) {
+  var paginas = window.jornais[n - 1];
+  var abas = window.jornais.map(function (_, i) {
+    return '<button onclick="mostrarJornal(' + (i + 1) + ')">Jornal de Ofertas ' + (i + 1) + '</button>';
+  }).join('');
+  var slides = paginas.map(function (url, i) {
+    return '<div class="slide' + (i ? ' oculto' : '') + '"><img src="' + url + '" width="500">' +
+           '<a class="download" href="' + url + '" download>Baixar</a></div>';
+  }).join('');
+  el('#ofertas').innerHTML = '<div class="ofertas-tab-validade">$validade</div>' + abas +
+    '<div class="ofertas-slider">' + slides + '</div><button class="slick-next" onclick="proximo()">Próximo</button>';
+}
+function proximo() {
+  var slides = document.querySelectorAll('.ofertas-slider .slide');
+  for (var i = 0; i < slides.length; i++) {
+    if (!slides[i].classList.contains('oculto')) {
+      slides[i].classList.add('oculto');
+      slides[(i + 1) % slides.length].classList.remove('oculto');
+      return;
+    }
+  }
+}
+</script>
+"""
+
+
+# --- Atacadão: localizador com selects de UF/cidade, store-cards e links Flyer/?id= ---
+
+_ATACADAO = """
+<div id="cookies">Usamos cookies. <button onclick="document.getElementById('cookies').remove()">Confirmar</button></div>
+<select class="md:w-[96px]" onchange="escolherUf(this.value)"><option value="">UF</option>$ufs</select>
+<select class="md:w-[360px]" onchange="mostrarLojas(this.value)"><option value="">Cidade</option></select>
+<div id="lojas"></div>
+<script type="application/json" id="__NEXT_DATA__">$dados</script>
+<script>
+var LOJAS = JSON.parse(document.getElementById('__NEXT_DATA__').textContent).props.pageProps.lojas;
+var cidades = document.querySelectorAll('select')[1];
+function escolherUf(uf) {
+  fetch('/atacadao/api/cidades?uf=' + uf).then(function (r) { return r.json(); }).then(function (lista) {
+    cidades.innerHTML = '<option value="">Cidade</option>' + lista.map(function (c) {
+      return '<option value="' + c + '">' + c + '</option>';
+    }).join('');
+  });
+}
+function mostrarLojas(cidade) {
+  var uf = document.querySelectorAll('select')[0].value;
+  document.getElementById('lojas').innerHTML = LOJAS.filter(function (l) {
+    return l.uf === uf && l.cidade === cidade;
+  }).map(function (l) {
+    return '<div data-testid="store-card"><h1>Atacadão ' + l.name + '</h1><a href="' + l.url + '">Ver loja</a></div>';
+  }).join('');
+}
+</script>
+"""
+
+_ATACADAO_LOJA = """
+<h1>Atacadão $nome</h1>
+<div>$links</div>
+"""
+
+
+# --- Cometa: Real3D FlipBook (um encarte com as páginas nas opções, outro só no visualizador) ---
+
+_COMETA = """
+$encartes
+<div class="flipbook-main-wrapper oculto" style="position:fixed; inset:0; background:#444">
+  <div id="paginas" style="position:absolute; top:90px; left:0; right:0; text-align:center"></div>
+  <div class="flipbook-currentPageNumber" style="position:absolute; bottom:20px; left:20px; color:#fff"></div>
+  <span class="flipbook-right-arrow" onclick="avancar()"
+        style="position:absolute; right:20px; top:50%; color:#fff; font-size:40px; cursor:pointer">&#8250;</span>
+</div>
+<script>
+var PAGINAS = $paginas;
+var atual = null, total = 0, pagina = 1;
+function abrir(i) {
+  atual = PAGINAS[i]; total = atual.length; pagina = 1;
+  document.querySelector('.flipbook-main-wrapper').classList.remove('oculto');
+  desenhar();
+}
+function desenhar() {
+  var nums = (pagina === 1 || pagina === total) ? [pagina] : [pagina, Math.min(pagina + 1, total)];
+  document.getElementById('paginas').innerHTML = nums.map(function (n) {
+    return '<img src="' + atual[n - 1] + '" style="height:860px">';
+  }).join('');
+  document.querySelector('.flipbook-currentPageNumber').textContent =
+    (nums.length > 1 ? nums[0] + '-' + nums[1] : nums[0]) + ' / ' + total;
+}
+function avancar() {
+  var prox = pagina === 1 ? 2 : pagina + 2;
+  if (prox > total) return;
+  pagina = prox;
+  desenhar();
+}
+</script>
+"""
+
+
+# --- G. Barbosa: botões de estado, "Ver Encarte" e dFlip em rolagem ---
+
+_GBARBOSA = """
+<div>$botoes</div>
+<div id="area"></div>
+<script>
+var FONTES = $fontes;
+var PAGINAS = $paginas;
+function estado(uf) {
+  document.getElementById('area').innerHTML =
+    '<button class="encarte-button" onclick="verEncarte(\\'' + uf + '\\')">Ver Encarte</button>';
+}
+function verEncarte(uf) {
+  var fonte = FONTES[uf] ? ' source="' + FONTES[uf] + '"' : '';
+  document.getElementById('area').innerHTML = '<div class="_df_book df-container"' + fonte + '>' +
+    PAGINAS[uf].map(function (url) {
+      return '<div class="df-page-content df-content-loaded" style="width:800px; height:1120px; margin:20px auto">' +
+             '<img src="' + url + '" style="width:100%"></div>';
+    }).join('') + '</div>';
+}
+</script>
+"""
+
+
+# --- Novo Atacarejo: select de cidade, #tabloids e visualizador pdff (dFlip) ---
+
+_NOVOATACAREJO = """
+<select class="select" onchange="escolher(this.value)"><option value="">Selecione a cidade</option>
+  <option value="olinda">Olinda</option><option value="recife">Recife</option></select>
+<div id="resultado"></div>
+<script>
+function escolher(cidade) {
+  fetch('/novoatacarejo/api/tabloides?cidade=' + cidade).then(function (r) { return r.text(); })
+    .then(function (html) { document.getElementById('resultado').innerHTML = html; });
+}
+</script>
+"""
+
+_NOVOATACAREJO_TABLOIDE = """
+<div class="pdff-container df-container" $fonte style="width:1600px; height:900px; margin:40px auto; background:#555">
+  <div id="paginas" style="text-align:center; padding-top:20px"></div>
+</div>
+<div class="pdff-ui-page"><label for="df_book_page_number"></label></div>
+<div class="pdff-ui-btn pdff-ui-next pdff-ui-alt fa fa-chevron-right" title="Next Page" onclick="avancar()">&#8250;</div>
+<script>
+var PAGINAS = $paginas;
+var pagina = 1, total = PAGINAS.length;
+function desenhar() {
+  var nums = (pagina === 1 || pagina === total) ? [pagina] : [pagina, Math.min(pagina + 1, total)];
+  document.getElementById('paginas').innerHTML = nums.map(function (n) {
+    return '<img src="' + PAGINAS[n - 1] + '" style="height:840px">';
+  }).join('');
+  document.querySelector("label[for='df_book_page_number']").textContent = pagina + '/' + total;
+}
+function avancar() {
+  pagina = Math.min(total, pagina === 1 ? 2 : pagina + 2);
+  desenhar();
+}
+desenhar();
+</script>
+"""
+
+
+# --- Frangolândia: listagem JetEngine e galeria Elementor ---
+
+_FRANGOLANDIA_ITEM = """<a class="e-gallery-item elementor-gallery-item elementor-animated-content" href="$cheia"
+   data-elementor-open-lightbox="yes" onclick="return false;">
+  <div class="e-gallery-image elementor-gallery-item__image" data-thumbnail="$miniatura"></div>
+  <img src="$miniatura" width="300"></a>"""
+
+
+class SitesFalsos:
+    """
+    Servidor HTTP local com os sites falsos. `latencia` e `atraso_pagina` em
+    segundos; `paginas` por encarte, `jornais` por loja do Assaí.
+    """
+
+    def __init__(self, latencia: float = 0.05, atraso_pagina: float = 1.0, paginas: int = 4,
+                 jornais: int = 3, porta: int = 0):
+        self.latencia = latencia
+        self.atraso_pagina = atraso_pagina
+        self.paginas = paginas
+        self.jornais = jornais
+        self.porta = porta
+        self.bytes_servidos = {}
+        self.requisicoes = {}
+        self._arquivos = {}
+        self._lock = threading.Lock()
+        self._servidor = None
+
+    @property
+    def base(self) -> str:
+        return f"http://127.0.0.1:{self._servidor.server_port}"
+
+    def iniciar(self) -> str:
+        sites = self
+
+        class Manipulador(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                sites._atender(self)
+
+        self._servidor = ThreadingHTTPServer(("127.0.0.1", self.porta), Manipulador)
+        self._servidor.daemon_threads = True
+        threading.Thread(target=self._servidor.serve_forever, name="sites-falsos", daemon=True).start()
+        return self.base
+
+    def parar(self):
+        if self._servidor:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+
+    def variaveis(self) -> dict:
+        """{ASSAI_BASE_URL: ..., ...} apontando para este servidor."""
+        return {var: self.base + caminho for var, caminho in VAREJISTAS.values()}
+
+    def zerar_contadores(self):
+        with self._lock:
+            self.bytes_servidos.clear()
+            self.requisicoes.clear()
+
+    # --- arquivos gerados (guardados: a mesma URL devolve os mesmos bytes) ---
+
+    def _arquivo(self, caminho: str) -> tuple:
+        with self._lock:
+            if caminho in self._arquivos:
+                return self._arquivos[caminho]
+        if caminho.endswith(".pdf") or "Flyer/" in caminho:
+            conteudo = ("application/pdf", pdf_falso(caminho, self.paginas))
+        elif caminho.endswith(".png"):
+            conteudo = ("image/png", imagem_falsa(caminho, formato="PNG"))
+        else:
+            miniatura = re.search(r"-(\d+)x(\d+)\.\w+$", caminho)
+            largura, altura = (int(miniatura.group(1)), int(miniatura.group(2))) if miniatura else (1000, 1400)
+            conteudo = ("image/jpeg", imagem_falsa(re.sub(r"-\d+x\d+(?=\.\w+$)", "", caminho), largura, altura))
+        with self._lock:
+            self._arquivos[caminho] = conteudo
+        return conteudo
+
+    # --- rotas ---
+
+    def _atender(self, req):
+        time.sleep(self.latencia)
+        url = urlsplit(req.path)
+        caminho, query = url.path, parse_qs(url.query)
+        try:
+            resposta = self._rota(caminho, query, url.query)
+        except Exception as e:
+            resposta = (500, "text/plain", f"erro: {e}".encode())
+        if resposta is None:
+            resposta = (404, "text/plain", b"nao encontrado")
+        status, tipo, corpo = resposta
+        if isinstance(corpo, str):
+            corpo = corpo.encode("utf-8")
+            tipo += "; charset=utf-8"
+        # /img/<varejista>/... conta para o varejista
+        partes = caminho.strip("/").split("/")
+        varejista = partes[1] if partes[0] == "img" and len(partes) > 1 else partes[0] or "-"
+        with self._lock:
+            self.bytes_servidos[varejista] = self.bytes_servidos.get(varejista, 0) + len(corpo)
+            self.requisicoes[varejista] = self.requisicoes.get(varejista, 0) + 1
+        try:
+            req.send_response(status)
+            req.send_header("Content-Type", tipo)
+            req.send_header("Content-Length", str(len(corpo)))
+            req.send_header("Cache-Control", "max-age=3600")
+            req.end_headers()
+            req.wfile.write(corpo)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _rota(self, caminho: str, query: dict, query_bruta: str):
+        html = lambda titulo, corpo, **v: (200, "text/html", _pagina(titulo, corpo, **v))
+
+        if caminho.startswith("/terceiros/"):
+            time.sleep(self.atraso_pagina)
+            return 200, "application/javascript", "/* analytics */"
+        if re.search(r"\.(jpe?g|png|pdf)$", caminho) or "/Flyer/" in caminho:
+            return (200, *self._arquivo(caminho + ("?" + query_bruta if query_bruta else "")))
+
+        # Assaí
+        if caminho == "/assai/ofertas":
+            estados = "".join(f'<option value="{e}">{e}</option>' for e in LOJAS_ASSAI)
+            return html("Assaí - Ofertas", _ASSAI, estados=estados, validade=VALIDADE)
+        if caminho == "/assai/api/lojas":
+            estado, regiao = query.get("estado", [""])[0], query.get("regiao", [""])[0]
+            lojas = LOJAS_ASSAI.get(estado, {}).get(regiao, [])
+            return 200, "application/json", json.dumps([{"id": slug(l), "nome": l} for l in lojas])
+        if caminho == "/assai/api/jornais":
+            # Lojas do mesmo estado recebem os mesmos jornais (como no site real)
+            estado = slug(query.get("estado", [""])[0])
+            jornais = [[f"{self.base}/img/assai/{estado}_j{j}_p{p}.jpeg" for p in range(1, self.paginas + 1)]
+                       for j in range(1, self.jornais + 1)]
+            return 200, "application/json", json.dumps(jornais)
+
+        # Atacadão
+        if caminho == "/atacadao/institucional/nossas-lojas":
+            lojas = [{"name": loja, "url": f"/atacadao/loja/{slug(loja)}", "uf": uf, "cidade": cidade}
+                     for uf, cidades in LOJAS_ATACADAO.items() for cidade, nomes in cidades.items() for loja in nomes]
+            dados = json.dumps({"props": {"pageProps": {"lojas": lojas}}}, ensure_ascii=False)
+            ufs = "".join(f'<option value="{uf}">{uf}</option>' for uf in LOJAS_ATACADAO)
+            return html("Atacadão - Nossas lojas", _ATACADAO, ufs=ufs, dados=dados)
+        if caminho == "/atacadao/api/cidades":
+            return 200, "application/json", json.dumps(list(LOJAS_ATACADAO.get(query.get("uf", [""])[0], {})))
+        m = re.fullmatch(r"/atacadao/loja/([\w-]+)", caminho)
+        if m:
+            nome = next((l for c in LOJAS_ATACADAO.values() for ls in c.values() for l in ls if slug(l) == m.group(1)),
+                        None)
+            if nome is None:
+                return None
+            links = "".join(f'<a href="/atacadao/Flyer/?id={m.group(1)}-{i}">Encarte {i}</a>' for i in (1, 2))
+            return html(f"Atacadão {nome}", _ATACADAO_LOJA, nome=nome, links=links)
+
+        # Atakarejo
+        m = re.fullmatch(r"/atakarejo/cidades?/([\w-]+)/?", caminho)
+        if m:
+            cidade = m.group(1)
+            links = "".join(f'<a class="elementor-button button-download-ofertas" '
+                            f'href="/atakarejo/wp-content/uploads/2025/10/{cidade}-{i}.pdf">Baixar encarte {i}</a>'
+                            for i in (1, 2))
+            # Validade com a data num filho e texto depois, como no site real
+            return html("Atakarejo", "<h3>Ofertas da semana</h3>"
+                        "<h3>Validade: <strong>10/10/2025 a 16/10/2025</strong></h3>"
+                        "<p>Baixe o encarte em PDF</p>$links<p>Rua Tal, 123</p><p>Contato</p>", links=links)
+
+        # Cometa
+        if caminho == "/cometa/ofertas/":
+            paginas = [[f"/img/cometa/encarte{e}_p{p}.jpg" for p in range(1, self.paginas + 1)] for e in (1, 2)]
+            opcoes = json.dumps({"pages": [{"src": p} for p in paginas[0]]}).replace('"', "&quot;")
+            encartes = (f'<div class="real3dflipbook" style="cursor: pointer" data-flipbook-options="{opcoes}" '
+                        f'onclick="abrir(0)"><img src="{paginas[0][0]}" width="200"></div>'
+                        f'<div class="real3dflipbook" style="cursor: pointer" onclick="abrir(1)">'
+                        f'<img src="{paginas[1][0]}" width="200"></div>')
+            return html("Cometa - Ofertas", _COMETA, encartes=encartes, paginas=json.dumps(paginas))
+
+        # G. Barbosa (SE sem PDF de origem: captura por screenshots)
+        if caminho == "/gbarbosa/ofertas/":
+            ufs = ["AL", "SE", "BA"]
+            botoes = "".join(f'<button onclick="estado(\'{uf}\')">{uf}</button>' for uf in ufs)
+            fontes = {uf: f"/gbarbosa/encartes/{uf.lower()}.pdf" for uf in ufs if uf != "SE"}
+            paginas = {uf: [f"/img/gbarbosa/{uf.lower()}_p{p}.jpg" for p in range(1, self.paginas + 1)] for uf in ufs}
+            return html("G. Barbosa - Ofertas", _GBARBOSA, botoes=botoes,
+                        fontes=json.dumps(fontes), paginas=json.dumps(paginas))
+
+        # Novo Atacarejo (tabloide 2 sem PDF de origem: captura por screenshots)
+        if caminho == "/novoatacarejo/oferta/":
+            return html("Novo Atacarejo - Ofertas", _NOVOATACAREJO)
+        if caminho == "/novoatacarejo/api/tabloides":
+            cidade = query.get("cidade", [""])[0]
+            tabloides = "".join(f'<a href="/novoatacarejo/tabloide/{cidade}-{t}"><img src="/img/novoatacarejo/{cidade}-{t}_p1.jpg" '
+                                f'width="150"></a>' for t in (1, 2))
+            return 200, "text/html", f"<h6>Validade: 10/10 até 16/10/2025</h6><div id=\"tabloids\">{tabloides}</div>"
+        m = re.fullmatch(r"/novoatacarejo/tabloide/([\w-]+)", caminho)
+        if m:
+            paginas = [f"/img/novoatacarejo/{m.group(1)}_p{p}.jpg" for p in range(1, self.paginas + 1)]
+            fonte = f'source="/novoatacarejo/encartes/{m.group(1)}.pdf"' if m.group(1).endswith("-1") else ""
+            return html("Tabloide", _NOVOATACAREJO_TABLOIDE, fonte=fonte, paginas=json.dumps(paginas))
+
+        # Frangolândia
+        if caminho == "/frangolandia/encartes/":
+            links = "".join(f'<div class="jet-listing-grid__item"><a class="jet-engine-listing-overlay-link" '
+                            f'href="/frangolandia/encarte/semana-{n}/"></a><h2>Encarte {n}</h2></div>'
+                            for n in (1, 2, 3))
+            return html("Frangolândia - Encartes", "$links", links=links)
+        m = re.fullmatch(r"/frangolandia/encarte/([\w-]+)/", caminho)
+        if m:
+            base = f"/frangolandia/wp-content/uploads/2025/10/{m.group(1)}"
+            itens = "".join(Template(_FRANGOLANDIA_ITEM).substitute(
+                cheia=f"{base}-{p}.jpg", miniatura=f"{base}-{p}-300x420.jpg") for p in range(1, self.paginas + 1))
+            return html("Frangolândia - Encarte",
+                        '<a class="elementor-button"><span class="elementor-button-text">$validade</span></a>'
+                        '<div class="elementor-gallery__container">$itens</div>',
+                        validade="Válido de 10/10 a 16/10/2025", itens=itens)
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve os sites falsos dos varejistas.")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--latencia", type=float, default=50, help="latência de cada requisição, em ms")
+    parser.add_argument("--atraso-pagina", type=float, default=1000,
+                        help="quanto o script de terceiros segura o load de cada página, em ms")
+    parser.add_argument("--paginas", type=int, default=4, help="páginas por encarte")
+    parser.add_argument("--jornais", type=int, default=3, help="jornais por loja do Assaí")
+    args = parser.parse_args(argv)
+    sites = SitesFalsos(args.latencia / 1000, args.atraso_pagina / 1000, args.paginas, args.jornais, args.porta)
+    sites.iniciar()
+    print(f"Sites falsos em {sites.base}. Para usar com os scripts:")
+    for var, valor in sites.variaveis().items():
+        print(f"  export {var}={valor}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        sites.parar()
+
+
+if __name__ == "__main__":
+    main()
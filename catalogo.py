@@ -0,0 +1,120 @@
+"""
+Catálogo persistido das lojas de cada varejista: valores das opções dos
+<select> (estado -> região/cidade -> loja) e URLs das páginas de loja.
+
+Com o valor em cache a seleção é uma chamada só (select_by_value), sem
+percorrer as <option> pelo WebDriver nem comparar textos. Quando uma
+consulta falha o catálogo é refeito: as opções do select são lidas todas
+numa única chamada de JavaScript, ou uma função de atualização roda em
+segundo plano (atualizar_em_segundo_plano).
+"""
+import json
+import threading
+
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.support.ui import WebDriverWait, Select
+
+from analisador_html import normalizar_texto
+from pastas import CACHE_DIR, gravar_json
+
+
+class Catalogo:
+    def __init__(self, varejista: str):
+        self.varejista = varejista
+        self.caminho = CACHE_DIR / f"catalogo_{varejista}.json"
+        self._lock = threading.Lock()
+        self._atualizacao = None
+        self._alterado = False
+        try:
+            self._dados = json.loads(self.caminho.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self._dados = {}
+
+    @staticmethod
+    def _chave(chave) -> str:
+        return " | ".join(str(c or "") for c in chave)
+
+    def obter(self, chave):
+        with self._lock:
+            return self._dados.get(self._chave(chave))
+
+    def definir(self, chave, valor):
+        with self._lock:
+            k = self._chave(chave)
+            if self._dados.get(k) != valor:
+                self._dados[k] = valor
+                self._alterado = True
+
+    def remover(self, chave):
+        with self._lock:
+            if self._dados.pop(self._chave(chave), None) is not None:
+                self._alterado = True
+
+    def salvar(self):
+        with self._lock:
+            if not self._alterado:
+                return
+            # Grava sob o lock: nenhuma thread altera os dados no meio da serialização
+            gravar_json(self.caminho, self._dados)
+            self._alterado = False
+
+    def atualizar_em_segundo_plano(self, funcao):
+        """
+        Roda `funcao(catalogo)` numa thread e salva ao final. Se já houver
+        uma atualização rodando, não inicia outra.
+        """
+        with self._lock:
+            if self._atualizacao and self._atualizacao.is_alive():
+                return
+
+            def rodar():
+                try:
+                    funcao(self)
+                    self.salvar()
+                    print(f"[catalogo] Catálogo de {self.varejista} atualizado.")
+                except Exception as e:
+                    print(f"[catalogo] Falha ao atualizar o catálogo de {self.varejista}: {e}")
+
+            self._atualizacao = threading.Thread(target=rodar, name=f"catalogo-{self.varejista}", daemon=True)
+            self._atualizacao.start()
+
+    def aguardar_atualizacao(self, timeout: float = 30):
+        atualizacao = self._atualizacao
+        if atualizacao:
+            atualizacao.join(timeout)
+
+
+def opcoes_do_select(driver, select_el) -> list:
+    """[(texto, valor)] de todas as opções com valor, numa única chamada ao navegador."""
+    return [
+        (texto, valor) for texto, valor in driver.execute_script(
+            "return Array.prototype.map.call(arguments[0].options,"
+            " function (o) { return [o.text.trim(), o.value]; });", select_el)
+        if valor
+    ]
+
+def selecionar_por_catalogo(driver, select_el, catalogo: Catalogo, chave, texto: str, timeout: float = 10) -> bool:
+    """
+    Seleciona em `select_el` a opção correspondente a `texto`. Usa o valor
+    guardado em `chave` quando existe; senão (ou se ele não estiver mais no
+    select) lê todas as opções de uma vez, escolhe por texto exato ou
+    parcial, sem acento e sem caixa, e grava o valor no catálogo.
+    """
+    valor = catalogo.obter(chave)
+    if valor is not None:
+        try:
+            Select(select_el).select_by_value(valor)
+            return True
+        except NoSuchElementException:
+            print(f"  Catálogo desatualizado para '{texto}'; relendo as opções.")
+            catalogo.remover(chave)
+
+    opcoes = WebDriverWait(driver, timeout).until(lambda d: opcoes_do_select(d, select_el))
+    alvo = normalizar_texto(texto)
+    escolha = next((v for t, v in opcoes if normalizar_texto(t) == alvo), None) \
+        or next((v for t, v in opcoes if alvo in normalizar_texto(t)), None)
+    if escolha is None:
+        return False
+    Select(select_el).select_by_value(escolha)
+    catalogo.definir(chave, escolha)
+    return True
@@ -0,0 +1,115 @@
+"""
+Checkpoint de execução: quais unidades (loja, jornal, cidade) já terminaram
+e quais arquivos (url -> destino) já foram baixados. Cada marcação é gravada na hora (arquivo temporário + fsync + rename), então
+uma execução interrompida, mesmo sem chegar ao `finally`, é retomada da
+primeira unidade não concluída. Quando tudo termina sem falhas o checkpoint
+é apagado e a próxima execução começa do zero.
+
+O arquivo fica em CACHE_DIR/checkpoint_<varejista>.json. Checkpoints mais
+velhos que CHECKPOINT_HORAS (padrão 12) são ignorados; CHECKPOINT=0 desliga.
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from pastas import CACHE_DIR, gravar_json
+
+CHECKPOINT_ATIVO = os.environ.get("CHECKPOINT", "1") != "0"
+CHECKPOINT_HORAS = float(os.environ.get("CHECKPOINT_HORAS", "12"))
+
+
+class Checkpoint:
+    def __init__(self, varejista: str):
+        self.varejista = varejista
+        self.caminho = CACHE_DIR / f"checkpoint_{varejista}.json"
+        self._lock = threading.Lock()
+        self._unidades = {}
+        # destino -> url de cada download terminado na execução
+        self._arquivos = {}
+        if CHECKPOINT_ATIVO:
+            try:
+                if time.time() - self.caminho.stat().st_mtime < CHECKPOINT_HORAS * 3600:
+                    dados = json.loads(self.caminho.read_text(encoding="utf-8"))
+                    self._unidades = dados.get("unidades", {})
+                    self._arquivos = dados.get("arquivos", {})
+            except (OSError, ValueError):
+                pass
+        # Há uma execução anterior interrompida sendo retomada
+        self.retomando = bool(self._unidades or self._arquivos)
+        if self.retomando:
+            prontas = sum(1 for u in self._unidades.values() if u.get("ok"))
+            print(f"[checkpoint] Retomando {varejista}: {prontas} unidade(s) já concluída(s), "
+                  f"{len(self._arquivos)} arquivo(s) já baixado(s).")
+
+    def concluido(self, chave: str) -> bool:
+        with self._lock:
+            return bool(self._unidades.get(chave, {}).get("ok"))
+
+    def arquivo_pronto(self, url: str, caminho) -> bool:
+        """
+        Ao retomar, True se a execução interrompida baixou `url` para `caminho`.
+        Um arquivo que só existe no disco pode ser de uma semana anterior.
+        """
+        with self._lock:
+            baixado = self._arquivos.get(str(caminho)) == url
+        return baixado and Path(caminho).exists()
+
+    def marcar_arquivo(self, url: str, caminho):
+        """Registra que `url` terminou de baixar em `caminho`."""
+        if not CHECKPOINT_ATIVO:
+            return
+        with self._lock:
+            self._arquivos[str(caminho)] = url
+            self._gravar()
+
+    def marcar(self, chave: str, ok: bool = True, erro: str = None):
+        if not CHECKPOINT_ATIVO:
+            return
+        with self._lock:
+            self._unidades[chave] = {"ok": ok, "erro": erro, "quando": datetime.now().isoformat(timespec="seconds")}
+            self._gravar()
+
+    def _gravar(self):
+        # Chamado sob o lock: duas threads não podem publicar versões fora de ordem
+        gravar_json(self.caminho, {"varejista": self.varejista, "unidades": self._unidades,
+                                   "arquivos": self._arquivos})
+
+    def marcar_quando_concluir(self, chave: str, futuros: list):
+        """Marca `chave` quando todos os downloads em `futuros` terminarem (ok se todos deram certo)."""
+        if not futuros:
+            self.marcar(chave)
+            return
+        restantes = [len(futuros)]
+        lock = threading.Lock()
+
+        def terminou(_):
+            with lock:
+                restantes[0] -= 1
+                if restantes[0]:
+                    return
+            ok = all(f.exception() is None and f.result() for f in futuros)
+            self.marcar(chave, ok, None if ok else "download incompleto")
+
+        for futuro in futuros:
+            futuro.add_done_callback(terminou)
+
+    def finalizar(self, chaves):
+        """
+        Apaga o checkpoint se todas as `chaves` (as unidades esperadas nesta
+        execução) terminaram bem; senão mantém para a próxima execução retomar.
+        """
+        if not CHECKPOINT_ATIVO:
+            return
+        with self._lock:
+            pendentes = [(k, self._unidades.get(k, {}).get("erro") or "não concluída")
+                         for k in chaves if not self._unidades.get(k, {}).get("ok")]
+        if pendentes:
+            print(f"[checkpoint] {len(pendentes)} unidade(s) pendente(s) em {self.varejista}; "
+                  f"a próxima execução retoma a partir delas:")
+            for chave, erro in pendentes:
+                print(f"  {chave}: {erro}")
+            return
+        self.caminho.unlink(missing_ok=True)
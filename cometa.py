@@ -1,64 +1,42 @@
 import os
 import re
-import time
 from pathlib import Path
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from PIL import Image
-from io import BytesIO
+from navegador import criar_driver
+from esperas import (aguardar_dom_estavel, aguardar_mudanca_texto, aguardar_rede_ociosa,
+                     resumo as resumo_esperas)
+from imagens import ProcessadorImagens, escala_captura, formato_saida
+from downloads import FilaDownloads
+from flipbook import extensao_da_url, fontes_real3d
+from recortes import DetectorPagina
+from similaridade import IndicePerceptual, indexar_arquivos
+import telemetria
+from pastas import BASE_OUTPUT
 
 
 RESIZE_FACTOR = 2
+# Device scale factor da captura; igual a RESIZE_FACTOR, o 2x sai nativo e sem LANCZOS
+ESCALA = escala_captura("cometa")
+
+# A área da página é medida no visualizador aberto (ou no próprio screenshot), por layout
+DETECTOR_PAGINA = DetectorPagina(".flipbook-main-wrapper")
+
+BASE_URL = os.environ.get("COMETA_BASE_URL", "https://cometasupermercados.com.br/ofertas/")
+
+ROTULO_PAGINA = (By.CSS_SELECTOR, "div.flipbook-currentPageNumber")
+
+# "auto": baixa PDF/imagens originais do flipbook e só captura screenshots quando não há fontes.
+# "screenshot": sempre captura screenshots, como antes.
+COMETA_MODO = os.environ.get("COMETA_MODO", "auto")
 
-CROP_PADRAO = [{
-    "width": 557,
-    "height": 789,
-    "x": 681,
-    "y": 41,
-    "suffix": ""
-}]
-
-# 2. Recorte Spread (Páginas Duplas: 1101x799 @ 410, 34)
-CROP_SPREAD_UNICO = [{
-    "width": 1101,
-    "height": 799,
-    "x": 410,
-    "y": 34,
-    "suffix": "_spread"
-}]
-
-BASE_URL = "https://cometasupermercados.com.br/ofertas/"
-
-BASE_OUTPUT = Path(os.environ.get("OUTPUT_DIR", str(Path.cwd() / "Encartes"))).resolve()
 ENCARTE_DIR = (BASE_OUTPUT / "Cometa-Supermercados")
 ENCARTE_DIR.mkdir(parents=True, exist_ok=True)
 print(f"[cometa.py] Pasta base de saída: {ENCARTE_DIR}")
 
 def iniciar_driver():
-    options = webdriver.ChromeOptions()
-    options.add_argument("--headless=new")             
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--disable-features=VizDisplayCompositor")
-    options.add_argument("--window-size=1920,1080")     
-    options.add_argument("--lang=pt-BR,pt")
-    options.add_argument(
-        "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-    )
-    prefs = {
-        "download.prompt_for_download": False,
-        "download.default_directory": str(ENCARTE_DIR),
-        "download.directory_upgrade": True,
-        "safebrowsing.enabled": True
-    }
-    options.add_experimental_option("prefs", prefs)
-    driver = webdriver.Chrome(options=options)
-    driver.set_page_load_timeout(100) # Adicione esta linha!
-    return driver
+    return criar_driver("cometa", pasta_download=ENCARTE_DIR, escala=ESCALA)
 
 
 def obter_numero_e_tipo_pagina(wait: WebDriverWait) -> tuple[int, bool]:
@@ -85,122 +63,152 @@ def obter_numero_e_tipo_pagina(wait: WebDriverWait) -> tuple[int, bool]:
         raise Exception(f"Não foi possível determinar o número da página/tipo. Detalhe: {e}")
 
 def cortar_e_salvar_screenshot(pasta_destino: Path, nome_base: str, crop_settings):
+    # Só a captura roda aqui; recorte, 2x e gravação ficam com o pool de processos
     try:
-        png = driver.get_screenshot_as_png()
-        img = Image.open(BytesIO(png))
-
-        for crop in crop_settings:
-            w, h, x, y, suffix = crop["width"], crop["height"], crop["x"], crop["y"], crop["suffix"]
-
-            # 1. Aplica o corte (crop)
-            caixa_corte = (x, y, x + w, y + h)
-            img_cortada = img.crop(caixa_corte)
-            
-            # 2. Redimensiona em 2x (aumenta a resolução)
-            new_w = w * RESIZE_FACTOR
-            new_h = h * RESIZE_FACTOR
-            
-            try:
-                img_redimensionada = img_cortada.resize((new_w, new_h), Image.Resampling.LANCZOS)
-            except AttributeError:
-                img_redimensionada = img_cortada.resize((new_w, new_h), Image.LANCZOS)
-                
-            # 3. Salva a imagem redimensionada
-            nome_arquivo = f"{nome_base}{suffix}_2x.png"
-            arq_saida = pasta_destino / nome_arquivo
-            pasta_destino.mkdir(parents=True, exist_ok=True)
-            img_redimensionada.save(str(arq_saida))
-            print(f" Screenshot recortado e REDIMENSIONADO 2X salvo: {arq_saida} (Final: {new_w}x{new_h})")
-
+        with telemetria.span("screenshot"):
+            png = driver.get_screenshot_as_png()
+        processador.enviar(png, pasta_destino, nome_base, crop_settings, RESIZE_FACTOR, escala=ESCALA)
     except Exception as e:
         print(f"Erro ao cortar, redimensionar e salvar o screenshot: {e}")
 
 
-def processar_encartes():
-    global driver, wait
-    driver = iniciar_driver()
-    wait = WebDriverWait(driver, 35)
-    driver.get(BASE_URL)
-    time.sleep(7)
-
-    # 1. Encontra todos os encartes
-    encartes = driver.find_elements(
-        By.XPATH, '//div[contains(@class, "real3dflipbook") and contains(@style, "cursor: pointer")]'
-    )
-    total = len(encartes)
-    print(f"{total} encarte(s) encontrado(s).")
-
-    for i in range(total):
-        try:
-            print(f"\nProcessando encarte {i + 1} de {total}")
 
+def capturar_por_screenshots(i: int):
+    """Abre o encarte `i` no visualizador e captura página a página."""
+    try:
+        with telemetria.span("navegar", url=BASE_URL):
             driver.get(BASE_URL)
-            time.sleep(10)
+            aguardar_rede_ociosa(driver)
             encartes = driver.find_elements(
                 By.XPATH, '//div[contains(@class, "real3dflipbook") and contains(@style, "cursor: pointer")]'
             )
 
             # Clica no encarte para abrir o visualizador
             encartes[i].click()
-            time.sleep(10)
+            wait.until(EC.presence_of_element_located(ROTULO_PAGINA))
+            aguardar_rede_ociosa(driver, nome="abrir_encarte")
 
-            nome_pasta = f"encarte_{i+1}"
-            pasta_encarte = ENCARTE_DIR / nome_pasta
-            
-            while True:
-                try:
-                    # 1. LÊ O NÚMERO DA PÁGINA ANTES DO AVANÇO
-                    page_number_before_click, is_spread = obter_numero_e_tipo_pagina(wait)
+        nome_pasta = f"encarte_{i+1}"
+        pasta_encarte = ENCARTE_DIR / nome_pasta
 
-                    # 2. SELECIONA O RECORTE
+        while True:
+            try:
+                # 1. LÊ O NÚMERO DA PÁGINA ANTES DO AVANÇO
+                page_number_before_click, is_spread = obter_numero_e_tipo_pagina(wait)
+
+                # Recorte, screenshot e o processamento dela ficam no span da página
+                with telemetria.span("pagina", pagina=page_number_before_click, spread=is_spread):
+                    # 2. SELECIONA O RECORTE (medido uma vez por encarte e tipo de página)
+                    layout = (i, is_spread)
+                    recortes_atuais = DETECTOR_PAGINA.recorte(driver, layout)
                     if is_spread:
-                        recortes_atuais = CROP_SPREAD_UNICO
                         print(f"  Capturando Páginas {page_number_before_click}-{page_number_before_click+1} (Recorte Spread)...")
                     else:
-                        recortes_atuais = CROP_PADRAO
                         print(f"  Capturando Página {page_number_before_click} (Recorte Padrão)...")
-                    
+
                     # 3. Salva o screenshot com corte e 2x upscaling
                     nome_base = f"{nome_pasta}_pag{page_number_before_click}"
                     cortar_e_salvar_screenshot(pasta_encarte, nome_base, recortes_atuais)
 
-                    # 4. Tenta AVANÇAR
-                    btn_proximo = wait.until(
-                        EC.element_to_be_clickable(
-                            (By.XPATH, "//span[contains(@class, 'flipbook-right-arrow')]")
-                        )
+                # 4. Tenta AVANÇAR
+                btn_proximo = wait.until(
+                    EC.element_to_be_clickable(
+                        (By.XPATH, "//span[contains(@class, 'flipbook-right-arrow')]")
                     )
-                    
-                    # Tenta clicar no botão de próximo
-                    btn_proximo.click()
-                    time.sleep(10) # Espera a nova página carregar
-
-                    # 5. LÊ O NÚMERO DA PÁGINA DEPOIS DO AVANÇO
-                    # Usamos um try/except interno para lidar com a possibilidade de o elemento sumir
-                    try:
-                        page_number_after_click, _ = obter_numero_e_tipo_pagina(wait)
-                    except:
-                        # Se não conseguir ler a página depois do clique, assumimos que terminou.
-                        print("  Elemento de página não encontrado após clique. Fim do encarte.")
-                        break
-
-                    # 6. VERIFICA SE O AVANÇO OCORREU
-                    if page_number_after_click <= page_number_before_click:
-                        print(f"  Página não avançou ({page_number_after_click} <= {page_number_before_click}). Fim do encarte {i+1}.")
-                        break # Sai do loop while e passa para o próximo encarte
-
-                except Exception as e:
-                    # Este catch lida com a falha na localização do botão ou falha de conexão.
-                    # Se o botão 'próximo' não for encontrado, é o fim do encarte.
-                    print(f"  Finalizado o encarte {i+1}. Fim do documento. (Detalhe: {e})")
-                    break # Sai do loop while
-
-            print(f"Encarte {i+1} finalizado.")
-
-        except Exception as e:
-            print(f"Erro crítico ao processar encarte {i + 1}: {e}")
+                )
+                
+                # Tenta clicar no botão de próximo e espera o rótulo da página mudar
+                # (na última página ele não muda e a espera esgota rápido)
+                rotulo_antes = driver.find_element(*ROTULO_PAGINA).text.strip()
+                btn_proximo.click()
+                if aguardar_mudanca_texto(driver, ROTULO_PAGINA, rotulo_antes, nome="virar_pagina"):
+                    aguardar_rede_ociosa(driver, quieto=0.3, nome="carregar_pagina")
+                    aguardar_dom_estavel(driver, quieto=0.3)
+
+                # 5. LÊ O NÚMERO DA PÁGINA DEPOIS DO AVANÇO
+                # Usamos um try/except interno para lidar com a possibilidade de o elemento sumir
+                try:
+                    page_number_after_click, _ = obter_numero_e_tipo_pagina(wait)
+                except:
+                    # Se não conseguir ler a página depois do clique, assumimos que terminou.
+                    print("  Elemento de página não encontrado após clique. Fim do encarte.")
+                    break
+
+                # 6. VERIFICA SE O AVANÇO OCORREU
+                if page_number_after_click <= page_number_before_click:
+                    print(f"  Página não avançou ({page_number_after_click} <= {page_number_before_click}). Fim do encarte {i+1}.")
+                    break # Sai do loop while e passa para o próximo encarte
+
+            except Exception as e:
+                # Este catch lida com a falha na localização do botão ou falha de conexão.
+                # Se o botão 'próximo' não for encontrado, é o fim do encarte.
+                print(f"  Finalizado o encarte {i+1}. Fim do documento. (Detalhe: {e})")
+                break # Sai do loop while
+
+        print(f"Encarte {i+1} finalizado.")
+
+    except Exception as e:
+        print(f"Erro crítico ao processar encarte {i + 1}: {e}")
+
+def baixar_fontes(fila: FilaDownloads, fontes: dict, pasta_encarte: Path, nome_pasta: str) -> list:
+    """Envia para a fila os arquivos originais do encarte. Devolve os futuros (vazio se não há fontes)."""
+    if fontes["pdf"]:
+        return [fila.enviar(fontes["pdf"], pasta_encarte / f"{nome_pasta}.pdf")]
+    return [
+        fila.enviar(url, pasta_encarte / f"{nome_pasta}_pag{n}{extensao_da_url(url)}")
+        for n, url in enumerate(fontes["paginas"], start=1)
+    ]
+
+def processar_encartes():
+    global driver, wait, processador
+    # Aqui e não no topo: o pool de imagens reimporta este módulo nos processos filhos
+    telemetria.iniciar("cometa")
+    driver = iniciar_driver()
+    # Páginas salvas (hashes perceptuais), para apontar encartes repetidos entre execuções
+    indice = IndicePerceptual("cometa")
+    processador = ProcessadorImagens(formato=formato_saida("cometa"), indice=indice)
+    wait = WebDriverWait(driver, 35)
+    with telemetria.span("navegar", url=BASE_URL):
+        driver.get(BASE_URL)
+        aguardar_rede_ociosa(driver)
+
+    # 1. Encontra todos os encartes
+    with telemetria.span("descoberta"):
+        encartes = driver.find_elements(
+            By.XPATH, '//div[contains(@class, "real3dflipbook") and contains(@style, "cursor: pointer")]'
+        )
+    total = len(encartes)
+    print(f"{total} encarte(s) encontrado(s).")
+
+    # 2. Baixa os arquivos originais que o flipbook já conhece (PDF ou imagens das páginas)
+    fila = FilaDownloads(headers={"Referer": BASE_URL})
+    futuros = {}
+    if COMETA_MODO != "screenshot":
+        for i, encarte in enumerate(encartes):
+            nome_pasta = f"encarte_{i+1}"
+            with telemetria.span("encarte", encarte=i + 1):
+                with telemetria.span("descoberta"):
+                    fontes = fontes_real3d(driver, encarte)
+                enviados = baixar_fontes(fila, fontes, ENCARTE_DIR / nome_pasta, nome_pasta)
+            if enviados:
+                print(f"Encarte {i + 1}: {len(enviados)} arquivo(s) original(is) na fila de download.")
+                futuros[i] = enviados
+    fila.aguardar()
+    indexar_arquivos(indice, [d for _, d in fila.concluidos if d.suffix.lower() != ".pdf"])
+
+    # 3. Screenshots só para os encartes sem fontes ou cujo download falhou
+    for i in range(total):
+        if i in futuros and all(f.result() for f in futuros[i]):
+            continue
+        print(f"\nProcessando encarte {i + 1} de {total} (screenshots)")
+        with telemetria.span("encarte", encarte=i + 1, modo="screenshot"):
+            capturar_por_screenshots(i)
 
+    processador.aguardar()
     driver.quit()
+    indice.relatorio()
+    indice.salvar()
+    resumo_esperas()
     print("\nTodos os encartes foram processados.")
 
 if __name__ == "__main__":
@@ -0,0 +1,395 @@
+import asyncio
+import atexit
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait as aguardar_futuros
+from functools import partial
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import telemetria
+from armazem import publicar_arquivo, vincular
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+
+# (conexão, leitura) em segundos
+TIMEOUT_PADRAO = (10, 60)
+
+
+# Motor de downloads (MotorDownloads): total de downloads simultâneos, limite
+# e taxa (requisições/s, 0 = sem limite) por host, tentativas e backoff
+DOWNLOADS_SIMULTANEOS = int(os.environ.get("DOWNLOADS_SIMULTANEOS", "8"))
+DOWNLOADS_POR_HOST = int(os.environ.get("DOWNLOADS_POR_HOST", "4"))
+DOWNLOADS_TAXA_POR_HOST = float(os.environ.get("DOWNLOADS_TAXA_POR_HOST", "5"))
+DOWNLOADS_TENTATIVAS = int(os.environ.get("DOWNLOADS_TENTATIVAS", "5"))
+BACKOFF_BASE = 1.0
+BACKOFF_MAXIMO = 30.0
+
+# Tamanho de cada bloco gravado em disco; a memória usada não depende do tamanho do arquivo
+TAMANHO_BLOCO = 256 * 1024
+
+
+class DownloadIncompleto(IOError):
+    pass
+
+
+def nova_sessao(tamanho_pool: int = 10, headers: dict = None) -> requests.Session:
+    """Session com pool de conexões do tamanho do número de downloads simultâneos."""
+    sess = requests.Session()
+    adapter = HTTPAdapter(pool_connections=tamanho_pool, pool_maxsize=tamanho_pool)
+    sess.mount("http://", adapter)
+    sess.mount("https://", adapter)
+    sess.headers.update({"User-Agent": USER_AGENT})
+    if headers:
+        sess.headers.update(headers)
+    return sess
+
+
+def _validador(resp) -> str:
+    return resp.headers.get("ETag") or resp.headers.get("Last-Modified") or ""
+
+def _baixar_para_parcial(sessao, url: str, parcial: Path, timeout, headers: dict = None) -> int:
+    """Completa `parcial` com o conteúdo de `url`. Devolve o status HTTP da resposta."""
+    arquivo_validador = parcial.with_name(parcial.name + ".validador")
+    ja_baixado = parcial.stat().st_size if parcial.exists() else 0
+    validador = arquivo_validador.read_text() if arquivo_validador.exists() else ""
+
+    cabecalhos = dict(headers or {})
+    if ja_baixado and validador:
+        # If-Range: se o arquivo mudou no servidor, ele responde 200 com o arquivo inteiro
+        cabecalhos["Range"] = f"bytes={ja_baixado}-"
+        cabecalhos["If-Range"] = validador
+
+    with sessao.get(url, stream=True, timeout=timeout, headers=cabecalhos) as resp:
+        if resp.status_code == 416 and "Range" in cabecalhos:
+            # O .part já tinha o arquivo inteiro
+            total = resp.headers.get("Content-Range", "").rpartition("/")[2]
+            if total.isdigit() and int(total) == ja_baixado:
+                return resp.status_code
+            parcial.unlink(missing_ok=True)
+            raise DownloadIncompleto(f"Range recusado para {url}; recomeçando do zero")
+        resp.raise_for_status()
+
+        if resp.status_code == 206 and "Range" in cabecalhos:
+            modo = "ab"
+            print(f"  Retomando {parcial.name} a partir de {ja_baixado} bytes.")
+        else:
+            modo = "wb"
+            ja_baixado = 0
+            arquivo_validador.write_text(_validador(resp))
+
+        # Com Content-Encoding o iter_content devolve o corpo descompactado e o tamanho não bate
+        esperado = None
+        if resp.headers.get("Content-Length", "").isdigit() and \
+                resp.headers.get("Content-Encoding", "identity") == "identity":
+            esperado = ja_baixado + int(resp.headers["Content-Length"])
+
+        with open(parcial, modo) as f:
+            for bloco in resp.iter_content(TAMANHO_BLOCO):
+                f.write(bloco)
+            f.flush()
+            os.fsync(f.fileno())
+        status = resp.status_code
+
+    tamanho = parcial.stat().st_size
+    if esperado is not None and tamanho != esperado:
+        raise DownloadIncompleto(f"{url}: recebidos {tamanho} de {esperado} bytes")
+    if tamanho == 0:
+        parcial.unlink(missing_ok=True)
+        raise DownloadIncompleto(f"{url}: resposta vazia")
+    return status
+
+def baixar_arquivo(sessao, url: str, destino: Path, timeout=TIMEOUT_PADRAO, tentativas: int = 3,
+                   headers: dict = None) -> int:
+    """
+    Baixa `url` em blocos para `<destino>.part` e só então publica em `destino`
+    pelo armazém (armazem.py).
+    Se a conexão cair, a próxima tentativa (ou a próxima execução) continua de onde
+    parou via HTTP Range, quando o servidor aceita. Um arquivo no destino está
+    sempre completo. Devolve o status HTTP da resposta que completou o arquivo
+    (206 numa retomada, 416 se o .part já estava inteiro).
+    """
+    destino = Path(destino)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    parcial = destino.with_name(destino.name + ".part")
+
+    ultimo_erro = None
+    for tentativa in range(1, tentativas + 1):
+        try:
+            status = _baixar_para_parcial(sessao, url, parcial, timeout, headers)
+            publicar_arquivo(parcial, destino)
+            parcial.with_name(parcial.name + ".validador").unlink(missing_ok=True)
+            return status
+        except (requests.RequestException, IOError) as e:
+            ultimo_erro = e
+            if tentativa < tentativas:
+                print(f"  Tentativa {tentativa} de {url} falhou ({e}); tentando de novo...")
+    raise ultimo_erro
+
+
+def _status_http(erro) -> int:
+    resposta = getattr(erro, "response", None)
+    return resposta.status_code if resposta is not None else None
+
+def espera_para_nova_tentativa(erro, tentativa: int) -> float:
+    """
+    Segundos até a próxima tentativa, ou None se o erro não é transitório.
+    Só 5xx, 429, timeouts, conexões caídas e downloads incompletos são
+    repetidos, com backoff exponencial e jitter ("full jitter").
+    """
+    status = _status_http(erro)
+    if isinstance(erro, requests.HTTPError):
+        if status is None or not (status >= 500 or status == 429):
+            return None
+    elif not isinstance(erro, (requests.Timeout, requests.ConnectionError,
+                               requests.exceptions.ChunkedEncodingError, DownloadIncompleto)):
+        return None
+    espera = random.uniform(0, min(BACKOFF_MAXIMO, BACKOFF_BASE * 2 ** (tentativa - 1)))
+    retry_after = (erro.response.headers.get("Retry-After", "") if status else "").strip()
+    if retry_after.isdigit():
+        espera = max(espera, min(BACKOFF_MAXIMO, float(retry_after)))
+    return espera
+
+
+class BaldeTokens:
+    """Token bucket: no máximo `taxa` retiradas por segundo, com rajadas de até `capacidade`."""
+
+    def __init__(self, taxa: float, capacidade: float = None):
+        self.taxa = taxa
+        self.capacidade = capacidade or max(1.0, taxa)
+        self.tokens = self.capacidade
+        self.ultimo = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def retirar(self):
+        async with self._lock:
+            while True:
+                agora = time.monotonic()
+                self.tokens = min(self.capacidade, self.tokens + (agora - self.ultimo) * self.taxa)
+                self.ultimo = agora
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.taxa)
+
+
+class MotorDownloads:
+    """
+    Downloads concorrentes num event loop asyncio em thread própria. Cada
+    download roda `baixar_arquivo` (requests, com retomada por Range) num
+    pool de threads, sob o semáforo e o token bucket do host, e é repetido
+    com backoff quando o erro é transitório.
+
+    `enviar` devolve um concurrent.futures.Future com o registro do arquivo:
+    {"url", "destino", "ok", "tentativas", "bytes", "segundos", "status", "erro"}.
+    """
+
+    def __init__(self, simultaneos: int = None, por_host: int = None, taxa_por_host: float = None,
+                 tentativas: int = None):
+        self.simultaneos = simultaneos or DOWNLOADS_SIMULTANEOS
+        self.por_host = por_host or DOWNLOADS_POR_HOST
+        self.taxa_por_host = DOWNLOADS_TAXA_POR_HOST if taxa_por_host is None else taxa_por_host
+        self.tentativas = tentativas or DOWNLOADS_TENTATIVAS
+        self.sessao = nova_sessao(self.simultaneos)
+        self.resultados = []
+        self._lock = threading.Lock()
+        self._hosts = {}
+        self._executor = ThreadPoolExecutor(max_workers=self.simultaneos, thread_name_prefix="download")
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="motor-downloads", daemon=True)
+        self._thread.start()
+
+    def enviar(self, url: str, destino: Path, headers: dict = None, timeout=TIMEOUT_PADRAO) -> Future:
+        # O span de download fica pendurado no span (loja, página) de quem pediu
+        rastro = telemetria.capturar()
+        return asyncio.run_coroutine_threadsafe(self._baixar(url, Path(destino), headers, timeout, rastro),
+                                                self._loop)
+
+    def baixar_todos(self, itens, headers: dict = None, timeout=TIMEOUT_PADRAO) -> list:
+        """Baixa [(url, destino)] ao mesmo tempo e devolve os registros, na ordem de `itens`."""
+        futuros = [self.enviar(url, destino, headers, timeout) for url, destino in itens]
+        return [f.result() for f in futuros]
+
+    def _host(self, url: str):
+        # Só chamado dentro do loop: não precisa de lock
+        nome = urlsplit(url).hostname or ""
+        if nome not in self._hosts:
+            balde = BaldeTokens(self.taxa_por_host) if self.taxa_por_host > 0 else None
+            self._hosts[nome] = (asyncio.Semaphore(self.por_host), balde)
+        return self._hosts[nome]
+
+    async def _baixar(self, url: str, destino: Path, headers: dict, timeout, rastro: dict = None) -> dict:
+        semaforo, balde = self._host(url)
+        inicio = time.perf_counter()
+        registro = {"url": url, "destino": destino, "ok": False, "tentativas": 0, "bytes": 0,
+                    "segundos": 0.0, "status": None, "erro": None}
+        async with semaforo:
+            while True:
+                registro["tentativas"] += 1
+                if balde:
+                    await balde.retirar()
+                try:
+                    status = await self._loop.run_in_executor(
+                        self._executor,
+                        partial(baixar_arquivo, self.sessao, url, destino, timeout, 1, headers))
+                    registro.update(ok=True, status=status, erro=None, bytes=destino.stat().st_size)
+                    break
+                except Exception as e:
+                    registro.update(status=_status_http(e), erro=str(e))
+                    espera = espera_para_nova_tentativa(e, registro["tentativas"])
+                    if espera is None or registro["tentativas"] >= self.tentativas:
+                        break
+                    print(f"  Tentativa {registro['tentativas']} de {url} falhou ({e}); "
+                          f"nova tentativa em {espera:.1f}s...")
+                    await asyncio.sleep(espera)
+        registro["segundos"] = time.perf_counter() - inicio
+        telemetria.registrar_span("download", registro["segundos"], rastro, erro=registro["erro"], url=url,
+                                  bytes=registro["bytes"], tentativas=registro["tentativas"],
+                                  status=registro["status"])
+        with self._lock:
+            self.resultados.append(registro)
+        return registro
+
+    def relatorio(self):
+        with self._lock:
+            resultados = list(self.resultados)
+        if not resultados:
+            return
+        ok = [r for r in resultados if r["ok"]]
+        repetidos = sum(1 for r in resultados if r["tentativas"] > 1)
+        print(f"\nMotor de downloads: {len(ok)} de {len(resultados)} arquivo(s), "
+              f"{sum(r['bytes'] for r in ok) / 1024 / 1024:.1f} MB, {repetidos} com nova(s) tentativa(s).")
+
+    def fechar(self):
+        if not self._loop.is_running():
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+        self._loop.close()
+
+
+_MOTOR = None
+_LOCK_MOTOR = threading.Lock()
+
+def motor_compartilhado() -> MotorDownloads:
+    """O motor do processo: os limites por host valem para todos os downloads do script."""
+    global _MOTOR
+    with _LOCK_MOTOR:
+        if _MOTOR is None:
+            _MOTOR = MotorDownloads()
+            atexit.register(_MOTOR.fechar)
+        return _MOTOR
+
+
+class FilaDownloads:
+    """
+    Baixa arquivos em segundo plano pelo motor de downloads, para o
+    navegador não ficar parado esperando cada download. `aguardar()` espera
+    a fila esvaziar e imprime as falhas por URL.
+
+    Cada URL é baixada uma vez por execução: se ela voltar para outro
+    destino (outra loja com o mesmo jornal), o destino é ligado ao arquivo
+    já baixado em vez de ir à rede de novo.
+    """
+
+    def __init__(self, motor: MotorDownloads = None, timeout=TIMEOUT_PADRAO, headers: dict = None,
+                 pular_existentes: bool = False):
+        self.motor = motor or motor_compartilhado()
+        self.timeout = timeout
+        self.headers = headers
+        # Ao retomar uma execução: o arquivo final só existe se o download terminou
+        self.pular_existentes = pular_existentes
+        self.concluidos = []
+        self.falhas = []
+        self.vinculados = []
+        self.resultados = []
+        self._por_url = {}
+        self._futuros = []
+        self._lock = threading.Lock()
+
+    def enviar(self, url: str, destino: Path):
+        destino = Path(destino)
+        futuro = Future()
+        with self._lock:
+            original = self._por_url.get(url)
+            if original is None:
+                self._por_url[url] = futuro
+            self._futuros.append(futuro)
+
+        if original is not None:
+            # Mesma URL já enviada: liga o destino ao arquivo quando o download original terminar
+            original.add_done_callback(lambda f: self._vincular(f, url, destino, futuro))
+        elif self.pular_existentes and destino.exists():
+            print(f"  Encarte {destino.name} já baixado.")
+            with self._lock:
+                self.concluidos.append((url, destino))
+            futuro.set_result(destino)
+        else:
+            download = self.motor.enviar(url, destino, self.headers, self.timeout)
+            download.add_done_callback(lambda f: self._concluir(f, url, destino, futuro))
+        return futuro
+
+    def _concluir(self, download: Future, url: str, destino: Path, futuro: Future):
+        try:
+            registro = download.result()
+        except Exception as e:
+            registro = {"url": url, "destino": destino, "ok": False, "erro": str(e)}
+        with self._lock:
+            self.resultados.append(registro)
+            if registro["ok"]:
+                self.concluidos.append((url, destino))
+            else:
+                self.falhas.append((url, registro["erro"]))
+        if registro["ok"]:
+            print(f"  Encarte {destino.name} salvo.")
+            futuro.set_result(destino)
+        else:
+            print(f"Falha no download: {url} ({registro['erro']})")
+            futuro.set_result(None)
+
+    def _vincular(self, original: Future, url: str, destino: Path, futuro: Future):
+        origem = original.result()
+        if origem is None:
+            # A falha já foi registrada pelo download original
+            futuro.set_result(None)
+            return
+        try:
+            if origem != destino:
+                vincular(origem, destino)
+            print(f"  Encarte {destino.name} reaproveitado de {origem.parent.name}/{origem.name}.")
+            with self._lock:
+                self.concluidos.append((url, destino))
+                self.vinculados.append((url, destino))
+            futuro.set_result(destino)
+        except Exception as e:
+            print(f"Falha ao reaproveitar {origem} em {destino}: {e}")
+            with self._lock:
+                self.falhas.append((url, str(e)))
+            futuro.set_result(None)
+
+    def aguardar(self):
+        """Espera todos os downloads enviados terminarem e retorna a lista de falhas."""
+        # Vínculos entram na lista enquanto os originais terminam: espera até ela parar de crescer
+        while True:
+            with self._lock:
+                pendentes = [f for f in self._futuros if not f.done()]
+            if not pendentes:
+                break
+            aguardar_futuros(pendentes)
+        print(f"\nDownloads: {len(self.concluidos)} concluído(s) ({len(self.vinculados)} reaproveitado(s) "
+              f"sem baixar de novo), {len(self.falhas)} falha(s).")
+        repetidos = sum(1 for r in self.resultados if r.get("tentativas", 1) > 1)
+        if repetidos:
+            print(f"  {repetidos} download(s) precisaram de nova(s) tentativa(s).")
+        for url, motivo in self.falhas:
+            print(f"  FALHA {url}: {motivo}")
+        return self.falhas
@@ -0,0 +1,196 @@
+"""
+Esperas por prontidão da página, no lugar dos time.sleep fixos.
+
+Cada espera devolve assim que a condição é satisfeita. O tempo limite é
+adaptativo: começa no máximo informado e, depois de algumas medições, passa
+a ser 3x o p95 do que aquela condição realmente levou (sem sair de
+[minimo, maximo]). Uma condição que esgota o tempo AMOSTRAS_MINIMAS vezes
+seguidas (uma página com polling ou analytics nunca fica com a rede ociosa)
+passa a esperar só o mínimo, até ser satisfeita de novo. Um tempo esgotado
+não é erro: a função devolve False e o script segue como seguiria depois do
+sleep antigo.
+
+Todas as medições ficam em ESTATISTICAS; `resumo()` imprime o total (e,
+com ESPERAS_JSON, grava as estatísticas nesse arquivo, para o bench/).
+"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.support.ui import WebDriverWait
+
+import telemetria
+
+INTERVALO = 0.1
+AMOSTRAS_MINIMAS = 5
+
+_lock = threading.Lock()
+_historico = defaultdict(lambda: deque(maxlen=50))
+# nome -> esperas esgotadas desde a última satisfeita
+_esgotadas_seguidas = defaultdict(int)
+
+# nome -> {"chamadas", "esgotadas", "total", "maximo"}
+ESTATISTICAS = defaultdict(lambda: {"chamadas": 0, "esgotadas": 0, "total": 0.0, "maximo": 0.0})
+
+
+def timeout_adaptativo(nome: str, minimo: float, maximo: float) -> float:
+    with _lock:
+        amostras = sorted(_historico[nome])
+        esgotadas = _esgotadas_seguidas[nome]
+    if esgotadas >= AMOSTRAS_MINIMAS:
+        # A condição nunca é satisfeita nesta página: esperar mais não adianta
+        return minimo
+    if len(amostras) < AMOSTRAS_MINIMAS:
+        return maximo
+    p95 = amostras[min(len(amostras) - 1, int(len(amostras) * 0.95))]
+    return max(minimo, min(maximo, p95 * 3))
+
+def registrar(nome: str, segundos: float, ok: bool, maximo: float):
+    with _lock:
+        # Uma espera esgotada conta como o máximo, para o limite voltar a subir
+        _historico[nome].append(segundos if ok else maximo)
+        _esgotadas_seguidas[nome] = 0 if ok else _esgotadas_seguidas[nome] + 1
+        est = ESTATISTICAS[nome]
+        est["chamadas"] += 1
+        est["esgotadas"] += 0 if ok else 1
+        est["total"] += segundos
+        est["maximo"] = max(est["maximo"], segundos)
+
+def _esperar(driver, nome: str, condicao, timeout, minimo: float, maximo: float):
+    limite = timeout or timeout_adaptativo(nome, minimo, maximo)
+    inicio = time.monotonic()
+    resultado = None
+    with telemetria.span("espera", condicao=nome) as s:
+        try:
+            resultado = WebDriverWait(driver, limite, poll_frequency=INTERVALO,
+                                      ignored_exceptions=(WebDriverException,)).until(condicao)
+        except TimeoutException:
+            s["atributos"]["esgotada"] = True
+    registrar(nome, time.monotonic() - inicio, resultado is not None, maximo)
+    return resultado
+
+def resumo():
+    if not ESTATISTICAS:
+        return
+    print("\nTempo gasto em esperas:")
+    with _lock:
+        if os.environ.get("ESPERAS_JSON"):
+            with open(os.environ["ESPERAS_JSON"], "w", encoding="utf-8") as f:
+                json.dump(ESTATISTICAS, f, indent=1)
+        for nome, est in sorted(ESTATISTICAS.items(), key=lambda i: -i[1]["total"]):
+            media = est["total"] / est["chamadas"]
+            print(f"  {nome:<22} {est['chamadas']:4d}x  total {est['total']:7.1f}s  "
+                  f"média {media:5.2f}s  máx {est['maximo']:5.2f}s  esgotadas {est['esgotadas']}")
+
+
+_JS_DOM_ESTAVEL = """
+if (!window.__esperasDom) {
+    window.__esperasDom = performance.now();
+    new MutationObserver(function () { window.__esperasDom = performance.now(); })
+        .observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+}
+return performance.now() - window.__esperasDom;
+"""
+
+def aguardar_dom_estavel(driver, quieto: float = 0.5, timeout: float = None,
+                         minimo: float = 1.0, maximo: float = 10.0, nome: str = "dom_estavel") -> bool:
+    """Espera o DOM passar `quieto` segundos sem nenhuma mutação."""
+    condicao = lambda d: d.execute_script(_JS_DOM_ESTAVEL) >= quieto * 1000 or None
+    return bool(_esperar(driver, nome, condicao, timeout, minimo, maximo))
+
+
+_JS_REDE_OCIOSA = """
+if (!window.__esperasRede) {
+    var rede = window.__esperasRede = {pendentes: 0, ultima: performance.now()};
+    var marcar = function () { rede.ultima = performance.now(); };
+    var origFetch = window.fetch;
+    if (origFetch) {
+        window.fetch = function () {
+            rede.pendentes++; marcar();
+            return origFetch.apply(this, arguments).finally(function () { rede.pendentes--; marcar(); });
+        };
+    }
+    var origSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        rede.pendentes++; marcar();
+        this.addEventListener('loadend', function () { rede.pendentes--; marcar(); });
+        return origSend.apply(this, arguments);
+    };
+    try {
+        new PerformanceObserver(function () { marcar(); }).observe({type: 'resource', buffered: true});
+    } catch (e) {}
+}
+var r = window.__esperasRede;
+if (document.readyState !== 'complete' || r.pendentes > 0) return -1;
+return performance.now() - r.ultima;
+"""
+
+def aguardar_rede_ociosa(driver, quieto: float = 0.5, timeout: float = None,
+                         minimo: float = 1.0, maximo: float = 5.0, nome: str = "rede_ociosa") -> bool:
+    """
+    Espera o documento carregar e a rede ficar `quieto` segundos sem
+    requisições novas (recursos, fetch e XHR). O máximo é curto (os sleeps
+    que ela substitui eram de 1 a 3 s): quando um elemento específico basta,
+    prefira esperar por ele.
+    """
+    condicao = lambda d: d.execute_script(_JS_REDE_OCIOSA) >= quieto * 1000 or None
+    return bool(_esperar(driver, nome, condicao, timeout, minimo, maximo))
+
+
+_JS_IMAGENS = """
+var raiz = arguments[0] || document;
+var imgs = raiz.tagName === 'IMG' ? [raiz] : Array.prototype.slice.call(raiz.querySelectorAll('img'));
+var prontas = true;
+imgs.forEach(function (img) {
+    if (!img.complete || img.naturalWidth === 0) { prontas = false; return; }
+    if (img.__esperasDecodificada) return;
+    prontas = false;
+    if (!img.__esperasDecodificando && img.decode) {
+        img.__esperasDecodificando = true;
+        img.decode().then(function () { img.__esperasDecodificada = true; },
+                          function () { img.__esperasDecodificada = true; });
+    } else if (!img.decode) {
+        img.__esperasDecodificada = true;
+    }
+});
+return prontas;
+"""
+
+def aguardar_imagens(driver, elemento=None, timeout: float = None,
+                     minimo: float = 1.0, maximo: float = 10.0, nome: str = "imagens") -> bool:
+    """Espera todas as <img> de `elemento` (ou da página) estarem carregadas e decodificadas."""
+    condicao = lambda d: d.execute_script(_JS_IMAGENS, elemento) or None
+    return bool(_esperar(driver, nome, condicao, timeout, minimo, maximo))
+
+
+_JS_POSICAO = "var r = arguments[0].getBoundingClientRect(); return [r.x, r.y, r.width, r.height];"
+
+def aguardar_elemento_parado(driver, elemento, timeout: float = None,
+                             minimo: float = 0.5, maximo: float = 3.0, nome: str = "elemento_parado") -> bool:
+    """Espera o elemento parar de se mover (fim de scroll suave ou animação)."""
+    ultima = []
+
+    def condicao(d):
+        atual = d.execute_script(_JS_POSICAO, elemento)
+        parado = atual == ultima[-1] if ultima else False
+        ultima.append(atual)
+        return parado or None
+
+    return bool(_esperar(driver, nome, condicao, timeout, minimo, maximo))
+
+
+def aguardar_mudanca_texto(driver, localizador, anterior: str, timeout: float = None,
+                           minimo: float = 1.0, maximo: float = 10.0, nome: str = "mudanca_texto"):
+    """
+    Espera o texto do elemento em `localizador` ficar diferente de `anterior`
+    (ex.: o rótulo de página de um flipbook depois de virar a página).
+    Devolve o texto novo, ou None se não mudou dentro do tempo.
+    """
+    def condicao(d):
+        texto = d.find_element(*localizador).text.strip()
+        return texto if texto and texto != anterior else None
+
+    return _esperar(driver, nome, condicao, timeout, minimo, maximo)
@@ -0,0 +1,144 @@
+"""
+Leitura das fontes originais (PDF ou imagens de página) dos visualizadores
+de flipbook, para baixá-las direto em vez de capturar screenshots.
+"""
+import json
+from pathlib import PurePosixPath
+from urllib.parse import urljoin, urlparse
+
+from downloads import motor_compartilhado
+
+# Coleta as opções do Real3D FlipBook de um elemento `div.real3dflipbook`.
+# Dependendo da versão do plugin elas ficam no atributo data-flipbook-options,
+# numa variável global com o id do elemento ou em variáveis real3dflipbook_N.
+_JS_OPCOES_REAL3D = """
+var el = arguments[0];
+var lidas = [];
+var ler = function (v) {
+    if (!v) return;
+    if (typeof v === 'string') { try { v = JSON.parse(v); } catch (e) { return; } }
+    if (typeof v === 'object') lidas.push(v);
+};
+ler(el.getAttribute('data-flipbook-options'));
+ler(el.getAttribute('data-options'));
+if (el.id) { ler(window[el.id]); ler(window[el.id + '_options']); }
+var todos = Array.prototype.slice.call(document.querySelectorAll('.real3dflipbook'));
+var indice = todos.indexOf(el);
+// Só as numeradas, pelo número: real3dflipbook_10 vem depois de real3dflipbook_9, não de _1
+var numero = function (k) { return parseInt(/\\d+$/.exec(k)[0], 10); };
+var globais = Object.keys(window).filter(function (k) { return /^real3dflipbook_?\\d+$/i.test(k); })
+    .sort(function (a, b) { return numero(a) - numero(b); });
+if (!lidas.length && indice >= 0 && globais[indice]) ler(window[globais[indice]]);
+return JSON.stringify(lidas.map(function (o) {
+    return {pdfUrl: o.pdfUrl || o.pdf || null,
+            pages: (o.pages || []).map(function (p) { return typeof p === 'string' ? p : (p.src || null); })};
+}));
+"""
+
+
+def extensao_da_url(url: str, padrao: str = ".jpg") -> str:
+    sufixo = PurePosixPath(urlparse(url).path).suffix.lower()
+    return sufixo if sufixo and len(sufixo) <= 5 else padrao
+
+def fontes_real3d(driver, elemento) -> dict:
+    """
+    Devolve {"pdf": url ou None, "paginas": [urls]} a partir das opções do
+    Real3D FlipBook do elemento. As listas vêm vazias se nada for encontrado.
+    """
+    fontes = {"pdf": None, "paginas": []}
+    try:
+        opcoes = json.loads(driver.execute_script(_JS_OPCOES_REAL3D, elemento) or "[]")
+    except Exception as e:
+        print(f"  Não foi possível ler as opções do flipbook: {e}")
+        return fontes
+
+    base = driver.current_url
+    for o in opcoes:
+        if o.get("pdfUrl") and not fontes["pdf"]:
+            fontes["pdf"] = urljoin(base, o["pdfUrl"])
+        paginas = [urljoin(base, p) for p in o.get("pages") or [] if p]
+        if paginas and not fontes["paginas"]:
+            fontes["paginas"] = paginas
+    return fontes
+
+
+# Contêineres dos visualizadores dFlip/DearFlip e do pdff-ui
+SELETOR_FLIPBOOK = "._df_book, ._df_thumb, ._df_button, .df-element, .df-container, .pdff-container, .pdff-element"
+
+# Procura o PDF de origem de visualizadores dFlip/DearFlip (e derivados como o
+# pdff-ui), sempre dentro dos contêineres de SELETOR_FLIPBOOK: atributos
+# source/data-source do contêiner ou de um filho, as opções globais
+# option_<id> do contêiner, iframes com ?file= e, por último, links .pdf.
+# PDFs e iframes soltos na página (regulamento, política de privacidade) não
+# contam: sem fonte no visualizador o chamador segue com os screenshots.
+_JS_FONTES_DFLIP = """
+var seletorFlipbook = arguments[0];
+var achados = [];
+var add = function (v) { if (typeof v === 'string' && /\\.pdf([?#]|$)/i.test(v.trim())) achados.push(v.trim()); };
+var attrs = ['source', 'data-source', 'data-pdf', 'data-pdf-src', 'data-file'];
+// O contêiner e os elementos dentro dele que casam com `seletor`
+var dentro = function (c, seletor) {
+    var els = Array.prototype.slice.call(c.querySelectorAll(seletor));
+    if (c.matches(seletor)) els.unshift(c);
+    return els;
+};
+// Visualizadores visíveis primeiro: a página pode ter outros encartes escondidos
+var conteineres = Array.prototype.slice.call(document.querySelectorAll(seletorFlipbook));
+conteineres.sort(function (a, b) { return (b.getClientRects().length > 0) - (a.getClientRects().length > 0); });
+conteineres.forEach(function (c) {
+    dentro(c, '[source],[data-source],[data-pdf],[data-pdf-src],[data-file]').forEach(function (el) {
+        attrs.forEach(function (a) { add(el.getAttribute(a)); });
+    });
+});
+conteineres.forEach(function (c) {
+    dentro(c, '[id]').forEach(function (el) {
+        [window['option_' + el.id], window['df_option_' + el.id]].forEach(function (o) {
+            if (o && typeof o === 'object') { add(o.source); add(o.pdf); add(o.file); }
+        });
+    });
+});
+conteineres.forEach(function (c) {
+    dentro(c, 'iframe[src]').forEach(function (f) {
+        try { add(new URL(f.src, location.href).searchParams.get('file')); } catch (e) {}
+        add(f.getAttribute('src'));
+    });
+});
+conteineres.forEach(function (c) {
+    dentro(c, 'a[href]').forEach(function (a) { add(a.getAttribute('href')); });
+});
+return achados;
+"""
+
+
+def fonte_pdf_dflip(driver) -> str:
+    """URL absoluta do PDF por trás do flipbook aberto na página, ou None."""
+    try:
+        candidatos = driver.execute_script(_JS_FONTES_DFLIP, SELETOR_FLIPBOOK) or []
+    except Exception as e:
+        print(f"  Não foi possível procurar o PDF do flipbook: {e}")
+        return None
+    base = driver.current_url
+    for url in candidatos:
+        # URLs que vêm de JSON embutido no HTML chegam com as barras escapadas
+        url = url.replace("\\/", "/")
+        if url.lower().startswith(("blob:", "data:", "javascript:")):
+            continue
+        return urljoin(base, url)
+    return None
+
+def baixar_pdf_dflip(driver, destino) -> bool:
+    """
+    Baixa de uma vez o PDF de origem do flipbook aberto no driver.
+    Devolve False se o PDF não foi encontrado ou o download falhou,
+    para o chamador seguir com os screenshots.
+    """
+    url = fonte_pdf_dflip(driver)
+    if not url:
+        print("  PDF de origem do flipbook não encontrado; usando screenshots.")
+        return False
+    r = motor_compartilhado().enviar(url, destino, headers={"Referer": driver.current_url}).result()
+    if not r["ok"]:
+        print(f"  Falha ao baixar o PDF de origem {url}: {r['erro']}; usando screenshots.")
+        return False
+    print(f"  PDF de origem baixado: {destino} ({url})")
+    return True
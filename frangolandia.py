@@ -1,42 +1,65 @@
 import os
 import re
-import time
-import requests
-from pathlib import Path
-from selenium import webdriver
+from concurrent.futures import ThreadPoolExecutor
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from navegador import criar_driver
+from esperas import (aguardar_dom_estavel, aguardar_elemento_parado, aguardar_imagens,
+                     resumo as resumo_esperas)
+from downloads import motor_compartilhado, nova_sessao
+import analisador_html
+from armazem import publicar_bytes
+from flipbook import extensao_da_url
+from manifesto import Manifesto
+import telemetria
+from pastas import BASE_OUTPUT
 
-BASE_URL = "https://frangolandia.com/encartes/"
+BASE_URL = os.environ.get("FRANGOLANDIA_BASE_URL", "https://frangolandia.com/encartes/")
 
-BASE_OUTPUT = Path(os.environ.get("OUTPUT_DIR", str(Path.cwd() / "Encartes"))).resolve()
 ENCARTE_DIR = BASE_OUTPUT / "Frangolandia"
 ENCARTE_DIR.mkdir(parents=True, exist_ok=True)
 print(f"[frangolandia.py] Pasta base de saída: {ENCARTE_DIR}")
 
+# "auto": lê a listagem e as galerias por HTTP, vários encartes ao mesmo tempo,
+# e só abre o Chrome para o que não resolver. "navegador": sempre pelo Chrome.
+FRANGOLANDIA_MODO = os.environ.get("FRANGOLANDIA_MODO", "auto")
+FRANGOLANDIA_PARALELO = int(os.environ.get("FRANGOLANDIA_PARALELO", "4"))
+
+SELETOR_GALERIA = "a.e-gallery-item.elementor-gallery-item.elementor-animated-content"
+
+# Atributos de cada link da galeria e do <img> dentro dele, numa ida só ao navegador
+_JS_ATRIBUTOS_GALERIA = """
+function atributos(el) {
+    var o = {};
+    if (el) for (var i = 0; i < el.attributes.length; i++) o[el.attributes[i].name] = el.attributes[i].value;
+    return o;
+}
+return Array.from(document.querySelectorAll(arguments[0])).map(function (a) {
+    return {attrs: atributos(a), img: atributos(a.querySelector('img'))};
+});
+"""
+
+# Validade e imagens da última execução bem-sucedida de cada encarte
+MANIFESTO = Manifesto("frangolandia")
+
+# Spans por fase (telemetria.py), gravados no fim da execução
+telemetria.iniciar("frangolandia")
+
 def build_headless_chrome():
-    options = webdriver.ChromeOptions()
-    prefs = {
-        "download.prompt_for_download": False,
-        "plugins.always_open_pdf_externally": True
-    }
-    options.add_experimental_option("prefs", prefs)
-    options.add_argument("--headless=new")
-    options.add_argument("--window-size=1920,1080")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--disable-features=VizDisplayCompositor")
-    options.add_argument("--lang=pt-BR,pt")
-    options.add_argument(
-        "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-    )
-    return webdriver.Chrome(options=options)
-
-driver = build_headless_chrome()
-wait = WebDriverWait(driver, 15)
+    # Com imagens: sem o download, a página é salva pelo screenshot do <img>
+    return criar_driver("frangolandia", pdf_externo=True)
+
+# O Chrome só é aberto quando algum encarte não resolve por HTTP (ver garantir_navegador)
+driver = None
+wait = None
+
+def garantir_navegador():
+    global driver, wait
+    if driver is None:
+        driver = build_headless_chrome()
+        wait = WebDriverWait(driver, 15)
 
 def slugify(txt: str) -> str:
     txt = re.sub(r'[\\/*?:"<>|\s]+', '_', (txt or '').strip())
@@ -51,83 +74,208 @@ def encontrar_data():
         )
     except Exception:
         return "sem_data"
-    
+
     for div in enc_data:
         texto = (div.text or "").strip()
         if texto:
             return slugify(texto)
     return "sem_data"
 
+def nome_do_encarte(url: str) -> str:
+    return slugify(url.rstrip('/').split('/')[-1] or "encarte")
+
+def urls_em_tamanho_cheio(itens, base_url: str) -> list:
+    """URLs das imagens originais de [{"attrs", "img"}] dos links da galeria, sem repetir."""
+    urls = []
+    for item in itens:
+        url = analisador_html.imagem_em_tamanho_cheio(item["attrs"], base_url, item.get("img"))
+        if url and url not in urls:
+            urls.append(url)
+    return urls
+
 def coleta_encartes():
-    driver.get(BASE_URL)
-    time.sleep(3)
-    encartes = driver.find_elements(By.CSS_SELECTOR, "a.jet-engine-listing-overlay-link")
-    links = [e.get_attribute("href") for e in encartes if e.get_attribute("href")]
+    if FRANGOLANDIA_MODO != "navegador":
+        try:
+            with telemetria.span("navegar", url=BASE_URL, modo="http"):
+                resp = nova_sessao().get(BASE_URL, timeout=20)
+                resp.raise_for_status()
+            with telemetria.span("descoberta", modo="http"):
+                links = [l["href"] for l in analisador_html.links(resp.text, BASE_URL)
+                         if "jet-engine-listing-overlay-link" in l["classes"]]
+                links = list(dict.fromkeys(links))
+            if links:
+                print(f"{len(links)} link(s) de encarte encontrados na listagem (HTTP).")
+                return links
+            print(" Listagem sem encartes no HTML; usando o navegador.")
+        except Exception as e:
+            print(f" Listagem indisponível por HTTP ({e}); usando o navegador.")
+
+    garantir_navegador()
+    with telemetria.span("navegar", url=BASE_URL):
+        driver.get(BASE_URL)
+    with telemetria.span("descoberta"):
+        try:
+            encartes = wait.until(EC.presence_of_all_elements_located(
+                (By.CSS_SELECTOR, "a.jet-engine-listing-overlay-link")))
+        except TimeoutException:
+            encartes = []
+        links = [e.get_attribute("href") for e in encartes if e.get_attribute("href")]
     print(f"{len(links)} link(s) de encarte encontrados na listagem.")
     return links
 
-def processar_encartes(links):
-    session = requests.Session()
-    session.headers.update({
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                      "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-    })
+def baixar_encarte(nome_base: str, validade: str, urls_galeria: list) -> bool:
+    """Baixa as imagens originais do encarte ao mesmo tempo. True se todas foram salvas (ou já estavam)."""
+    if MANIFESTO.inalterado(nome_base, validade, urls_galeria):
+        print(f" {nome_base}: validade e imagens inalteradas desde a última execução; pulando.")
+        return True
+
+    pasta_destino = ENCARTE_DIR / nome_base
+    pasta_destino.mkdir(parents=True, exist_ok=True)
+    print(f" Pasta do encarte: {pasta_destino} ({len(urls_galeria)} imagem(ns))")
+
+    itens = [(url, pasta_destino / f"{nome_base}_{i}{extensao_da_url(url)}")
+             for i, url in enumerate(urls_galeria, start=1)]
+    arquivos = []
+    for r in motor_compartilhado().baixar_todos(itens, timeout=20):
+        if r["ok"]:
+            print(f" Imagem baixada: {r['destino']}")
+            arquivos.append(r["destino"])
+        else:
+            print(f" Erro no download de {r['url']}: {r['erro']}")
+
+    if len(arquivos) != len(itens):
+        return False
+    MANIFESTO.registrar(nome_base, validade, urls_galeria, arquivos)
+    return True
+
+def processar_encarte_http(sessao, url: str) -> bool:
+    """Galeria lida do HTML, sem navegador. False se a página não trouxe a galeria."""
+    with telemetria.span("encarte", encarte=nome_do_encarte(url), modo="http"):
+        try:
+            with telemetria.span("navegar", url=url, modo="http"):
+                resp = sessao.get(url, timeout=20)
+                resp.raise_for_status()
+        except Exception as e:
+            print(f" {url} indisponível por HTTP: {e}")
+            return False
+
+        with telemetria.span("descoberta", modo="http"):
+            coletor = analisador_html.analisar(resp.text)
+            itens = [l for l in coletor.links if "e-gallery-item" in l["attrs"].get("class", "").split()]
+            urls_galeria = urls_em_tamanho_cheio(itens, url)
+            if not urls_galeria:
+                return False
 
-    for url in links:
+            textos = [t for t in analisador_html.textos_da_classe(resp.text, "elementor-button-text") if t]
+            validade = slugify(textos[0]) if textos else "sem_data"
+        print(f"\nEncarte {url} (HTTP): {len(urls_galeria)} imagem(ns)")
         try:
-            driver.get(url)
-            print(f"\nAcessando: {url}")
-            time.sleep(3)
+            baixar_encarte(nome_do_encarte(url), validade, urls_galeria)
+        except Exception as e:
+            print(f" Erro ao processar {url}: {e}")
+        return True
 
-            galeria_itens = driver.find_elements(
-                By.CSS_SELECTOR, "a.e-gallery-item.elementor-gallery-item.elementor-animated-content"
-            )
-            for item in galeria_itens:
-                try:
-                    driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", item)
-                    time.sleep(0.2)
-                    item.click()
-                    time.sleep(1)
-                except Exception as click_err:
-                    print(f" Falha ao clicar no item da galeria: {click_err}")
-
-            imagens = driver.find_elements(By.CSS_SELECTOR, "img[src*='uploads/20']")
-            if not imagens:
-                print(" Nenhuma imagem de encarte encontrada.")
-                continue
-
-            nome_base = slugify(url.rstrip('/').split('/')[-1] or "encarte")
-            pasta_destino = ENCARTE_DIR / nome_base
-            pasta_destino.mkdir(parents=True, exist_ok=True)
-            print(f" Pasta do encarte: {pasta_destino}")
-
-            for i, img in enumerate(imagens, start=1):
-                src = img.get_attribute("src")
-                caminho = pasta_destino / f"{nome_base}_{i}.jpg"
-
-                baixou = False
-                if src:
-                    try:
-                        resp = session.get(src, timeout=20)
-                        if resp.status_code == 200 and resp.content:
-                            with open(caminho, "wb") as f:
-                                f.write(resp.content)
-                            print(f" Imagem baixada: {caminho}")
-                            baixou = True
-                        else:
-                            print(f" Download falhou ({resp.status_code}) para: {src}")
-                    except Exception as req_err:
-                        print(f" Erro no download de {src}: {req_err}")
-
-                if not baixou:
-                    try:
-                        driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", img)
-                        time.sleep(0.3)
-                        img.screenshot(str(caminho))
-                        print(f" Screenshot salva: {caminho}")
-                    except Exception as screenshot_err:
-                        print(f" Falha ao salvar imagem: {screenshot_err}")
+def processar_galeria_clicando(nome_base: str, validade: str, urls_galeria: list):
+    """
+    Caminho antigo, para galerias que não expõem as imagens originais:
+    abre cada item, lê os <img> carregados e salva o screenshot dos que
+    não baixarem.
+    """
+    with telemetria.span("descoberta", modo="cliques"):
+        galeria_itens = driver.find_elements(By.CSS_SELECTOR, SELETOR_GALERIA)
+        for item in galeria_itens:
+            try:
+                driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", item)
+                aguardar_elemento_parado(driver, item)
+                item.click()
+                aguardar_dom_estavel(driver, quieto=0.3, nome="item_galeria")
+            except Exception as click_err:
+                print(f" Falha ao clicar no item da galeria: {click_err}")
+
+        imagens = driver.find_elements(By.CSS_SELECTOR, "img[src*='uploads/20']")
+    if not imagens:
+        print(" Nenhuma imagem de encarte encontrada.")
+        return
+
+    pasta_destino = ENCARTE_DIR / nome_base
+    pasta_destino.mkdir(parents=True, exist_ok=True)
+    print(f" Pasta do encarte: {pasta_destino}")
 
+    # Baixa todas as imagens do encarte ao mesmo tempo; as que falharem viram screenshot do <img>
+    srcs = [img.get_attribute("src") for img in imagens]
+    caminhos = [pasta_destino / f"{nome_base}_{i}{extensao_da_url(src or '')}"
+                for i, src in enumerate(srcs, start=1)]
+    resultados = motor_compartilhado().baixar_todos([(src, c) for src, c in zip(srcs, caminhos) if src],
+                                                    timeout=20)
+    baixados = {r["destino"] for r in resultados if r["ok"]}
+    for r in resultados:
+        if r["ok"]:
+            print(f" Imagem baixada: {r['destino']}")
+        else:
+            print(f" Erro no download de {r['url']}: {r['erro']}")
+
+    arquivos = []
+    for pagina, (img, caminho) in enumerate(zip(imagens, caminhos), start=1):
+        if caminho in baixados:
+            arquivos.append(caminho)
+            continue
+        # O screenshot é PNG, qualquer que seja o formato da imagem original
+        caminho = caminho.with_suffix(".png")
+        try:
+            with telemetria.span("screenshot", pagina=pagina):
+                driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", img)
+                aguardar_elemento_parado(driver, img)
+                aguardar_imagens(driver, img)
+                png = img.screenshot_as_png
+            publicar_bytes(png, caminho)
+            print(f" Screenshot salva: {caminho}")
+            arquivos.append(caminho)
+        except Exception as screenshot_err:
+            print(f" Falha ao salvar imagem: {screenshot_err}")
+
+    if len(arquivos) == len(imagens):
+        MANIFESTO.registrar(nome_base, validade, urls_galeria, arquivos)
+
+def processar_encarte_navegador(url: str):
+    garantir_navegador()
+    with telemetria.span("navegar", url=url):
+        driver.get(url)
+        print(f"\nAcessando: {url}")
+        try:
+            wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, SELETOR_GALERIA)))
+        except TimeoutException:
+            print(" Galeria não apareceu na página.")
+        aguardar_dom_estavel(driver, quieto=0.3, nome="galeria")
+
+    nome_base = nome_do_encarte(url)
+    with telemetria.span("descoberta"):
+        validade = encontrar_data()
+        itens = driver.execute_script(_JS_ATRIBUTOS_GALERIA, SELETOR_GALERIA) or []
+        hrefs = [i["attrs"].get("href") for i in itens if i["attrs"].get("href")]
+        urls_galeria = urls_em_tamanho_cheio(itens, driver.current_url)
+    if urls_galeria:
+        baixar_encarte(nome_base, validade, urls_galeria)
+        return
+
+    if MANIFESTO.inalterado(nome_base, validade, hrefs):
+        print(" Validade e imagens inalteradas desde a última execução; pulando.")
+        return
+    processar_galeria_clicando(nome_base, validade, hrefs)
+
+def processar_encartes(links):
+    pendentes = list(links)
+    if FRANGOLANDIA_MODO != "navegador" and pendentes:
+        sessao = nova_sessao(FRANGOLANDIA_PARALELO)
+        with ThreadPoolExecutor(max_workers=FRANGOLANDIA_PARALELO, thread_name_prefix="encarte") as pool:
+            resolvidos = list(pool.map(lambda url: processar_encarte_http(sessao, url), pendentes))
+        pendentes = [url for url, ok in zip(pendentes, resolvidos) if not ok]
+        if pendentes:
+            print(f"\n{len(pendentes)} encarte(s) sem galeria no HTML; usando o navegador.")
+
+    for url in pendentes:
+        try:
+            with telemetria.span("encarte", encarte=nome_do_encarte(url)):
+                processar_encarte_navegador(url)
         except Exception as e:
             print(f" Erro ao processar {url}: {e}")
 
@@ -138,4 +286,7 @@ try:
 except Exception as e:
     print(f" Erro geral: {e}")
 finally:
-    driver.quit()
+    MANIFESTO.salvar()
+    if driver is not None:
+        driver.quit()
+        resumo_esperas()
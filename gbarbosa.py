@@ -1,14 +1,17 @@
 import os
 import re
-import time
-from pathlib import Path
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-
-BASE_URL = "https://blog.gbarbosa.com.br/ofertas/"
-BASE_OUTPUT = Path(os.environ.get("OUTPUT_DIR", str(Path.cwd() / "Encartes"))).resolve()
+from navegador import criar_driver
+from esperas import aguardar_dom_estavel, aguardar_imagens, aguardar_rede_ociosa, resumo as resumo_esperas
+from armazem import publicar_bytes
+from flipbook import baixar_pdf_dflip
+import telemetria
+from pastas import BASE_OUTPUT
+
+BASE_URL = os.environ.get("GBARBOSA_BASE_URL", "https://blog.gbarbosa.com.br/ofertas/")
 DOWNLOAD_BASE = BASE_OUTPUT / "G-Barbosa"
 DOWNLOAD_BASE.mkdir(parents=True, exist_ok=True)
 print(f"[gbarbosa.py] Pasta base de saída: {DOWNLOAD_BASE}")
@@ -18,13 +21,16 @@ os.makedirs(DOWNLOAD_BASE, exist_ok=True)
 estados_para_baixar = ["AL", "SE", "BA"]
 
 MAX_PAGES_TO_SCROLL = 15  
-SCROLL_PAUSE_TIME = 3    
 
-options = webdriver.ChromeOptions()
-options.add_argument("--start-maximized")
+# "auto": baixa o PDF de origem do dFlip e só captura screenshots se não achar.
+# "screenshot": sempre captura página a página, como antes.
+GBARBOSA_MODO = os.environ.get("GBARBOSA_MODO", "auto")
+SCROLL_PAUSE_TIME = 3    
 
+# Spans por fase (telemetria.py), gravados no fim da execução
+telemetria.iniciar("gbarbosa")
 
-driver = webdriver.Chrome(options=options)
+driver = criar_driver("gbarbosa", headless=False)
 wait = WebDriverWait(driver, 40) # Tempo de espera
 
 
@@ -43,13 +49,16 @@ def capturar_encarte(driver: webdriver.Chrome, state_sigla: str, page_number: in
             
             print(f"   -- Movendo o elemento da página {page_number} para visualização...")
             driver.execute_script("arguments[0].scrollIntoView(true);", page_element)
-            time.sleep(10) 
+            aguardar_imagens(driver, page_element)
+            aguardar_dom_estavel(driver, quieto=0.3)
             
-            timestamp = time.strftime("%Y%m%d_%H%M%S")
-            file_name = f"GBarbosa_{state_sigla}_Pag{page_number}_{timestamp}.png"
+            # Nome fixo por estado e página: o armazém reaproveita o arquivo quando o encarte não mudou
+            file_name = f"GBarbosa_{state_sigla}_Pag{page_number}.png"
             output_path = DOWNLOAD_BASE / file_name
             
-            page_element.screenshot(str(output_path))
+            with telemetria.span("screenshot"):
+                png = page_element.screenshot_as_png
+            publicar_bytes(png, output_path)
             print(f"Screenshot da página {page_number} do estado {state_sigla} salvo.")
             return True
         else:
@@ -63,24 +72,33 @@ def capturar_encarte(driver: webdriver.Chrome, state_sigla: str, page_number: in
 
 def baixar_estado(sigla_estado):
     print(f"\n--- Iniciando Baixando encartes do estado: {sigla_estado} ---")
-    driver.get(BASE_URL)
-    time.sleep(10)
+    with telemetria.span("navegar", url=BASE_URL):
+        driver.get(BASE_URL)
+        aguardar_rede_ociosa(driver)
 
     try:
-        print(f"1. Clicando no botão do estado: {sigla_estado}")
-        botao_estado = wait.until(EC.element_to_be_clickable(
-            (By.XPATH, f'//button[text()="{sigla_estado}"]'))
-        )
-        botao_estado.click()
-        time.sleep(10) 
-
-        print("2. Buscando e clicando no botão 'Ver Encarte'...")
-        
-        ver_encarte_btn = wait.until(EC.element_to_be_clickable(
-            (By.XPATH, '//button[@class="encarte-button" and text()="Ver Encarte"]')
-        ))
-        ver_encarte_btn.click()
-        time.sleep(10) 
+        with telemetria.span("selecionar_loja"):
+            print(f"1. Clicando no botão do estado: {sigla_estado}")
+            botao_estado = wait.until(EC.element_to_be_clickable(
+                (By.XPATH, f'//button[text()="{sigla_estado}"]'))
+            )
+            botao_estado.click()
+            aguardar_rede_ociosa(driver)
+
+            print("2. Buscando e clicando no botão 'Ver Encarte'...")
+
+            ver_encarte_btn = wait.until(EC.element_to_be_clickable(
+                (By.XPATH, '//button[@class="encarte-button" and text()="Ver Encarte"]')
+            ))
+            ver_encarte_btn.click()
+            wait.until(EC.presence_of_element_located(
+                (By.XPATH, '//div[contains(@class, "df-page-content") and contains(@class, "df-content-loaded")]')
+            ))
+            aguardar_rede_ociosa(driver, nome="abrir_encarte")
+
+        if GBARBOSA_MODO != "screenshot":
+            if baixar_pdf_dflip(driver, DOWNLOAD_BASE / f"GBarbosa_{sigla_estado}.pdf"):
+                return
 
         print(f"3. Iniciando scroll e captura (máx. {MAX_PAGES_TO_SCROLL} páginas)...")
         
@@ -92,7 +110,8 @@ def baixar_estado(sigla_estado):
         
         for page_num in range(1, MAX_PAGES_TO_SCROLL + 1):
             
-            captured = capturar_encarte(driver, sigla_estado, page_number=page_num)
+            with telemetria.span("pagina", pagina=page_num):
+                captured = capturar_encarte(driver, sigla_estado, page_number=page_num)
             
             if not captured and page_num > 1:
                 print("Fim do encarte detectado ou erro de carregamento. Parando a captura.")
@@ -103,18 +122,21 @@ def baixar_estado(sigla_estado):
                 
                 driver.execute_script("window.scrollBy(0, window.innerHeight);")
 
-                time.sleep(SCROLL_PAUSE_TIME) 
+                aguardar_dom_estavel(driver, maximo=SCROLL_PAUSE_TIME, nome="rolagem")
 
     except Exception as e:
         print(f"Erro fatal durante a extração do estado {sigla_estado}: {e}")
     finally:
-        driver.get(BASE_URL)
-        time.sleep(10)
+        with telemetria.span("navegar", url=BASE_URL):
+            driver.get(BASE_URL)
+            aguardar_rede_ociosa(driver)
 
 
 if __name__ == "__main__":
     for estado in estados_para_baixar:
-        baixar_estado(estado)
+        with telemetria.span("estado", estado=estado):
+            baixar_estado(estado)
 
     driver.quit()
+    resumo_esperas()
     print("\nProcesso de captura de encartes do GBarbosa concluído.")
\ No newline at end of file
@@ -0,0 +1,211 @@
+"""
+Pós-processamento dos screenshots (decodificar, recortar, ampliar, gravar)
+num pool de processos, fora da thread que controla o navegador.
+
+Os bytes do PNG vão para os processos por memória compartilhada, sem
+serem copiados pelo pipe do multiprocessing. A fila é limitada: se o
+processamento ficar para trás, `enviar` bloqueia a captura até abrir vaga.
+
+O formato de saída é configurável por varejista (FORMATO_SAIDA_<VAREJISTA>
+ou FORMATO_SAIDA): png, png-otimizado, webp (sem perdas), webp-lossy[:qualidade]
+ou jpeg[:qualidade]. Ex.: FORMATO_SAIDA_COMETA=jpeg:88.
+
+Captura nativa: com ESCALA_CAPTURA (ou ESCALA_CAPTURA_<VAREJISTA>) = 2, o
+padrão, o Chrome já renderiza a página em 2x (navegador.aplicar_escala); os
+recortes, definidos em pixels CSS, são escalados e a ampliação LANCZOS deixa
+de existir. ESCALA_CAPTURA=1 volta a capturar em 1x e ampliar.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait as aguardar_futuros
+from io import BytesIO
+from multiprocessing import get_context, shared_memory
+from pathlib import Path
+
+from PIL import Image
+
+import telemetria
+from armazem import publicar_bytes
+from recortes import caixa_da_pagina, sufixo_da_caixa
+from similaridade import hashes
+
+QUALIDADE_PADRAO = 85
+
+# formato -> (extensão, opções do Image.save, aceita transparência)
+ENCODERS = {
+    "png": (".png", {"format": "PNG"}, True),
+    "png-otimizado": (".png", {"format": "PNG", "optimize": True}, True),
+    "webp": (".webp", {"format": "WEBP", "lossless": True, "method": 4}, True),
+    "webp-lossy": (".webp", {"format": "WEBP", "method": 4}, True),
+    "jpeg": (".jpg", {"format": "JPEG", "optimize": True, "progressive": True}, False),
+}
+
+
+def escala_captura(varejista: str) -> float:
+    return float(os.environ.get(f"ESCALA_CAPTURA_{varejista.upper()}")
+                 or os.environ.get("ESCALA_CAPTURA") or 2)
+
+def formato_saida(varejista: str) -> str:
+    return (os.environ.get(f"FORMATO_SAIDA_{varejista.upper()}")
+            or os.environ.get("FORMATO_SAIDA") or "png")
+
+def encoder(formato: str):
+    """(extensão, opções do Image.save, aceita transparência) para 'nome' ou 'nome:qualidade'."""
+    nome, _, qualidade = formato.strip().lower().partition(":")
+    if nome not in ENCODERS:
+        raise ValueError(f"Formato de saída desconhecido: {formato} (opções: {', '.join(ENCODERS)})")
+    extensao, opcoes, alfa = ENCODERS[nome]
+    opcoes = dict(opcoes)
+    if nome in ("webp-lossy", "jpeg"):
+        opcoes["quality"] = int(qualidade or QUALIDADE_PADRAO)
+    return extensao, opcoes, alfa
+
+def codificar(img, formato: str) -> tuple:
+    """Codifica `img` no formato pedido. Devolve (bytes, extensão)."""
+    extensao, opcoes, alfa = encoder(formato)
+    if not alfa and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    buffer = BytesIO()
+    img.save(buffer, **opcoes)
+    return buffer.getvalue(), extensao
+
+def processar_screenshot(png: bytes, pasta_destino: Path, nome_base: str, crop_settings, fator: int,
+                         formato: str = "png", escala: float = 1) -> list:
+    """
+    Recorta cada área de `crop_settings` (em pixels CSS; o screenshot foi
+    capturado com device scale factor `escala`), leva ao tamanho final de
+    `fator` vezes o recorte e grava no formato pedido. Se a captura já tem
+    essa resolução, nada é redimensionado. Recortes {"auto": True} procuram
+    a página no próprio screenshot (recortes.caixa_da_pagina).
+    Devolve um dicionário por recorte: arquivo, largura, altura, bytes,
+    segundos (de codificação), segundos_recorte (recorte e ampliação),
+    ampliado e hashes (perceptuais, do recorte).
+    """
+    img = Image.open(BytesIO(png))
+    salvos = []
+
+    for crop in crop_settings:
+        inicio_recorte = time.perf_counter()
+        # 1. Aplica o corte (crop), convertendo as coordenadas para os pixels da captura
+        if crop.get("auto"):
+            caixa = caixa_da_pagina(img) or (0, 0, img.width, img.height)
+            suffix = sufixo_da_caixa(caixa[2] - caixa[0], caixa[3] - caixa[1])
+        else:
+            w, h, x, y, suffix = crop["width"], crop["height"], crop["x"], crop["y"], crop["suffix"]
+            caixa = (round(x * escala), round(y * escala), round((x + w) * escala), round((y + h) * escala))
+        img_cortada = img.crop(caixa)
+
+        # 2. Redimensiona (aumenta a resolução) só se a captura não veio no tamanho final
+        new_w = round(img_cortada.width / escala * fator)
+        new_h = round(img_cortada.height / escala * fator)
+        ampliado = img_cortada.size != (new_w, new_h)
+        if not ampliado:
+            img_redimensionada = img_cortada
+        else:
+            try:
+                img_redimensionada = img_cortada.resize((new_w, new_h), Image.Resampling.LANCZOS)
+            except AttributeError:
+                img_redimensionada = img_cortada.resize((new_w, new_h), Image.LANCZOS)
+
+        segundos_recorte = time.perf_counter() - inicio_recorte
+
+        # 3. Codifica e salva a imagem redimensionada
+        inicio = time.perf_counter()
+        dados, extensao = codificar(img_redimensionada, formato)
+        segundos = time.perf_counter() - inicio
+        arq_saida = Path(pasta_destino) / f"{nome_base}{suffix}_2x{extensao}"
+        publicar_bytes(dados, arq_saida)
+        salvos.append({"arquivo": arq_saida, "largura": new_w, "altura": new_h, "bytes": len(dados),
+                       "segundos": segundos, "segundos_recorte": segundos_recorte, "ampliado": ampliado,
+                       "hashes": hashes(img_cortada)})
+
+    return salvos
+
+def _processar_da_memoria(nome_memoria: str, tamanho: int, *args) -> list:
+    memoria = shared_memory.SharedMemory(name=nome_memoria)
+    try:
+        png = bytes(memoria.buf[:tamanho])
+    finally:
+        memoria.close()
+    return processar_screenshot(png, *args)
+
+
+class ProcessadorImagens:
+    def __init__(self, processos: int = None, max_pendentes: int = None, formato: str = "png", indice=None):
+        encoder(formato)  # formato inválido falha já aqui, não em cada página
+        self.formato = formato
+        self.indice = indice  # similaridade.IndicePerceptual onde as páginas gravadas são registradas
+        self.arquivos = 0
+        self.bytes = 0
+        self.segundos_codificacao = 0.0
+        self.erros = 0
+        self._lock_relatorio = threading.Lock()
+        processos = processos or int(os.environ.get("IMAGENS_PROCESSOS") or os.cpu_count() or 2)
+        # spawn: o processo principal já tem threads (downloads, selenium) e fork com threads não é seguro
+        self._pool = ProcessPoolExecutor(max_workers=processos, mp_context=get_context("spawn"))
+        self._vagas = threading.BoundedSemaphore(max_pendentes or processos * 2)
+        self._futuros = []
+
+    def enviar(self, png: bytes, pasta_destino: Path, nome_base: str, crop_settings, fator: int,
+               escala: float = 1):
+        self._vagas.acquire()
+        memoria = None
+        try:
+            memoria = shared_memory.SharedMemory(create=True, size=len(png))
+            memoria.buf[:len(png)] = png
+            futuro = self._pool.submit(_processar_da_memoria, memoria.name, len(png),
+                                       Path(pasta_destino), nome_base, crop_settings, fator, self.formato, escala)
+        except Exception:
+            self._liberar(memoria)
+            raise
+        rastro = telemetria.capturar()
+        futuro.add_done_callback(lambda f: self._concluir(f, memoria, rastro))
+        self._futuros.append(futuro)
+        return futuro
+
+    def _liberar(self, memoria):
+        if memoria is not None:
+            memoria.close()
+            memoria.unlink()
+        self._vagas.release()
+
+    def _concluir(self, futuro, memoria, rastro: dict = None):
+        self._liberar(memoria)
+        try:
+            for salvo in futuro.result():
+                # Medidos no processo do pool; os spans ficam no span de quem enviou o screenshot
+                telemetria.registrar_span("recorte", salvo["segundos_recorte"], rastro,
+                                          fim=time.time() - salvo["segundos"], ampliado=salvo["ampliado"])
+                telemetria.registrar_span("codificacao", salvo["segundos"], rastro, formato=self.formato,
+                                          bytes=salvo["bytes"])
+                with self._lock_relatorio:
+                    self.arquivos += 1
+                    self.bytes += salvo["bytes"]
+                    self.segundos_codificacao += salvo["segundos"]
+                acao = "REDIMENSIONADO" if salvo["ampliado"] else "capturado nativo em"
+                print(f" Screenshot recortado e {acao} 2X salvo: {salvo['arquivo']} "
+                      f"(Final: {salvo['largura']}x{salvo['altura']}, {salvo['bytes'] / 1024:.0f} KB, "
+                      f"codificado em {salvo['segundos'] * 1000:.0f} ms)")
+                if self.indice is not None:
+                    parecido = self.indice.adicionar(salvo["arquivo"], salvo["hashes"])
+                    if parecido:
+                        print(f"  Página quase idêntica a {parecido}")
+        except Exception as e:
+            with self._lock_relatorio:
+                self.erros += 1
+            print(f"Erro ao cortar, redimensionar e salvar o screenshot: {e}")
+
+    def aguardar(self):
+        """Espera todos os screenshots enviados serem gravados e encerra o pool."""
+        aguardar_futuros(self._futuros)
+        self._pool.shutdown(wait=True)
+        self.relatorio()
+
+    def relatorio(self):
+        if not self.arquivos:
+            return
+        print(f"\nImagens ({self.formato}): {self.arquivos} arquivo(s), "
+              f"{self.bytes / 1024 / 1024:.1f} MB no total, média {self.bytes / self.arquivos / 1024:.0f} KB; "
+              f"codificação {self.segundos_codificacao:.1f}s no total, "
+              f"média {self.segundos_codificacao / self.arquivos * 1000:.0f} ms por arquivo")
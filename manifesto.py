@@ -0,0 +1,156 @@
+"""
+Manifesto das execuções: para cada loja/encarte de um varejista, a validade
+normalizada, as URLs do encarte e os arquivos gravados na última execução
+bem-sucedida. Se a validade e as URLs não mudaram e os arquivos continuam
+no disco, a loja pode ser pulada.
+
+O manifesto fica em CACHE_DIR/manifesto_<varejista>.json. MANIFESTO=0
+desliga os pulos (tudo é baixado de novo, e o manifesto é atualizado).
+"""
+import json
+import os
+import re
+import threading
+from datetime import date, datetime
+from pathlib import Path
+
+from analisador_html import normalizar_texto
+from pastas import CACHE_DIR, gravar_json
+
+MANIFESTO_ATIVO = os.environ.get("MANIFESTO", "1") != "0"
+
+MESES = {
+    "janeiro": 1, "fevereiro": 2, "marco": 3, "abril": 4, "maio": 5, "junho": 6,
+    "julho": 7, "agosto": 8, "setembro": 9, "outubro": 10, "novembro": 11, "dezembro": 12,
+    "jan": 1, "fev": 2, "mar": 3, "abr": 4, "mai": 5, "jun": 6,
+    "jul": 7, "ago": 8, "set": 9, "out": 10, "nov": 11, "dez": 12,
+}
+
+# "10/10", "10-10-2025", "10.10.25", "10_10_2025" (nomes de pasta) ou "10 de outubro [de 2025]"
+_DATA = re.compile(
+    r"(?<!\d)(\d{1,2})[/\-._](\d{1,2})(?:[/\-._](\d{4}|\d{2}))?(?!\d)"
+    r"|(?<!\d)(\d{1,2})(?:o|º)?[\s\-_]+de[\s\-_]+(" + "|".join(sorted(MESES, key=len, reverse=True)) + r")\b"
+    r"(?:[\s\-_]+de[\s\-_]+(\d{4}))?"
+)
+
+
+# Entre as duas datas de um período: "10/10 a 16/10", "10/10 até 16/10", "10_10_2025_a_16_10_2025"
+_ENTRE_DATAS = re.compile(r"[\s_]*(?:a|ate|ao|-)[\s_]*")
+# Uma data sozinha só conta logo depois de uma palavra de validade: "Jornal 1/2" e
+# "Loja 24/7" não são datas
+_ANTES_DA_DATA = re.compile(r"\b(valid\w*|ate|partir de)[\s:]*$")
+
+
+def _datas(texto: str) -> list:
+    """Datas de `texto` (já normalizado) na ordem em que aparecem: {"dia", "mes", "ano", "inicio", "fim"}."""
+    datas = []
+    for m in _DATA.finditer(texto):
+        if m.group(1):
+            dia, mes, ano = int(m.group(1)), int(m.group(2)), m.group(3)
+        else:
+            dia, mes, ano = int(m.group(4)), MESES[m.group(5)], m.group(6)
+        if ano is not None:
+            ano = int(ano) + (2000 if len(ano) == 2 else 0)
+        if 1 <= dia <= 31 and 1 <= mes <= 12:
+            datas.append({"dia": dia, "mes": mes, "ano": ano, "inicio": m.start(), "fim": m.end()})
+    return datas
+
+def _periodo(inicio: dict, fim: dict, hoje: date) -> dict:
+    """{"inicio", "fim"} de um par de datas, ou None se o fim vier antes do início."""
+    ano_fim = fim["ano"] or inicio["ano"] or hoje.year
+    try:
+        d_inicio = date(inicio["ano"] or ano_fim, inicio["mes"], inicio["dia"])
+        d_fim = date(ano_fim, fim["mes"], fim["dia"])
+    except ValueError:
+        return None
+    if d_inicio > d_fim and inicio["ano"] is None:
+        # "28/12 a 03/01/2026": o início é do ano anterior
+        d_inicio = d_inicio.replace(year=d_inicio.year - 1)
+    if d_inicio > d_fim:
+        return None
+    return {"inicio": d_inicio.isoformat(), "fim": d_fim.isoformat()}
+
+def normalizar_validade(texto: str, hoje: date = None) -> dict:
+    """
+    Converte textos como "Ofertas válidas de 10/10 a 16/10/2025" (ou o nome
+    de pasta gerado a partir deles) em {"inicio": "2025-10-10", "fim": "2025-10-16"}.
+    O ano que falta vem da outra data ou do ano corrente. Só valem um par de
+    datas ligado por "a"/"até" ou uma data depois de "válido"/"até"; None se
+    não houver nenhum dos dois.
+    """
+    texto = normalizar_texto(texto)
+    hoje = hoje or date.today()
+    datas = _datas(texto)
+    for inicio, fim in zip(datas, datas[1:]):
+        if _ENTRE_DATAS.fullmatch(texto, inicio["fim"], fim["inicio"]):
+            periodo = _periodo(inicio, fim, hoje)
+            if periodo:
+                return periodo
+    for data in datas:
+        antes = texto[max(0, data["inicio"] - 30):data["inicio"]].replace("_", " ").replace("-", " ")
+        antes = _ANTES_DA_DATA.search(antes)
+        if not antes:
+            continue
+        try:
+            dia = date(data["ano"] or hoje.year, data["mes"], data["dia"]).isoformat()
+        except ValueError:
+            continue
+        # "Válido até 19/10": só o fim é conhecido
+        return {"inicio": None if antes.group(1) == "ate" else dia, "fim": dia}
+    return None
+
+
+class Manifesto:
+    def __init__(self, varejista: str):
+        self.varejista = varejista
+        self.caminho = CACHE_DIR / f"manifesto_{varejista}.json"
+        self._lock = threading.Lock()
+        self._alterado = False
+        try:
+            self._dados = json.loads(self.caminho.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self._dados = {}
+
+    @staticmethod
+    def _validade(texto) -> dict:
+        return normalizar_validade(texto) or {"texto": texto or ""}
+
+    def tem_registro(self, loja: str) -> bool:
+        """True se há uma execução bem-sucedida de `loja` para comparar (e o manifesto está ativo)."""
+        with self._lock:
+            return MANIFESTO_ATIVO and loja in self._dados
+
+    def inalterado(self, loja: str, validade_texto, urls) -> bool:
+        """
+        True se a última execução bem-sucedida de `loja` teve a mesma validade
+        e as mesmas URLs e todos os arquivos gravados ainda existem.
+        """
+        if not MANIFESTO_ATIVO or not urls:
+            return False
+        with self._lock:
+            anterior = self._dados.get(loja)
+        if not anterior:
+            return False
+        if anterior.get("validade") != self._validade(validade_texto) or anterior.get("urls") != sorted(set(urls)):
+            return False
+        arquivos = anterior.get("arquivos") or []
+        return bool(arquivos) and all(Path(a).exists() for a in arquivos)
+
+    def registrar(self, loja: str, validade_texto, urls, arquivos):
+        """Grava a loja como concluída com sucesso nesta execução."""
+        with self._lock:
+            self._dados[loja] = {
+                "validade": self._validade(validade_texto),
+                "urls": sorted(set(urls)),
+                "arquivos": sorted(str(Path(a).resolve()) for a in arquivos),
+                "concluido_em": datetime.now().isoformat(timespec="seconds"),
+            }
+            self._alterado = True
+
+    def salvar(self):
+        with self._lock:
+            if not self._alterado:
+                return
+            # Grava sob o lock: nenhuma thread altera os dados no meio da serialização
+            gravar_json(self.caminho, self._dados)
+            self._alterado = False
@@ -0,0 +1,291 @@
+import copy
+import fcntl
+import os
+import shutil
+import time
+from pathlib import Path
+from selenium import webdriver
+
+import telemetria
+from pastas import CACHE_DIR
+
+# Limites de Chrome simultâneos. São definidos pelo orquestrador.py; quando um
+# script roda sozinho as variáveis não existem e não há limite nenhum.
+CHROME_VAGAS_DIR = os.environ.get("CHROME_VAGAS_DIR")
+CHROME_MAX_GLOBAL = int(os.environ.get("CHROME_MAX_GLOBAL") or 0)
+CHROME_MAX_VAREJISTA = int(os.environ.get("CHROME_MAX_VAREJISTA") or 0)
+
+# Perfil persistente (opcional, CHROME_PERFIL_PERSISTENTE=1): cada varejista
+# reaproveita um user-data-dir em CHROME_PERFIS_DIR, e o cache de disco da
+# execução anterior deixa as páginas "quentes". Cada perfil é uma vaga com
+# flock; sessões simultâneas do mesmo varejista usam perfis diferentes.
+CHROME_PERFIL_PERSISTENTE = os.environ.get("CHROME_PERFIL_PERSISTENTE") == "1"
+CHROME_PERFIS_DIR = Path(os.environ.get("CHROME_PERFIS_DIR") or CACHE_DIR / "chrome")
+CHROME_PERFIS_POR_VAREJISTA = int(os.environ.get("CHROME_PERFIS_POR_VAREJISTA") or 4)
+CHROME_CACHE_MB = int(os.environ.get("CHROME_CACHE_MB") or 256)
+
+# Travas que um Chrome morto deixa para trás (o flock garante que ninguém usa o perfil)
+_SINGLETON = ("SingletonLock", "SingletonSocket", "SingletonCookie")
+# Estado dos sites: apagado a cada abertura, para o fluxo (modais, seleção de
+# loja) ser o mesmo de um perfil novo. Só o cache continua.
+_ESTADO_SITES = ("Default/Cookies", "Default/Cookies-journal", "Default/Network", "Default/Local Storage",
+                 "Default/Session Storage", "Default/IndexedDB", "Default/Sessions", "Sessions")
+# Caches que o --disk-cache-size não limita
+_CACHES_EXTRAS = ("Default/Code Cache", "Default/GPUCache", "Default/Service Worker", "GrShaderCache",
+                  "ShaderCache", "GraphiteDawnCache")
+
+
+def _tentar_travar(caminho: Path):
+    arquivo = open(caminho, "a+")
+    try:
+        fcntl.flock(arquivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return arquivo
+    except BlockingIOError:
+        arquivo.close()
+        return None
+
+def _ocupar_vaga(prefixo: str, limite: int):
+    """
+    Bloqueia até conseguir uma das `limite` vagas com o prefixo dado.
+    As vagas são arquivos com flock: o kernel as libera se o processo morrer.
+    """
+    if not CHROME_VAGAS_DIR or limite <= 0:
+        return None
+    pasta = Path(CHROME_VAGAS_DIR)
+    pasta.mkdir(parents=True, exist_ok=True)
+    avisou = False
+    while True:
+        for i in range(limite):
+            trava = _tentar_travar(pasta / f"{prefixo}-{i}.lock")
+            if trava:
+                return trava
+        if not avisou:
+            print(f"[navegador] Aguardando vaga de Chrome ({prefixo}, limite {limite})...")
+            avisou = True
+        time.sleep(0.5)
+
+def _liberar(travas):
+    while travas:
+        try:
+            travas.pop().close()
+        except Exception:
+            pass
+
+
+def _tamanho(caminho: Path) -> int:
+    total = 0
+    for raiz, _, arquivos in os.walk(caminho):
+        for nome in arquivos:
+            try:
+                total += os.lstat(os.path.join(raiz, nome)).st_size
+            except OSError:
+                pass
+    return total
+
+def _remover(caminho: Path):
+    if caminho.is_dir() and not caminho.is_symlink():
+        shutil.rmtree(caminho, ignore_errors=True)
+    else:
+        try:
+            caminho.unlink()
+        except FileNotFoundError:
+            pass
+
+def _preparar_perfil(pasta: Path):
+    """Limpa travas velhas e o estado dos sites; poda os caches fora do limite do Chrome."""
+    pasta.mkdir(parents=True, exist_ok=True)
+    for nome in _SINGLETON + _ESTADO_SITES:
+        _remover(pasta / nome)
+    extras = [pasta / nome for nome in _CACHES_EXTRAS]
+    if sum(_tamanho(c) for c in extras) > CHROME_CACHE_MB * 1024 * 1024:
+        print(f"[navegador] Cache do perfil {pasta.name} passou de {CHROME_CACHE_MB} MB; limpando.")
+        for caminho in extras:
+            _remover(caminho)
+
+def _ocupar_perfil(varejista: str):
+    """(trava, pasta) de um perfil livre do varejista, ou (None, None) se todos estiverem em uso."""
+    CHROME_PERFIS_DIR.mkdir(parents=True, exist_ok=True)
+    for i in range(max(1, CHROME_PERFIS_POR_VAREJISTA)):
+        trava = _tentar_travar(CHROME_PERFIS_DIR / f"{varejista}-{i}.lock")
+        if trava:
+            pasta = CHROME_PERFIS_DIR / f"{varejista}-{i}"
+            try:
+                _preparar_perfil(pasta)
+            except Exception:
+                trava.close()
+                raise
+            return trava, pasta
+    print(f"[navegador] Todos os perfis de {varejista} estão em uso; usando um perfil temporário.")
+    return None, None
+
+def aplicar_perfil(options, varejista: str):
+    """
+    Aponta `options` para um perfil persistente do varejista (se ativado) e
+    devolve a trava do perfil, que precisa ficar aberta enquanto o Chrome rodar.
+    """
+    if not CHROME_PERFIL_PERSISTENTE or any(a.startswith("--user-data-dir") for a in options.arguments):
+        return None
+    trava, pasta = _ocupar_perfil(varejista)
+    if trava:
+        options.add_argument(f"--user-data-dir={pasta}")
+        options.add_argument(f"--disk-cache-size={CHROME_CACHE_MB * 1024 * 1024}")
+    return trava
+
+
+class ChromeComVaga(webdriver.Chrome):
+    """
+    webdriver.Chrome que ocupa uma vaga global e uma do varejista (e, se
+    ativado, um perfil persistente) enquanto estiver aberto.
+    """
+
+    def __init__(self, varejista: str, options):
+        # Sempre a vaga do varejista antes da global, para nunca segurar uma
+        # vaga global esperando outra instância do mesmo varejista.
+        self._travas = [
+            t for t in (
+                _ocupar_vaga(varejista, CHROME_MAX_VAREJISTA),
+                _ocupar_vaga("global", CHROME_MAX_GLOBAL),
+            ) if t
+        ]
+        try:
+            # Cópia: quem chamou pode reaproveitar as options para outro Chrome
+            options = copy.deepcopy(options)
+            perfil = aplicar_perfil(options, varejista)
+            if perfil:
+                self._travas.append(perfil)
+            super().__init__(options=options)
+        except Exception:
+            _liberar(self._travas)
+            raise
+
+    def quit(self):
+        try:
+            super().quit()
+        finally:
+            _liberar(self._travas)
+
+
+def iniciar_chrome(options, varejista: str):
+    return ChromeComVaga(varejista, options)
+
+def aplicar_escala(options, escala: float):
+    """Renderiza as páginas com device scale factor `escala`: screenshots com pixels nativos em alta resolução."""
+    if escala and escala != 1:
+        options.add_argument(f"--force-device-scale-factor={escala:g}")
+        options.add_argument("--high-dpi-support=1")
+
+
+# Fábrica única dos drivers dos scripts. Perfis:
+#   "captura": páginas renderizadas por completo (screenshots, visualizadores);
+#   "descoberta": só o DOM importa (hrefs, textos), sem imagens nem fontes.
+# Em ambos, analytics, anúncios e widgets de chat são bloqueados via CDP
+# (Network.setBlockedURLs) e o carregamento é "eager": driver.get volta no
+# DOMContentLoaded, sem esperar imagens e scripts de terceiros; as esperas
+# explícitas de cada script continuam valendo.
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+              "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+
+BLOQUEIOS_PADRAO = [
+    "*google-analytics.com*", "*googletagmanager.com*", "*googleadservices.com*", "*googlesyndication.com*",
+    "*doubleclick.net*", "*connect.facebook.net*", "*facebook.com/tr*", "*hotjar.com*", "*clarity.ms*",
+    "*analytics.tiktok.com*", "*bat.bing.com*", "*criteo.*", "*taboola.com*", "*onesignal.com*",
+    "*zendesk.com*", "*zdassets.com*", "*jivosite.com*", "*tawk.to*", "*intercom.io*", "*hs-scripts.com*",
+    "*rdstation.com.br*", "*blip.ai*",
+]
+
+# Tipo de recurso -> padrões de URL que o bloqueiam
+TIPOS_RECURSO = {
+    "imagem": ["*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.avif*", "*.svg*", "*.ico*"],
+    "fonte": ["*.woff*", "*.ttf*", "*.otf*", "*.eot*", "*fonts.googleapis.com*", "*fonts.gstatic.com*"],
+    "midia": ["*.mp4*", "*.webm*", "*.m3u8*", "*.mp3*", "*youtube.com/embed*", "*player.vimeo.com*"],
+}
+
+PERFIS = {
+    "captura": {"tipos": ["midia"], "imagens": True},
+    "descoberta": {"tipos": ["imagem", "fonte", "midia"], "imagens": False},
+}
+
+# CHROME_BLOQUEIO=0 desliga todos os bloqueios; CHROME_BLOQUEIOS soma padrões
+# (separados por vírgula); CHROME_BLOQUEAR_TIPOS[_<VAREJISTA>] troca os tipos do perfil.
+CHROME_BLOQUEIO = os.environ.get("CHROME_BLOQUEIO", "1") != "0"
+CHROME_CARREGAMENTO = os.environ.get("CHROME_CARREGAMENTO", "eager")
+CHROME_TIMEOUT_CARREGAMENTO = int(os.environ.get("CHROME_TIMEOUT_CARREGAMENTO") or 60)
+# CHROME_HEADLESS=1 força headless também no Assaí e no G. Barbosa (CI, bench/)
+CHROME_HEADLESS = os.environ.get("CHROME_HEADLESS") == "1"
+
+
+def padroes_bloqueados(varejista: str, perfil: str = "captura") -> list:
+    if not CHROME_BLOQUEIO:
+        return []
+    tipos = (os.environ.get(f"CHROME_BLOQUEAR_TIPOS_{varejista.upper()}")
+             or os.environ.get("CHROME_BLOQUEAR_TIPOS"))
+    tipos = [t.strip() for t in tipos.split(",") if t.strip()] if tipos is not None else PERFIS[perfil]["tipos"]
+    padroes = list(BLOQUEIOS_PADRAO)
+    for tipo in tipos:
+        if tipo not in TIPOS_RECURSO:
+            raise ValueError(f"Tipo de recurso desconhecido: {tipo} (opções: {', '.join(TIPOS_RECURSO)})")
+        padroes += TIPOS_RECURSO[tipo]
+    padroes += [p.strip() for p in os.environ.get("CHROME_BLOQUEIOS", "").split(",") if p.strip()]
+    return padroes
+
+def bloquear_urls(driver, padroes: list):
+    """Bloqueia as requisições que casam com `padroes` (curingas *) na aba do driver."""
+    if not padroes:
+        return
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": padroes})
+    except Exception as e:
+        print(f"[navegador] Não foi possível bloquear URLs via CDP: {e}")
+
+def criar_driver(varejista: str, perfil: str = "captura", headless: bool = True, janela=(1920, 1080),
+                 pasta_download: Path = None, pdf_externo: bool = False, escala: float = 1):
+    """
+    Chrome configurado para os scripts: headless (ou maximizado, com
+    headless=False), janela, idioma, user agent, downloads em `pasta_download`,
+    escala de captura e os bloqueios do `perfil`.
+    """
+    if perfil not in PERFIS:
+        raise ValueError(f"Perfil de navegador desconhecido: {perfil} (opções: {', '.join(PERFIS)})")
+    padroes = padroes_bloqueados(varejista, perfil)
+    options = webdriver.ChromeOptions()
+    if headless or CHROME_HEADLESS:
+        options.add_argument("--headless=new")
+        options.add_argument(f"--window-size={janela[0]},{janela[1]}")
+    else:
+        options.add_argument("--start-maximized")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--disable-features=VizDisplayCompositor")
+    options.add_argument("--lang=pt-BR,pt")
+    options.add_argument(f"--user-agent={USER_AGENT}")
+    options.page_load_strategy = CHROME_CARREGAMENTO
+
+    prefs = {}
+    if pasta_download is not None:
+        prefs.update({
+            "download.prompt_for_download": False,
+            "download.default_directory": str(pasta_download),
+            "download.directory_upgrade": True,
+            "safebrowsing.enabled": True,
+        })
+    if pdf_externo:
+        prefs.update({"download.prompt_for_download": False, "plugins.always_open_pdf_externally": True})
+    if not PERFIS[perfil]["imagens"] and CHROME_BLOQUEIO:
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        prefs["profile.managed_default_content_settings.images"] = 2
+    if prefs:
+        options.add_experimental_option("prefs", prefs)
+    aplicar_escala(options, escala)
+
+    # Inclui a espera por vaga de Chrome (CHROME_MAX_GLOBAL e CHROME_MAX_VAREJISTA)
+    with telemetria.span("iniciar_navegador", perfil=perfil):
+        driver = iniciar_chrome(options, varejista)
+    try:
+        driver.set_page_load_timeout(CHROME_TIMEOUT_CARREGAMENTO)
+        bloquear_urls(driver, padroes)
+    except Exception:
+        driver.quit()
+        raise
+    return driver
@@ -1,70 +1,53 @@
 import os
 import re
-import time
 from pathlib import Path
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
-from PIL import Image
-from io import BytesIO
+from navegador import criar_driver
+from imagens import ProcessadorImagens, escala_captura, formato_saida
+from flipbook import baixar_pdf_dflip
+from recortes import DetectorPagina
+from similaridade import IndicePerceptual
+from manifesto import Manifesto
+from esperas import (aguardar_dom_estavel, aguardar_mudanca_texto, aguardar_rede_ociosa,
+                     resumo as resumo_esperas)
+import telemetria
+from pastas import BASE_OUTPUT
 
 
 RESIZE_FACTOR = 2 # Este é o fator que dobra a resolução (2x)
+# Device scale factor da captura; igual a RESIZE_FACTOR, o 2x sai nativo e sem LANCZOS
+ESCALA = escala_captura("novoatacarejo")
 
-CROP_PADRAO = [{
-    "width": 626,
-    "height": 853, 
-    "x": 648,
-    "y": 17,
-    "suffix": ""
-}]
-
-
-CROP_SPREAD_UNICO = [{
-    "width": 1226,
-    "height": 842,
-    "x": 348,
-    "y": 22,
-    "suffix": "_spread"
-}]
+# A área da página (simples ou dupla) é medida no visualizador a cada captura
+DETECTOR_PAGINA = DetectorPagina(".pdff-container, .df-container")
 
 # Configurações do ambiente
 WINDOW_WIDTH = 1920
 WINDOW_HEIGHT = 1080
-BASE_URL = "https://novoatacarejo.com/oferta/"
+BASE_URL = os.environ.get("NOVOATACAREJO_BASE_URL", "https://novoatacarejo.com/oferta/")
 CIDADE = "Olinda"
 
+ROTULO_PAGINA = (By.CSS_SELECTOR, "div.pdff-ui-page label[for='df_book_page_number']")
+
+# "auto": baixa o PDF de origem do visualizador e só captura screenshots se não achar.
+# "screenshot": sempre captura página a página, como antes.
+NOVOATACAREJO_MODO = os.environ.get("NOVOATACAREJO_MODO", "auto")
+
 # === SAÍDA PADRONIZADA ===
-BASE_OUTPUT = Path(os.environ.get("OUTPUT_DIR", str(Path.cwd() / "Encartes"))).resolve()
 OUT_BASE = BASE_OUTPUT / "Novo-Atacarejo"
 OUT_BASE.mkdir(parents=True, exist_ok=True)
 print(f"[novoatacarejo.py] Pasta base de saída: {OUT_BASE}")
 
 def build_headless_chrome(download_dir: Path):
-    options = webdriver.ChromeOptions()
-    options.add_argument("--headless=new")
-    options.add_argument(f"--window-size={WINDOW_WIDTH},{WINDOW_HEIGHT}")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--disable-features=VizDisplayCompositor")
-    options.add_argument("--lang=pt-BR,pt")
-    options.add_argument(
-        "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/555.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/555.36"
-    )
-    prefs = {
-        "download.prompt_for_download": False,
-        "download.default_directory": str(download_dir),
-        "download.directory_upgrade": True,
-        "safebrowsing.enabled": True
-    }
-    options.add_experimental_option("prefs", prefs)
-    return webdriver.Chrome(options=options)
-
-driver = build_headless_chrome(OUT_BASE)
-wait = WebDriverWait(driver, 25)
+    return criar_driver("novoatacarejo", janela=(WINDOW_WIDTH, WINDOW_HEIGHT),
+                        pasta_download=download_dir, escala=ESCALA)
+
+# Criados em main(): o pool de imagens reimporta este módulo nos processos filhos
+driver = None
+wait = None
+processador = None
 
 def slugify(txt: str) -> str:
     txt = re.sub(r'[\\/*?:"<>|\s]+', '_', (txt or '').strip())
@@ -89,22 +72,19 @@ def detectar_validade() -> str:
     return "sem_validade"
 
 def selecionar_loja(cidade: str):
-    driver.get(BASE_URL)
-    select_element = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "select.select")))
-    Select(select_element).select_by_visible_text(cidade)
-    time.sleep(4)
+    with telemetria.span("navegar", url=BASE_URL):
+        driver.get(BASE_URL)
+    with telemetria.span("selecionar_loja"):
+        select_element = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "select.select")))
+        Select(select_element).select_by_visible_text(cidade)
+        aguardar_rede_ociosa(driver)
 
 def obter_numero_da_pagina() -> tuple[int, int]:
     """
     Lê o label 'X/Y' da barra de navegação do encarte e retorna X (página atual) e Y (total de páginas).
     """
     try:
-        page_label = wait.until(
-            EC.presence_of_element_located((
-                By.CSS_SELECTOR,
-                "div.pdff-ui-page label[for='df_book_page_number']"
-            ))
-        )
+        page_label = wait.until(EC.presence_of_element_located(ROTULO_PAGINA))
         texto = page_label.text.split('/')
         page_number = int(texto[0].strip())
         total_pages = int(texto[1].strip())
@@ -115,92 +95,87 @@ def obter_numero_da_pagina() -> tuple[int, int]:
 
 def cortar_e_salvar_screenshot(pasta_destino: Path, nome_base: str, crop_settings):
     """
-    Captura a tela inteira, aplica o corte, redimensiona em 2x e salva.
+    Captura a tela inteira e entrega ao pool de processos, que aplica o corte,
+    redimensiona em 2x e salva.
     """
     try:
-        png = driver.get_screenshot_as_png()
-        img = Image.open(BytesIO(png))
-
-        for crop in crop_settings:
-            w, h, x, y, suffix = crop["width"], crop["height"], crop["x"], crop["y"], crop["suffix"]
-
-            # 1. Aplica o corte (crop)
-            caixa_corte = (x, y, x + w, y + h)
-            img_cortada = img.crop(caixa_corte)
-            
-            # 2. Redimensiona em 2x (aumenta a resolução)
-            # ESTA PARTE GARANTE O DOBRO DA RESOLUÇÃO (2x) PARA QUALQUER CORTE.
-            new_w = w * RESIZE_FACTOR
-            new_h = h * RESIZE_FACTOR
-            
-            # Usa o filtro LANCZOS para melhor qualidade de upscaling (redimensionamento)
-            try:
-                img_redimensionada = img_cortada.resize((new_w, new_h), Image.Resampling.LANCZOS)
-            except AttributeError:
-                img_redimensionada = img_cortada.resize((new_w, new_h), Image.LANCZOS)
-                
-            # 3. Salva a imagem redimensionada
-            nome_arquivo = f"{nome_base}{suffix}_2x.png"
-            arq_saida = pasta_destino / nome_arquivo
-            img_redimensionada.save(str(arq_saida))
-            print(f" Screenshot recortado e REDIMENSIONADO 2X salvo: {arq_saida} (Original: {w}x{h}, Final: {new_w}x{new_h})")
-
+        with telemetria.span("screenshot"):
+            png = driver.get_screenshot_as_png()
+        processador.enviar(png, pasta_destino, nome_base, crop_settings, RESIZE_FACTOR, escala=ESCALA)
     except Exception as e:
         print(f"Erro ao cortar, redimensionar e salvar o screenshot: {e}")
 
 
-def clicar_nas_imagens(pasta_destino: Path):
-    imagens = wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, "#tabloids a")))
+
+def clicar_nas_imagens(pasta_destino: Path) -> bool:
+    """Captura os tabloides abertos em abas. True se todos chegaram à última página (ou ao PDF)."""
+    with telemetria.span("descoberta"):
+        imagens = wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, "#tabloids a")))
     print(f"{len(imagens)} tabloide(s) encontrado(s).")
     
+    janelas = len(driver.window_handles)
     for i in range(min(2, len(imagens))):
         link = imagens[i].get_attribute("href")
         if not link:
             continue
         driver.execute_script("window.open(arguments[0], arguments[1]);", link, "_blank")
-        time.sleep(1)
+        janelas += 1
+        wait.until(EC.number_of_windows_to_be(janelas))
 
     abas = driver.window_handles
+    completos = 0
     
     for i in range(1, len(abas)):
-        driver.switch_to.window(abas[i])
-        print(f"\nAcessando Tabloide {i}...")
+        with telemetria.span("tabloide", tabloide=i):
+            driver.switch_to.window(abas[i])
+            print(f"\nAcessando Tabloide {i}...")
+
+            if NOVOATACAREJO_MODO != "screenshot":
+                aguardar_rede_ociosa(driver, nome="abrir_encarte")
+                if baixar_pdf_dflip(driver, pasta_destino / f"NovoAtacarejo_Enc{i}.pdf"):
+                    completos += 1
+                    continue
         
-        while True:
-            try:
-                next_button = wait.until(
-                    EC.element_to_be_clickable((
-                        By.CSS_SELECTOR,
-                        "div.pdff-ui-btn.pdff-ui-next.pdff-ui-alt.fa.fa-chevron-right[title='Next Page']"
-                    ))
-                )
+            while True:
+                try:
+                    next_button = wait.until(
+                        EC.element_to_be_clickable((
+                            By.CSS_SELECTOR,
+                            "div.pdff-ui-btn.pdff-ui-next.pdff-ui-alt.fa.fa-chevron-right[title='Next Page']"
+                        ))
+                    )
+
+                    # Espera a página atual terminar de carregar e renderizar
+                    aguardar_rede_ociosa(driver, quieto=0.3, nome="carregar_pagina")
+                    aguardar_dom_estavel(driver, quieto=0.3)
+
+                    page_number, total_pages = obter_numero_da_pagina()
+
+                    # Recorte, screenshot e o processamento dela ficam no span da página
+                    with telemetria.span("pagina", pagina=page_number):
+                        # O visualizador alterna entre página simples e dupla: mede a cada página
+                        recortes_atuais = DETECTOR_PAGINA.recorte(driver)
+                        tipo = ("Automático" if recortes_atuais[0].get("auto")
+                                else "Spread" if recortes_atuais[0]["suffix"] == "_spread" else "Padrão")
+                        print(f"Capturando Página {page_number} de {total_pages} (Recorte {tipo})...")
+
+                        nome_base = f"NovoAtacarejo_Enc{i}_pag{page_number}"
+                        cortar_e_salvar_screenshot(pasta_destino, nome_base, recortes_atuais)
+
+                    # Verifica se estamos na última página. Se sim, quebra o loop
+                    if page_number >= total_pages:
+                        print(f"Última página ({page_number}/{total_pages}) capturada. Passando para o próximo tabloide.")
+                        completos += 1
+                        break
                 
-                time.sleep(5) 
-
-                page_number, total_pages = obter_numero_da_pagina()
-
-                # LÓGICA CONDICIONAL DE RECORTE
-                if page_number == 3:
-                    recortes_atuais = CROP_SPREAD_UNICO
-                    print(f"Capturando Página {page_number} de {total_pages} (APENAS PÁGINA 3 - Recorte Spread Único)...")
-                else:
-                    recortes_atuais = CROP_PADRAO
-                    print(f"Capturando Página {page_number} de {total_pages} (Padrão - Recorte Único)...")
+                    # Avança para a próxima página
+                    rotulo_antes = driver.find_element(*ROTULO_PAGINA).text.strip()
+                    next_button.click()
+                    aguardar_mudanca_texto(driver, ROTULO_PAGINA, rotulo_antes, nome="virar_pagina")
                 
-                nome_base = f"NovoAtacarejo_Enc{i}_pag{page_number}"
-                cortar_e_salvar_screenshot(pasta_destino, nome_base, recortes_atuais)
-
-                # Verifica se estamos na última página. Se sim, quebra o loop
-                if page_number >= total_pages:
-                    print(f"Última página ({page_number}/{total_pages}) capturada. Passando para o próximo tabloide.")
+                except Exception as e:
+                    print(f"Finalizado o encarte {i}. Fim do documento ou erro no avanço. (Detalhe: {e})")
                     break
-                
-                # Avança para a próxima página
-                next_button.click()
-                
-            except Exception as e:
-                print(f"Finalizado o encarte {i}. Fim do documento ou erro no avanço. (Detalhe: {e})")
-                break
 
     for i in range(1, len(abas)):
         try:
@@ -209,20 +184,51 @@ def clicar_nas_imagens(pasta_destino: Path):
         except:
             pass
     driver.switch_to.window(abas[0])
+    return 0 < completos == len(abas) - 1
 
 def main():
+    global driver, wait, processador
+    telemetria.iniciar("novoatacarejo")
+    driver = build_headless_chrome(OUT_BASE)
+    wait = WebDriverWait(driver, 25)
+
     selecionar_loja(CIDADE)
-    validade = detectar_validade()
+    with telemetria.span("descoberta"):
+        validade = detectar_validade()
+        tabloides = [a.get_attribute("href") for a in driver.find_elements(By.CSS_SELECTOR, "#tabloids a")]
+        tabloides = [t for t in tabloides if t][:2]
     pasta_destino = OUT_BASE / slugify(CIDADE) / validade
+
+    manifesto = Manifesto("novoatacarejo")
+    if manifesto.inalterado(CIDADE, validade, tabloides):
+        print("\nValidade e tabloides inalterados desde a última execução; nada a fazer.")
+        return
+
     pasta_destino.mkdir(parents=True, exist_ok=True)
     print(f"\nPasta de destino: {pasta_destino}")
 
-    clicar_nas_imagens(pasta_destino)
+    indice = IndicePerceptual("novoatacarejo")
+    processador = ProcessadorImagens(formato=formato_saida("novoatacarejo"), indice=indice)
+
+    completo = clicar_nas_imagens(pasta_destino)
+    processador.aguardar()
+    indice.relatorio()
+    indice.salvar()
+
+    arquivos = [a for a in pasta_destino.iterdir()
+                if a.is_file() and not a.name.startswith(".") and a.suffix not in (".part", ".validador")]
+    # Captura interrompida no meio de um tabloide não entra no manifesto: a próxima execução refaz
+    if completo and arquivos and not processador.erros:
+        manifesto.registrar(CIDADE, validade, tabloides, arquivos)
+        manifesto.salvar()
+    resumo_esperas()
 
     print("\nFinalizado.")
 
 if __name__ == "__main__":
     try:
-        main()
+        with telemetria.span("cidade", cidade=CIDADE):
+            main()
     finally:
-        driver.quit()
\ No newline at end of file
+        if driver is not None:
+            driver.quit()
\ No newline at end of file
@@ -0,0 +1,110 @@
+"""
+Roda os scripts dos varejistas em paralelo, cada um no seu próprio processo.
+
+    python orquestrador.py                      # todos
+    python orquestrador.py assai cometa         # só alguns
+    python orquestrador.py --max-chrome 3 --chrome-por-varejista 2
+
+Todos gravam no mesmo OUTPUT_DIR (mesmo layout da execução avulsa). O número
+de Chrome abertos ao mesmo tempo é limitado globalmente e por varejista
+através do navegador.py.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from pastas import BASE_OUTPUT
+
+RAIZ = Path(__file__).resolve().parent
+
+VAREJISTAS = [
+    "assai",
+    "atacadao",
+    "atakarejo",
+    "cometa",
+    "frangolandia",
+    "gbarbosa",
+    "novoatacarejo",
+]
+
+_print_lock = threading.Lock()
+
+
+def executar_varejista(nome: str, env: dict) -> tuple[str, int, float]:
+    inicio = time.monotonic()
+    proc = subprocess.Popen(
+        [sys.executable, str(RAIZ / f"{nome}.py")],
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        bufsize=1,
+    )
+    for linha in proc.stdout:
+        with _print_lock:
+            print(f"[{nome}] {linha.rstrip()}", flush=True)
+    codigo = proc.wait()
+    return nome, codigo, time.monotonic() - inicio
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Executa os scripts de encartes em paralelo.")
+    parser.add_argument("varejistas", nargs="*",
+                        help=f"varejistas a executar (padrão: todos). Opções: {', '.join(VAREJISTAS)}")
+    parser.add_argument("--max-chrome", type=int, default=int(os.environ.get("CHROME_MAX_GLOBAL") or 4),
+                        help="máximo de Chrome abertos ao mesmo tempo, somando todos os varejistas")
+    parser.add_argument("--chrome-por-varejista", type=int,
+                        default=int(os.environ.get("CHROME_MAX_VAREJISTA") or 1),
+                        help="máximo de Chrome abertos ao mesmo tempo por varejista")
+    parser.add_argument("--paralelo", type=int, default=len(VAREJISTAS),
+                        help="máximo de scripts rodando ao mesmo tempo")
+    args = parser.parse_args(argv)
+
+    desconhecidos = [v for v in args.varejistas if v not in VAREJISTAS]
+    if desconhecidos:
+        parser.error(f"varejista(s) desconhecido(s): {', '.join(desconhecidos)}")
+    selecionados = args.varejistas or VAREJISTAS
+    BASE_OUTPUT.mkdir(parents=True, exist_ok=True)
+    print(f"[orquestrador] Pasta de saída: {BASE_OUTPUT}")
+    print(f"[orquestrador] {len(selecionados)} varejista(s), até {args.max_chrome} Chrome "
+          f"({args.chrome_por_varejista} por varejista)")
+
+    with tempfile.TemporaryDirectory(prefix="chrome-vagas-") as vagas_dir:
+        env = dict(os.environ)
+        env.update({
+            "OUTPUT_DIR": str(BASE_OUTPUT),
+            "CHROME_VAGAS_DIR": vagas_dir,
+            "CHROME_MAX_GLOBAL": str(args.max_chrome),
+            "CHROME_MAX_VAREJISTA": str(args.chrome_por_varejista),
+            "PYTHONUNBUFFERED": "1",
+        })
+
+        inicio = time.monotonic()
+        resultados = []
+        with ThreadPoolExecutor(max_workers=max(1, args.paralelo)) as pool:
+            futuros = [pool.submit(executar_varejista, nome, env) for nome in selecionados]
+            for futuro in as_completed(futuros):
+                nome, codigo, segundos = futuro.result()
+                resultados.append((nome, codigo, segundos))
+                with _print_lock:
+                    print(f"[orquestrador] {nome} terminou em {segundos:.1f}s (código {codigo})", flush=True)
+        total = time.monotonic() - inicio
+
+    print("\n[orquestrador] Resumo:")
+    for nome, codigo, segundos in sorted(resultados, key=lambda r: -r[2]):
+        status = "ok" if codigo == 0 else f"falhou ({codigo})"
+        print(f"  {nome:<15} {segundos:8.1f}s  {status}")
+    soma = sum(r[2] for r in resultados)
+    print(f"  Tempo total: {total:.1f}s (soma sequencial seria {soma:.1f}s)")
+
+    return 0 if all(r[1] == 0 for r in resultados) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""
+Pastas comuns a todos os scripts e gravação atômica de arquivos nelas.
+
+OUTPUT_DIR (padrão ./Encartes) é a raiz das saídas: cada varejista grava
+numa subpasta dela, e o armazém de conteúdo (armazem.py) fica dentro dela,
+no mesmo sistema de arquivos, para os hardlinks funcionarem. CACHE_DIR
+(padrão ~/.cache/supermercados) guarda o que passa de uma execução para a
+outra: catálogo, manifesto, checkpoint, índice de similaridade, perfis do
+Chrome e telemetria.
+"""
+import json
+import os
+import tempfile
+from pathlib import Path
+
+BASE_OUTPUT = Path(os.environ.get("OUTPUT_DIR", str(Path.cwd() / "Encartes"))).resolve()
+CACHE_DIR = Path(os.environ.get("CACHE_DIR", str(Path.home() / ".cache" / "supermercados"))).resolve()
+
+
+def gravar_atomico(caminho: Path, conteudo: str):
+    """
+    Grava `conteudo` num temporário da mesma pasta, sincroniza com o disco e
+    renomeia por cima: quem lê (ou uma execução interrompida) nunca vê o
+    arquivo pela metade.
+    """
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    fd, temporario = tempfile.mkstemp(dir=caminho.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(conteudo)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, caminho)
+    except BaseException:
+        Path(temporario).unlink(missing_ok=True)
+        raise
+    try:
+        pasta = os.open(caminho.parent, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(pasta)
+    except OSError:
+        pass
+    finally:
+        os.close(pasta)
+
+def gravar_json(caminho: Path, dados):
+    """Como gravar_atomico, para dados em JSON (formato de todos os arquivos do CACHE_DIR)."""
+    gravar_atomico(caminho, json.dumps(dados, ensure_ascii=False, indent=1, sort_keys=True))
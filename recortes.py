@@ -0,0 +1,122 @@
+"""
+Detecção automática da área da página nos visualizadores de flipbook, no
+lugar das tabelas fixas de recorte.
+
+1. DOM: a união dos retângulos (getBoundingClientRect) das páginas visíveis
+   do visualizador, em pixels CSS, guardada por layout (ex.: encarte 2 em
+   página dupla) para não consultar o navegador de novo.
+2. Se o DOM não der um retângulo plausível (um canvas WebGL do tamanho da
+   tela, por exemplo), o recorte fica marcado como automático e o processo
+   de imagens procura a página no próprio screenshot (caixa_da_pagina).
+"""
+from PIL import Image, ImageChops
+
+try:
+    import numpy as np
+except ImportError:  # sem numpy a varredura usa só o PIL, menos precisa
+    np = None
+
+# Página dupla quando a largura passa da altura com alguma folga
+PROPORCAO_SPREAD = 1.1
+
+RECORTE_AUTOMATICO = {"auto": True, "suffix": ""}
+
+_JS_RETANGULO_PAGINAS = """
+var raiz = document.querySelector(arguments[0]) || document.body;
+var vw = window.innerWidth, vh = window.innerHeight;
+var minimo = vw * vh * 0.02;
+var r = null;
+raiz.querySelectorAll(arguments[1]).forEach(function (el) {
+    var b = el.getBoundingClientRect();
+    var x0 = Math.max(0, b.left), y0 = Math.max(0, b.top);
+    var x1 = Math.min(vw, b.right), y1 = Math.min(vh, b.bottom);
+    if (x1 <= x0 || y1 <= y0 || (x1 - x0) * (y1 - y0) < minimo) return;
+    var st = getComputedStyle(el);
+    if (st.visibility === 'hidden' || st.display === 'none' || parseFloat(st.opacity) === 0) return;
+    r = r ? [Math.min(r[0], x0), Math.min(r[1], y0), Math.max(r[2], x1), Math.max(r[3], y1)]
+          : [x0, y0, x1, y1];
+});
+return r && {x0: r[0], y0: r[1], x1: r[2], y1: r[3], vw: vw, vh: vh};
+"""
+
+
+def sufixo_da_caixa(largura, altura) -> str:
+    return "_spread" if largura > altura * PROPORCAO_SPREAD else ""
+
+
+class DetectorPagina:
+    """
+    Recortes de um visualizador: `seletor_visualizador` é o contêiner e
+    `seletor_paginas` os elementos que desenham as páginas dentro dele.
+    """
+
+    def __init__(self, seletor_visualizador: str, seletor_paginas: str = "canvas, img"):
+        self.seletor_visualizador = seletor_visualizador
+        self.seletor_paginas = seletor_paginas
+        self._cache = {}
+
+    def _do_dom(self, driver):
+        try:
+            r = driver.execute_script(_JS_RETANGULO_PAGINAS, self.seletor_visualizador, self.seletor_paginas)
+        except Exception as e:
+            print(f"  Não foi possível medir a página no DOM: {e}")
+            return None
+        if not r:
+            return None
+        x, y = int(r["x0"]), int(r["y0"])
+        w, h = int(round(r["x1"])) - x, int(round(r["y1"])) - y
+        # Do tamanho da tela quase inteira é o canvas do visualizador, não a página
+        if w * h > 0.9 * r["vw"] * r["vh"]:
+            return None
+        return {"width": w, "height": h, "x": x, "y": y, "suffix": sufixo_da_caixa(w, h)}
+
+    def recorte(self, driver, layout=None) -> list:
+        """
+        crop_settings para o screenshot atual. Com `layout`, o retângulo
+        medido é reaproveitado nas próximas páginas do mesmo layout.
+        """
+        if layout is not None and layout in self._cache:
+            return [self._cache[layout]]
+        crop = self._do_dom(driver)
+        if crop is None:
+            return [RECORTE_AUTOMATICO]
+        if layout is not None:
+            self._cache[layout] = crop
+        return [crop]
+
+
+def _maior_grupo(ativos, folga: int):
+    """(início, fim) do maior trecho de posições ativas, juntando buracos de até `folga`."""
+    indices = np.flatnonzero(ativos)
+    if not indices.size:
+        return None
+    grupos = np.split(indices, np.flatnonzero(np.diff(indices) > folga) + 1)
+    grupo = max(grupos, key=lambda g: g[-1] - g[0])
+    return int(grupo[0]), int(grupo[-1]) + 1
+
+def caixa_da_pagina(img: Image.Image, tolerancia: int = 24, fracao: float = 0.1):
+    """
+    (x0, y0, x1, y1) da página no screenshot: a maior região que difere da
+    cor de fundo (mediana das bordas). None se não encontrar nada.
+    """
+    rgb = img.convert("RGB")
+    if np is None:
+        cantos = [rgb.getpixel(p) for p in ((0, 0), (rgb.width - 1, 0), (0, rgb.height - 1),
+                                            (rgb.width - 1, rgb.height - 1))]
+        fundo = max(set(cantos), key=cantos.count)
+        mascara = ImageChops.difference(rgb, Image.new("RGB", rgb.size, fundo)).convert("L")
+        return mascara.point(lambda v: 255 if v > tolerancia else 0).getbbox()
+
+    a = np.asarray(rgb, dtype=np.int16)
+    borda = np.concatenate([a[0], a[-1], a[:, 0], a[:, -1]])
+    fundo = np.median(borda, axis=0)
+    diferente = np.abs(a - fundo).max(axis=2) > tolerancia
+
+    linhas = _maior_grupo(diferente.mean(axis=1) > fracao, folga=max(2, a.shape[0] // 50))
+    if linhas is None:
+        return None
+    faixa = diferente[linhas[0]:linhas[1]]
+    colunas = _maior_grupo(faixa.mean(axis=0) > fracao, folga=max(2, a.shape[1] // 50))
+    if colunas is None:
+        return None
+    return colunas[0], linhas[0], colunas[1], linhas[1]
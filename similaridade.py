@@ -0,0 +1,230 @@
+"""
+Hashes perceptuais (dHash e pHash) das páginas salvas e um índice
+persistido em CACHE_DIR para achar páginas quase idênticas: entre lojas,
+entre semanas ou entre capturas da mesma página.
+
+Com numpy os hashes e as comparações são vetorizados; sem ele o cálculo
+roda em Python puro (mais lento, mesmo resultado).
+
+Um hash de 64 bits não enxerga a troca de um preço, então o índice só
+aponta as repetições (relatorio); nada é descartado por ser "parecido"
+com outra semana ou loja.
+"""
+import json
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from PIL import Image
+
+from pastas import CACHE_DIR, gravar_json
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Distâncias de Hamming máximas (em 64 bits) para duas páginas serem "quase idênticas"
+LIMITE_DHASH = int(os.environ.get("SIMILARIDADE_LIMITE_DHASH", "4"))
+LIMITE_PHASH = int(os.environ.get("SIMILARIDADE_LIMITE_PHASH", "6"))
+
+try:
+    _BOX = Image.Resampling.BOX
+except AttributeError:
+    _BOX = Image.BOX
+
+
+def _para_int(bits) -> int:
+    return int("".join("1" if b else "0" for b in bits), 2)
+
+def _cinza(img: Image.Image, largura: int, altura: int) -> Image.Image:
+    return img.convert("L").resize((largura, altura), _BOX)
+
+def dhash(img: Image.Image, tamanho: int = 8) -> int:
+    """Gradiente horizontal de uma miniatura (tamanho+1)x(tamanho): tamanho² bits."""
+    px = _cinza(img, tamanho + 1, tamanho)
+    if np is not None:
+        a = np.asarray(px, dtype=np.int16)
+        return _para_int((a[:, 1:] > a[:, :-1]).ravel())
+    d = list(px.getdata())
+    largura = tamanho + 1
+    return _para_int(d[r * largura + c + 1] > d[r * largura + c] for r in range(tamanho) for c in range(tamanho))
+
+def _dct(n: int, linhas: int):
+    """Primeiras `linhas` linhas da matriz da DCT-II de ordem n."""
+    return [[math.cos(math.pi * (2 * x + 1) * k / (2 * n)) for x in range(n)] for k in range(linhas)]
+
+_DCT_32 = _dct(32, 8)
+
+def phash(img: Image.Image) -> int:
+    """Sinais das frequências baixas (8x8) da DCT de uma miniatura 32x32: 64 bits."""
+    px = _cinza(img, 32, 32)
+    if np is not None:
+        d = np.array(_DCT_32)
+        coef = (d @ np.asarray(px, dtype=np.float64) @ d.T).ravel()
+        return _para_int(coef > np.median(coef[1:]))
+    a = list(px.getdata())
+    meio = [[sum(_DCT_32[k][x] * a[x * 32 + y] for x in range(32)) for y in range(32)] for k in range(8)]
+    coef = [sum(meio[k][y] * _DCT_32[j][y] for y in range(32)) for k in range(8) for j in range(8)]
+    mediana = sorted(coef[1:])[len(coef[1:]) // 2]
+    return _para_int(c > mediana for c in coef)
+
+def hashes(img: Image.Image) -> dict:
+    return {"dhash": f"{dhash(img):016x}", "phash": f"{phash(img):016x}"}
+
+def hashes_arquivo(caminho: Path) -> dict:
+    with Image.open(caminho) as img:
+        img.draft("L", (256, 256))  # JPEG decodifica já reduzido
+        return hashes(img)
+
+def distancia(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class IndicePerceptual:
+    """
+    Índice {arquivo: {"dhash", "phash", "grupo"}} de um varejista, gravado em
+    CACHE_DIR/similaridade_<nome>.json. O grupo é a pasta do arquivo
+    (a loja/encarte), usado no relatório de encartes compartilhados.
+    """
+
+    def __init__(self, nome: str):
+        self.nome = nome
+        self.caminho = CACHE_DIR / f"similaridade_{nome}.json"
+        self._lock = threading.Lock()
+        self._desta_execucao = set()
+        try:
+            dados = json.loads(self.caminho.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            dados = {}
+        # Esquece arquivos que não existem mais
+        self._entradas = {k: v for k, v in dados.items() if Path(k).exists()}
+        self._alterado = len(self._entradas) != len(dados)
+        # Com numpy: os hashes numa matriz (dhash, phash) por arquivo, na ordem de _chaves.
+        # Montada uma vez aqui; cada página nova entra numa linha, sem refazer a matriz.
+        self._chaves = []
+        self._linhas = {}
+        self._matriz = np.zeros((max(64, len(self._entradas)), 2), dtype=np.uint64) if np is not None else None
+        for chave, h in self._entradas.items():
+            self._gravar_linha(chave, h)
+
+    def adicionar(self, caminho: Path, hashes_pagina: dict) -> str:
+        """Registra a página e devolve o arquivo já indexado quase idêntico a ela (ou None)."""
+        caminho = Path(caminho).resolve()
+        parecido = self.procurar(hashes_pagina, ignorar=str(caminho))
+        with self._lock:
+            self._entradas[str(caminho)] = dict(hashes_pagina, grupo=caminho.parent.name)
+            self._gravar_linha(str(caminho), hashes_pagina)
+            self._desta_execucao.add(str(caminho))
+            self._alterado = True
+        return parecido
+
+    def _gravar_linha(self, chave: str, hashes_pagina: dict):
+        # Chamado sob o lock (ou no __init__)
+        if self._matriz is None:
+            return
+        i = self._linhas.get(chave)
+        if i is None:
+            i = self._linhas[chave] = len(self._chaves)
+            if i == len(self._matriz):
+                # Dobra a capacidade: inserir n páginas custa O(n) no total
+                self._matriz = np.concatenate([self._matriz, np.zeros_like(self._matriz)])
+            self._chaves.append(chave)
+        self._matriz[i] = (int(hashes_pagina["dhash"], 16), int(hashes_pagina["phash"], 16))
+
+    def procurar(self, hashes_pagina: dict, ignorar: str = None) -> str:
+        """Arquivo indexado mais parecido dentro dos limites, ou None."""
+        d, p = int(hashes_pagina["dhash"], 16), int(hashes_pagina["phash"], 16)
+        if self._matriz is not None:
+            with self._lock:
+                # _chaves só cresce e, ao crescer, a matriz vira um array novo: a fatia continua valendo
+                chaves = self._chaves
+                matriz = self._matriz[:len(chaves)]
+            if not len(matriz):
+                return None
+            xor = matriz ^ np.array([d, p], dtype=np.uint64)
+            bits = np.unpackbits(xor.view(np.uint8).reshape(-1, 2, 8), axis=2).sum(axis=2)
+            candidatos = np.flatnonzero((bits[:, 0] <= LIMITE_DHASH) & (bits[:, 1] <= LIMITE_PHASH))
+            ordem = candidatos[np.argsort(bits[candidatos].sum(axis=1))]
+            return next((chaves[i] for i in ordem if chaves[i] != ignorar), None)
+
+        with self._lock:
+            entradas = list(self._entradas.items())
+        melhor, menor = None, None
+        for chave, h in entradas:
+            if chave == ignorar:
+                continue
+            dd, dp = distancia(d, int(h["dhash"], 16)), distancia(p, int(h["phash"], 16))
+            if dd <= LIMITE_DHASH and dp <= LIMITE_PHASH and (menor is None or dd + dp < menor):
+                melhor, menor = chave, dd + dp
+        return melhor
+
+    def compartilhados(self) -> list:
+        """Conjuntos de grupos (lojas/encartes) desta execução com páginas quase idênticas entre si."""
+        with self._lock:
+            entradas = [(k, self._entradas[k]) for k in sorted(self._desta_execucao) if k in self._entradas]
+        # União por proximidade: páginas parecidas caem no mesmo conjunto
+        pai = list(range(len(entradas)))
+
+        def raiz(i):
+            while pai[i] != i:
+                pai[i] = pai[pai[i]]
+                i = pai[i]
+            return i
+
+        for i, (chave, h) in enumerate(entradas):
+            d, p = int(h["dhash"], 16), int(h["phash"], 16)
+            for j in range(i):
+                hj = entradas[j][1]
+                if distancia(d, int(hj["dhash"], 16)) <= LIMITE_DHASH and \
+                        distancia(p, int(hj["phash"], 16)) <= LIMITE_PHASH:
+                    pai[raiz(i)] = raiz(j)
+
+        grupos = {}
+        for i, (_, h) in enumerate(entradas):
+            grupos.setdefault(raiz(i), set()).add(h["grupo"])
+        vistos = []
+        for conjunto in grupos.values():
+            if len(conjunto) > 1 and conjunto not in vistos:
+                vistos.append(conjunto)
+        return [sorted(c) for c in vistos]
+
+    def relatorio(self):
+        compartilhados = self.compartilhados()
+        if not compartilhados:
+            return
+        print(f"\nPáginas repetidas ({self.nome}): {len(compartilhados)} conjunto(s) de pastas com o mesmo conteúdo")
+        for grupos in compartilhados:
+            print(f"  {', '.join(grupos)}")
+
+    def salvar(self):
+        with self._lock:
+            if not self._alterado:
+                return
+            # Grava sob o lock: nenhuma thread altera os dados no meio da serialização
+            gravar_json(self.caminho, self._entradas)
+            self._alterado = False
+
+
+def indexar_arquivos(indice: IndicePerceptual, caminhos, trabalhadores: int = 4):
+    """Calcula os hashes de arquivos já gravados (ex.: downloads) e registra no índice."""
+    caminhos = list(caminhos)
+    if not caminhos:
+        return
+    with ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix="hash") as pool:
+        for caminho, h in zip(caminhos, pool.map(_hashes_ou_none, caminhos)):
+            if h is None:
+                continue
+            parecido = indice.adicionar(caminho, h)
+            if parecido:
+                print(f"  {Path(caminho).name} é quase idêntica a {parecido}")
+
+def _hashes_ou_none(caminho):
+    try:
+        return hashes_arquivo(caminho)
+    except Exception as e:
+        print(f"  Não foi possível calcular o hash de {caminho}: {e}")
+        return None
@@ -0,0 +1,201 @@
+"""
+Spans de rastreamento por fase (navegar, selecionar loja, espera, descoberta,
+download, screenshot, recorte, codificação), com atributos como varejista,
+loja e página. Um span aberto dentro de outro herda os atributos dele, então
+basta abrir o span da loja uma vez para todas as fases dentro dela saberem
+de que loja são.
+
+    telemetria.iniciar("assai")
+    with telemetria.span("loja", loja="Assaí Angelim"):
+        with telemetria.span("navegar", url=url):
+            driver.get(url)
+
+No fim do processo são gravados, em TELEMETRIA_DIR (padrão
+CACHE_DIR/telemetria):
+- trace_<varejista>.json: os spans no formato Trace Event (abre no
+  Perfetto ou em chrome://tracing);
+- supermercados_<varejista>.prom: histogramas por fase no formato textfile
+  do Prometheus (para o textfile collector do node_exporter).
+
+Os spans se sobrepõem (uma espera fica dentro da seleção de loja), então os
+totais por fase não somam o tempo da execução. TELEMETRIA=0 desliga.
+"""
+import atexit
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from pastas import CACHE_DIR, gravar_atomico
+
+TELEMETRIA_ATIVA = os.environ.get("TELEMETRIA", "1") != "0"
+TELEMETRIA_DIR = Path(os.environ.get("TELEMETRIA_DIR", str(CACHE_DIR / "telemetria"))).resolve()
+# Acima disso os spans ainda entram nos histogramas, mas não no trace
+TELEMETRIA_MAX_SPANS = int(os.environ.get("TELEMETRIA_MAX_SPANS", "200000"))
+
+# Limites (le) dos histogramas, em segundos
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_lock = threading.Lock()
+_ids = itertools.count(1)
+_atual = contextvars.ContextVar("telemetria_span", default=None)
+_varejista = None
+_inicio_execucao = time.time()
+_spans = []
+# fase -> {"contagens": [por bucket], "soma", "total", "erros"}
+_histogramas = {}
+
+
+def iniciar(varejista: str):
+    """Define o varejista dos spans e grava trace e métricas quando o processo terminar."""
+    global _varejista
+    with _lock:
+        primeira = _varejista is None
+        _varejista = varejista
+    if primeira and TELEMETRIA_ATIVA:
+        atexit.register(exportar)
+
+
+def capturar() -> dict:
+    """
+    Span atual e seus atributos, para registrar depois, em outra thread ou
+    processo, uma fase que começou daqui (ex.: o download de uma página).
+    """
+    atual = _atual.get()
+    return {"pai": atual["id"], "atributos": dict(atual["atributos"])} if atual else {"pai": None, "atributos": {}}
+
+
+def _registrar(fase: str, inicio: float, segundos: float, pai, atributos: dict, erro: str = None,
+               id_span: int = None):
+    if not TELEMETRIA_ATIVA:
+        return
+    with _lock:
+        hist = _histogramas.setdefault(fase, {"contagens": [0] * len(BUCKETS), "soma": 0.0, "total": 0, "erros": 0})
+        for i, limite in enumerate(BUCKETS):
+            if segundos <= limite:
+                hist["contagens"][i] += 1
+        hist["soma"] += segundos
+        hist["total"] += 1
+        hist["erros"] += 1 if erro else 0
+        if len(_spans) < TELEMETRIA_MAX_SPANS:
+            _spans.append({"fase": fase, "id": id_span or next(_ids), "inicio": inicio, "segundos": segundos,
+                           "pai": pai, "atributos": atributos, "erro": erro,
+                           "thread": threading.current_thread().name})
+
+
+@contextmanager
+def span(fase: str, **atributos):
+    """
+    Mede o bloco como um span de `fase`. Devolve o span; atributos conhecidos
+    só no meio do bloco podem ser acrescentados em span["atributos"].
+    """
+    pai = _atual.get()
+    registro = {"id": next(_ids), "atributos": {**(pai["atributos"] if pai else {}), **atributos}}
+    token = _atual.set(registro)
+    inicio, relogio = time.time(), time.perf_counter()
+    erro = None
+    try:
+        yield registro
+    except BaseException as e:
+        erro = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _atual.reset(token)
+        _registrar(fase, inicio, time.perf_counter() - relogio, pai["id"] if pai else None,
+                   registro["atributos"], erro, registro["id"])
+
+
+def registrar_span(fase: str, segundos: float, capturado: dict = None, fim: float = None, erro: str = None,
+                   **atributos):
+    """
+    Registra uma fase medida em outro lugar (thread do motor de downloads,
+    processo do pool de imagens), pendurada no span de `capturado`.
+    """
+    capturado = capturado or capturar()
+    fim = fim or time.time()
+    _registrar(fase, fim - segundos, segundos, capturado["pai"], {**capturado["atributos"], **atributos}, erro)
+
+
+def _rotulos(**rotulos) -> str:
+    valores = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in rotulos.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(rotulos, valores)) + "}"
+
+
+def texto_prometheus() -> str:
+    varejista = _varejista or "desconhecido"
+    linhas = [
+        "# HELP supermercados_fase_segundos Duração dos spans por fase, na última execução.",
+        "# TYPE supermercados_fase_segundos histogram",
+    ]
+    with _lock:
+        histogramas = {f: dict(h, contagens=list(h["contagens"])) for f, h in sorted(_histogramas.items())}
+    for fase, hist in histogramas.items():
+        for limite, contagem in zip(BUCKETS, hist["contagens"]):
+            linhas.append(f"supermercados_fase_segundos_bucket{_rotulos(varejista=varejista, fase=fase, le=limite)} "
+                          f"{contagem}")
+        linhas.append(f"supermercados_fase_segundos_bucket{_rotulos(varejista=varejista, fase=fase, le='+Inf')} "
+                      f"{hist['total']}")
+        linhas.append(f"supermercados_fase_segundos_sum{_rotulos(varejista=varejista, fase=fase)} {hist['soma']:.6f}")
+        linhas.append(f"supermercados_fase_segundos_count{_rotulos(varejista=varejista, fase=fase)} {hist['total']}")
+    linhas += ["# HELP supermercados_fase_erros Spans que terminaram com exceção, por fase, na última execução.",
+               "# TYPE supermercados_fase_erros gauge"]
+    linhas += [f"supermercados_fase_erros{_rotulos(varejista=varejista, fase=fase)} {hist['erros']}"
+               for fase, hist in histogramas.items()]
+    linhas += ["# HELP supermercados_execucao_segundos Duração da última execução.",
+               "# TYPE supermercados_execucao_segundos gauge",
+               f"supermercados_execucao_segundos{_rotulos(varejista=varejista)} {time.time() - _inicio_execucao:.3f}",
+               "# HELP supermercados_execucao_fim_timestamp_seconds Quando a última execução terminou.",
+               "# TYPE supermercados_execucao_fim_timestamp_seconds gauge",
+               f"supermercados_execucao_fim_timestamp_seconds{_rotulos(varejista=varejista)} {time.time():.0f}"]
+    return "\n".join(linhas) + "\n"
+
+
+def trace() -> dict:
+    """Os spans no formato Trace Event (eventos completos, "ph": "X")."""
+    with _lock:
+        spans = list(_spans)
+    threads = {}
+    eventos = []
+    for s in spans:
+        tid = threads.setdefault(s["thread"], len(threads) + 1)
+        args = dict(s["atributos"], id=s["id"], pai=s["pai"])
+        if s["erro"]:
+            args["erro"] = s["erro"]
+        eventos.append({"name": s["fase"], "cat": _varejista or "", "ph": "X", "pid": os.getpid(), "tid": tid,
+                        "ts": round(s["inicio"] * 1e6), "dur": round(s["segundos"] * 1e6), "args": args})
+    eventos += [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": nome}}
+                for nome, tid in threads.items()]
+    return {"traceEvents": eventos, "displayTimeUnit": "ms",
+            "otherData": {"varejista": _varejista, "inicio": _inicio_execucao}}
+
+
+def resumo():
+    with _lock:
+        histogramas = sorted(_histogramas.items(), key=lambda i: -i[1]["soma"])
+    if not histogramas:
+        return
+    print("\nTempo por fase (spans sobrepostos):")
+    for fase, hist in histogramas:
+        print(f"  {fase:<18} {hist['total']:5d}x  total {hist['soma']:8.1f}s  "
+              f"média {hist['soma'] / hist['total']:6.2f}s  erros {hist['erros']}")
+
+
+def exportar():
+    """Grava o trace e o textfile do Prometheus (chamado no fim do processo)."""
+    if not TELEMETRIA_ATIVA or not _histogramas:
+        return
+    varejista = _varejista or "desconhecido"
+    try:
+        # Atômico: o node_exporter nunca lê um arquivo pela metade
+        gravar_atomico(TELEMETRIA_DIR / f"trace_{varejista}.json",
+                       json.dumps(trace(), ensure_ascii=False, default=str))
+        gravar_atomico(TELEMETRIA_DIR / f"supermercados_{varejista}.prom", texto_prometheus())
+    except OSError as e:
+        print(f"[telemetria] Não foi possível gravar em {TELEMETRIA_DIR}: {e}")
+        return
+    resumo()
+    print(f"[telemetria] Trace e métricas em {TELEMETRIA_DIR}")
@@ -0,0 +1,96 @@
+"""
+Os módulos leem OUTPUT_DIR e CACHE_DIR quando são importados (pastas.py):
+aponta os dois para uma pasta temporária antes de qualquer import, para os
+testes não tocarem nos encartes nem no cache de verdade.
+"""
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+_TEMPORARIO = Path(tempfile.mkdtemp(prefix="supermercados-testes-"))
+os.environ["OUTPUT_DIR"] = str(_TEMPORARIO / "Encartes")
+os.environ["CACHE_DIR"] = str(_TEMPORARIO / "cache")
+os.environ["TELEMETRIA"] = "0"
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Maior que dois blocos de downloads.TAMANHO_BLOCO, para uma queda no meio deixar algo no .part
+CONTEUDO = bytes(range(256)) * 4096
+ETAG = '"v1"'
+
+
+class _Servidor(BaseHTTPRequestHandler):
+    """
+    /arquivo: CONTEUDO com ETag, respeitando Range e If-Range.
+    /cai: manda só metade do corpo e fecha a conexão nas primeiras `quedas` vezes.
+    /status/<código>: responde <código> nas primeiras `falhas` vezes, depois /arquivo.
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        estado = self.server.estado
+        with estado["lock"]:
+            estado["pedidos"].append((self.path, dict(self.headers)))
+            vezes = estado["vezes"][self.path] = estado["vezes"].get(self.path, 0) + 1
+        if self.path.startswith("/status/"):
+            codigo = int(self.path.rsplit("/", 1)[1])
+            if vezes <= estado["falhas"]:
+                self.send_response(codigo)
+                if estado.get("retry_after"):
+                    self.send_header("Retry-After", estado["retry_after"])
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+        if self.path == "/cai" and vezes <= estado["quedas"]:
+            self.send_response(200)
+            self.send_header("ETag", ETAG)
+            self.send_header("Content-Length", str(len(CONTEUDO)))
+            self.end_headers()
+            self.wfile.write(CONTEUDO[:len(CONTEUDO) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self._arquivo()
+
+    def _arquivo(self):
+        faixa = self.headers.get("Range", "")
+        if faixa.startswith("bytes=") and self.headers.get("If-Range", ETAG) == ETAG:
+            inicio = int(faixa[len("bytes="):].rstrip("-"))
+            if inicio >= len(CONTEUDO):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(CONTEUDO)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {inicio}-{len(CONTEUDO) - 1}/{len(CONTEUDO)}")
+            corpo = CONTEUDO[inicio:]
+        else:
+            self.send_response(200)
+            corpo = CONTEUDO
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+
+@pytest.fixture
+def servidor():
+    """Servidor HTTP local (ver _Servidor). `estado` controla falhas e guarda os pedidos recebidos."""
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Servidor)
+    httpd.estado = {"lock": threading.Lock(), "pedidos": [], "vezes": {}, "falhas": 0, "quedas": 0}
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.conteudo = CONTEUDO
+    httpd.etag = ETAG
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
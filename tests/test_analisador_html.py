@@ -0,0 +1,96 @@
+import analisador_html
+
+BASE = "https://loja.exemplo/ofertas/"
+
+PAGINA = """
+<html><head><script>var x = "<a href='/falso'>";</script><style>p {}</style></head>
+<body>
+  <div class="oferta">
+    <h3>Validade: <strong>10/10/2025</strong> a 16/10/2025</h3>
+    <p>Primeira linha<br>segunda   linha
+    <p>Outro parágrafo
+  </div>
+  <a class="button-download-ofertas" href="/encartes/1.pdf">Baixar <b>PDF</b></a>
+  <a href="#topo">topo</a>
+  <a href="javascript:void(0)">nada</a>
+  <a href="galeria/2.jpg"><img src="mini.jpg" srcset="p.jpg 300w, g.jpg 1200w, m.jpg 600w"></a>
+  <script type="application/json">{"lojas": [{"nome": "Centro"}]}</script>
+  <script id="__NEXT_DATA__">{"pagina": 1}</script>
+  <script type="application/json">{quebrado</script>
+</body></html>
+"""
+
+
+def test_links_absolutos_sem_ancoras_nem_javascript():
+    links = analisador_html.links(PAGINA, BASE)
+    assert [l["href"] for l in links] == ["https://loja.exemplo/encartes/1.pdf",
+                                          "https://loja.exemplo/ofertas/galeria/2.jpg"]
+    assert links[0]["classes"] == ["button-download-ofertas"]
+    assert links[0]["texto"] == "Baixar PDF"
+    assert links[1]["img"]["src"] == "mini.jpg"
+
+
+def test_texto_sem_scripts_nem_estilos():
+    texto = analisador_html.texto(PAGINA)
+    assert "Primeira linha" in texto
+    assert "falso" not in texto and "p {}" not in texto
+
+
+def test_jsons_embutidos_ignoram_json_quebrado():
+    assert analisador_html.jsons_embutidos(PAGINA) == [{"lojas": [{"nome": "Centro"}]}, {"pagina": 1}]
+
+
+def test_textos_das_tags_como_o_selenium():
+    elementos = analisador_html.textos_das_tags(PAGINA, ("h3", "p"))
+    assert [(e["tag"], e["texto"]) for e in elementos] == [
+        ("h3", "Validade: 10/10/2025 a 16/10/2025"),
+        # <br> vira quebra de linha e o <p> seguinte fecha o anterior
+        ("p", "Primeira linha\nsegunda linha"),
+        ("p", "Outro parágrafo"),
+    ]
+    assert all(e["dentro_de"] == ["oferta"] for e in elementos)
+
+
+def test_textos_da_classe():
+    html = '<span class="elementor-button-text">Ofertas <b>de 10/10</b></span><span class="x">não</span>'
+    assert analisador_html.textos_da_classe(html, "elementor-button-text") == ["Ofertas de 10/10"]
+
+
+def test_cartoes():
+    html = """
+    <div data-testid="store-card"><div><h1>Atacadão <span>Centro</span></h1></div><a href="/lojas/centro">Ver</a></div>
+    <div data-testid="store-card"><h1>Praia</h1></div>
+    <a href="/fora-do-cartao">x</a>
+    """
+    assert analisador_html.cartoes(html, BASE, "data-testid", "store-card") == [
+        {"titulo": "Atacadão Centro", "links": ["https://loja.exemplo/lojas/centro"]},
+        {"titulo": "Praia", "links": []},
+    ]
+
+
+def test_imagem_em_tamanho_cheio():
+    link = analisador_html.links(PAGINA, BASE)[1]
+    # O href já é a imagem original
+    assert analisador_html.imagem_em_tamanho_cheio(link["attrs"], BASE, link["img"]) == \
+        "https://loja.exemplo/ofertas/galeria/2.jpg"
+    sem_href = {"href": "/post/2", "data-large_image": "/up/grande.webp"}
+    assert analisador_html.imagem_em_tamanho_cheio(sem_href, BASE, {"src": "mini.jpg"}) == \
+        "https://loja.exemplo/up/grande.webp"
+    assert analisador_html.imagem_em_tamanho_cheio({"href": "/post/2"}, BASE, link["img"]) == \
+        "https://loja.exemplo/ofertas/g.jpg"
+    assert analisador_html.imagem_em_tamanho_cheio({"href": "/post/2"}, BASE, None) is None
+
+
+def test_maior_do_srcset():
+    assert analisador_html.maior_do_srcset("a.jpg 1x, b.jpg 2x") == "b.jpg"
+    assert analisador_html.maior_do_srcset("") == ""
+
+
+def test_urls_no_texto():
+    conteudo = '{"a": "https:\\/\\/x.com\\/Flyer\\/?id=1", "b": "https://x.com/Flyer/?id=1&y=2"}'
+    assert analisador_html.urls_no_texto(conteudo, r"Flyer/\?id=") == ["https://x.com/Flyer/?id=1"]
+
+
+def test_normalizar_texto():
+    assert analisador_html.normalizar_texto("  São LUÍS ") == "sao luis"
+    assert analisador_html.normalizar_texto(None) == ""
@@ -0,0 +1,83 @@
+import os
+import threading
+
+import armazem
+from armazem import caminho_blob, hash_arquivo, publicar_arquivo, publicar_bytes, vincular
+
+
+def _temporarios(pasta):
+    return [p for p in pasta.rglob(".*") if p.name.endswith((".link", ".tmp"))]
+
+
+def test_mesmo_conteudo_vira_um_blob_so(tmp_path):
+    a = tmp_path / "loja_a" / "pag1.jpg"
+    b = tmp_path / "loja_b" / "pag1.jpg"
+    blob_a = publicar_bytes(b"mesma pagina", a)
+    blob_b = publicar_bytes(b"mesma pagina", b)
+    assert blob_a == blob_b
+    assert os.path.samefile(a, b)
+    assert os.stat(blob_a).st_nlink >= 3
+    assert oct(os.stat(blob_a).st_mode & 0o777) == oct(0o644)
+
+
+def test_conteudo_diferente_vira_outro_blob(tmp_path):
+    assert publicar_bytes(b"semana 1", tmp_path / "a.jpg") != publicar_bytes(b"semana 2", tmp_path / "b.jpg")
+
+
+def test_publicar_arquivo_descarta_a_origem_repetida(tmp_path):
+    primeiro = tmp_path / "um.part"
+    primeiro.write_bytes(b"pdf repetido")
+    blob = publicar_arquivo(primeiro, tmp_path / "loja_a" / "encarte.pdf")
+    assert blob == caminho_blob(hash_arquivo(blob), ".pdf")
+    assert not primeiro.exists()
+
+    segundo = tmp_path / "dois.part"
+    segundo.write_bytes(b"pdf repetido")
+    assert publicar_arquivo(segundo, tmp_path / "loja_b" / "encarte.pdf") == blob
+    assert not segundo.exists()
+    assert os.path.samefile(tmp_path / "loja_a" / "encarte.pdf", tmp_path / "loja_b" / "encarte.pdf")
+
+
+def test_vincular_substitui_o_destino(tmp_path):
+    blob = publicar_bytes(b"novo", tmp_path / "x.jpg")
+    destino = tmp_path / "loja" / "pag1.jpg"
+    destino.parent.mkdir()
+    destino.write_bytes(b"antigo")
+    vincular(blob, destino)
+    assert destino.read_bytes() == b"novo"
+    assert os.path.samefile(blob, destino)
+
+
+def test_vincular_copia_sem_hardlink(tmp_path, monkeypatch):
+    blob = publicar_bytes(b"outro disco", tmp_path / "x.jpg")
+
+    def sem_link(*args):
+        raise OSError("hardlink não suportado")
+
+    monkeypatch.setattr(armazem.os, "link", sem_link)
+    destino = tmp_path / "loja" / "pag1.jpg"
+    vincular(blob, destino)
+    assert destino.read_bytes() == b"outro disco"
+    assert not os.path.samefile(blob, destino)
+    assert not _temporarios(destino.parent)
+
+
+def test_vincular_concorrente_no_mesmo_destino(tmp_path):
+    blobs = [publicar_bytes(f"jornal {i}".encode(), tmp_path / f"origem_{i}.jpg") for i in range(4)]
+    destino = tmp_path / "loja" / "pag1.jpg"
+    erros = []
+
+    def ligar(blob):
+        try:
+            vincular(blob, destino)
+        except Exception as e:
+            erros.append(e)
+
+    threads = [threading.Thread(target=ligar, args=(blobs[i % len(blobs)],)) for i in range(64)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not erros
+    assert any(os.path.samefile(blob, destino) for blob in blobs)
+    assert not _temporarios(destino.parent)
@@ -0,0 +1,96 @@
+import os
+import time
+from concurrent.futures import Future
+
+import pytest
+
+import checkpoint
+from checkpoint import Checkpoint
+
+
+@pytest.fixture
+def varejista(request):
+    """Um nome por teste: cada um tem seu próprio arquivo de checkpoint."""
+    nome = f"teste_{request.node.name}"
+    yield nome
+    (checkpoint.CACHE_DIR / f"checkpoint_{nome}.json").unlink(missing_ok=True)
+
+
+def test_unidades_concluidas_sao_retomadas(varejista):
+    cp = Checkpoint(varejista)
+    assert not cp.retomando
+    cp.marcar("loja 1")
+    cp.marcar("loja 2", ok=False, erro="timeout")
+
+    retomado = Checkpoint(varejista)
+    assert retomado.retomando
+    assert retomado.concluido("loja 1")
+    assert not retomado.concluido("loja 2")
+    assert not retomado.concluido("loja 3")
+
+
+def test_checkpoint_velho_e_ignorado(varejista, monkeypatch):
+    Checkpoint(varejista).marcar("loja 1")
+    velho = time.time() - 13 * 3600
+    os.utime(checkpoint.CACHE_DIR / f"checkpoint_{varejista}.json", (velho, velho))
+    monkeypatch.setattr(checkpoint, "CHECKPOINT_HORAS", 12)
+
+    retomado = Checkpoint(varejista)
+    assert not retomado.retomando
+    assert not retomado.concluido("loja 1")
+
+
+def test_finalizar_apaga_sem_pendencias(varejista):
+    cp = Checkpoint(varejista)
+    cp.marcar("loja 1")
+    cp.marcar("loja 2")
+    cp.finalizar(["loja 1", "loja 2"])
+    assert not cp.caminho.exists()
+
+
+@pytest.mark.parametrize("marcadas", [{"loja 1": True, "loja 2": False}, {"loja 1": True}])
+def test_finalizar_mantem_com_pendencias(varejista, marcadas, capsys):
+    cp = Checkpoint(varejista)
+    for chave, ok in marcadas.items():
+        cp.marcar(chave, ok=ok, erro=None if ok else "erro")
+    cp.finalizar(["loja 1", "loja 2"])
+    assert cp.caminho.exists()
+    assert "loja 2" in capsys.readouterr().out
+    assert Checkpoint(varejista).concluido("loja 1")
+
+
+def test_arquivo_pronto_so_com_a_mesma_url(varejista, tmp_path):
+    arquivo = tmp_path / "encarte_1.pdf"
+    arquivo.write_bytes(b"%PDF")
+    # Arquivo de uma semana anterior na mesma pasta: não conta
+    assert not Checkpoint(varejista).arquivo_pronto("https://x/semana2.pdf", arquivo)
+
+    Checkpoint(varejista).marcar_arquivo("https://x/semana2.pdf", arquivo)
+    retomado = Checkpoint(varejista)
+    assert retomado.retomando
+    assert retomado.arquivo_pronto("https://x/semana2.pdf", arquivo)
+    assert not retomado.arquivo_pronto("https://x/semana3.pdf", arquivo)
+    arquivo.unlink()
+    assert not retomado.arquivo_pronto("https://x/semana2.pdf", arquivo)
+
+
+def test_marcar_quando_concluir(varejista):
+    cp = Checkpoint(varejista)
+    futuros = [Future(), Future()]
+    cp.marcar_quando_concluir("loja 1", futuros)
+    futuros[0].set_result("a.jpg")
+    assert not cp.concluido("loja 1")
+    futuros[1].set_result("b.jpg")
+    assert cp.concluido("loja 1")
+
+    falhou = [Future()]
+    cp.marcar_quando_concluir("loja 2", falhou)
+    falhou[0].set_result(None)
+    assert not cp.concluido("loja 2")
+
+
+def test_desligado_nao_grava(varejista, monkeypatch):
+    monkeypatch.setattr(checkpoint, "CHECKPOINT_ATIVO", False)
+    cp = Checkpoint(varejista)
+    cp.marcar("loja 1")
+    assert not cp.caminho.exists()
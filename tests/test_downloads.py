@@ -0,0 +1,157 @@
+import pytest
+import requests
+
+import downloads
+from downloads import DownloadIncompleto, MotorDownloads, baixar_arquivo, espera_para_nova_tentativa, nova_sessao
+
+
+@pytest.fixture
+def sem_backoff(monkeypatch):
+    monkeypatch.setattr(downloads, "BACKOFF_BASE", 0.01)
+
+
+@pytest.fixture
+def motor(sem_backoff):
+    motor = MotorDownloads(simultaneos=2, por_host=2, taxa_por_host=0, tentativas=3)
+    yield motor
+    motor.fechar()
+
+
+def _parcial(destino):
+    return destino.with_name(destino.name + ".part")
+
+
+def test_baixa_inteiro(servidor, tmp_path):
+    destino = tmp_path / "encarte.pdf"
+    assert baixar_arquivo(nova_sessao(), servidor.url + "/arquivo", destino) == 200
+    assert destino.read_bytes() == servidor.conteudo
+    assert not _parcial(destino).exists()
+    assert not destino.with_name("encarte.pdf.part.validador").exists()
+
+
+def test_retoma_com_range(servidor, tmp_path):
+    destino = tmp_path / "encarte.pdf"
+    metade = len(servidor.conteudo) // 3
+    _parcial(destino).write_bytes(servidor.conteudo[:metade])
+    _parcial(destino).with_name("encarte.pdf.part.validador").write_text(servidor.etag)
+
+    assert baixar_arquivo(nova_sessao(), servidor.url + "/arquivo", destino) == 206
+    assert destino.read_bytes() == servidor.conteudo
+    _, cabecalhos = servidor.estado["pedidos"][-1]
+    assert cabecalhos["Range"] == f"bytes={metade}-"
+
+
+def test_parcial_de_outra_versao_recomeca(servidor, tmp_path):
+    destino = tmp_path / "encarte.pdf"
+    _parcial(destino).write_bytes(b"versao antiga")
+    _parcial(destino).with_name("encarte.pdf.part.validador").write_text('"v0"')
+
+    # If-Range com outro ETag: o servidor manda o arquivo inteiro
+    assert baixar_arquivo(nova_sessao(), servidor.url + "/arquivo", destino) == 200
+    assert destino.read_bytes() == servidor.conteudo
+
+
+def test_parcial_ja_completo(servidor, tmp_path):
+    destino = tmp_path / "encarte.pdf"
+    _parcial(destino).write_bytes(servidor.conteudo)
+    _parcial(destino).with_name("encarte.pdf.part.validador").write_text(servidor.etag)
+
+    assert baixar_arquivo(nova_sessao(), servidor.url + "/arquivo", destino) == 416
+    assert destino.read_bytes() == servidor.conteudo
+
+
+def test_conexao_caida_continua_de_onde_parou(servidor, tmp_path):
+    servidor.estado["quedas"] = 1
+    destino = tmp_path / "encarte.pdf"
+    assert baixar_arquivo(nova_sessao(), servidor.url + "/cai", destino, tentativas=2) == 206
+    assert destino.read_bytes() == servidor.conteudo
+    # Retoma do último bloco gravado antes da queda
+    _, cabecalhos = servidor.estado["pedidos"][-1]
+    assert 0 < int(cabecalhos["Range"][len("bytes="):].rstrip("-")) <= len(servidor.conteudo) // 2
+
+
+def test_sem_tentativas_o_destino_nao_aparece(servidor, tmp_path):
+    servidor.estado["quedas"] = 1
+    destino = tmp_path / "encarte.pdf"
+    with pytest.raises((DownloadIncompleto, requests.RequestException)):
+        baixar_arquivo(nova_sessao(), servidor.url + "/cai", destino, tentativas=1)
+    assert not destino.exists()
+    assert _parcial(destino).exists()
+
+
+class _Resposta:
+    def __init__(self, status, headers=None):
+        self.status_code = status
+        self.headers = headers or {}
+
+
+def _erro_http(status, headers=None):
+    return requests.HTTPError(response=_Resposta(status, headers))
+
+
+@pytest.mark.parametrize("erro", [
+    _erro_http(500), _erro_http(503), _erro_http(429),
+    requests.Timeout(), requests.ConnectionError(), DownloadIncompleto("metade"),
+])
+def test_erros_transitorios_sao_repetidos(erro, sem_backoff):
+    assert espera_para_nova_tentativa(erro, 1) is not None
+
+
+@pytest.mark.parametrize("erro", [_erro_http(404), _erro_http(403), ValueError("outro")])
+def test_erros_definitivos_nao_sao_repetidos(erro):
+    assert espera_para_nova_tentativa(erro, 1) is None
+
+
+def test_backoff_cresce_e_respeita_o_maximo(monkeypatch):
+    monkeypatch.setattr(downloads.random, "uniform", lambda a, b: b)
+    assert espera_para_nova_tentativa(requests.Timeout(), 1) == downloads.BACKOFF_BASE
+    assert espera_para_nova_tentativa(requests.Timeout(), 3) == downloads.BACKOFF_BASE * 4
+    assert espera_para_nova_tentativa(requests.Timeout(), 50) == downloads.BACKOFF_MAXIMO
+
+
+def test_retry_after(monkeypatch):
+    monkeypatch.setattr(downloads.random, "uniform", lambda a, b: 0)
+    assert espera_para_nova_tentativa(_erro_http(503, {"Retry-After": "7"}), 1) == 7
+
+
+def test_motor_repete_erro_transitorio(servidor, motor, tmp_path):
+    servidor.estado["falhas"] = 2
+    destino = tmp_path / "encarte.pdf"
+    registro = motor.enviar(servidor.url + "/status/503", destino).result(timeout=30)
+    assert registro["ok"]
+    assert registro["tentativas"] == 3
+    assert registro["status"] == 200
+    assert registro["bytes"] == len(servidor.conteudo)
+    assert destino.read_bytes() == servidor.conteudo
+
+
+def test_motor_desiste_de_erro_definitivo(servidor, motor, tmp_path):
+    servidor.estado["falhas"] = 1
+    registro = motor.enviar(servidor.url + "/status/404", tmp_path / "encarte.pdf").result(timeout=30)
+    assert not registro["ok"]
+    assert registro["tentativas"] == 1
+    assert registro["status"] == 404
+    assert servidor.estado["vezes"]["/status/404"] == 1
+
+
+def test_motor_para_no_limite_de_tentativas(servidor, motor, tmp_path):
+    servidor.estado["falhas"] = 10
+    registro = motor.enviar(servidor.url + "/status/500", tmp_path / "encarte.pdf").result(timeout=30)
+    assert not registro["ok"]
+    assert registro["tentativas"] == motor.tentativas
+    assert registro["status"] == 500
+
+
+def test_motor_registra_206_da_retomada(servidor, motor, tmp_path):
+    servidor.estado["quedas"] = 1
+    registro = motor.enviar(servidor.url + "/cai", tmp_path / "encarte.pdf").result(timeout=30)
+    assert registro["ok"]
+    assert registro["tentativas"] == 2
+    assert registro["status"] == 206
+
+
+def test_baixar_todos_mantem_a_ordem(servidor, motor, tmp_path):
+    itens = [(servidor.url + f"/arquivo?{i}", tmp_path / f"encarte_{i}.pdf") for i in range(5)]
+    registros = motor.baixar_todos(itens)
+    assert [r["destino"] for r in registros] == [d for _, d in itens]
+    assert all(r["ok"] for r in registros)
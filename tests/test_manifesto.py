@@ -0,0 +1,74 @@
+from datetime import date
+
+import pytest
+
+import manifesto as modulo
+from manifesto import Manifesto, normalizar_validade
+
+HOJE = date(2025, 10, 12)
+
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("Ofertas válidas de 10/10 a 16/10/2025", ("2025-10-10", "2025-10-16")),
+    ("Validade__10_10_2025_a_16_10_2025", ("2025-10-10", "2025-10-16")),
+    ("Ofertas_validas_de_10_10_a_16_10", ("2025-10-10", "2025-10-16")),
+    ("10/10 - 16/10", ("2025-10-10", "2025-10-16")),
+    ("10 de outubro até 16 de outubro", ("2025-10-10", "2025-10-16")),
+    ("de 28/12 a 03/01/2026", ("2025-12-28", "2026-01-03")),
+    ("Validade: 16/10/2025", ("2025-10-16", "2025-10-16")),
+    ("Válido até 19/10", (None, "2025-10-19")),
+])
+def test_validade_com_datas(texto, esperado):
+    inicio, fim = esperado
+    assert normalizar_validade(texto, HOJE) == {"inicio": inicio, "fim": fim}
+
+
+@pytest.mark.parametrize("texto", ["Loja 24/7", "Jornal 1/2", "Encarte 2/3 da semana", "sem_data", ""])
+def test_numeros_que_nao_sao_validade(texto):
+    assert normalizar_validade(texto, HOJE) is None
+
+
+@pytest.mark.parametrize("texto", [
+    "Loja 24/7 - ofertas de 10/10 a 16/10",
+    "Jornal 1/2 - ofertas de 10/10 a 16/10",
+])
+def test_periodo_ao_lado_de_outros_numeros(texto):
+    assert normalizar_validade(texto, HOJE) == {"inicio": "2025-10-10", "fim": "2025-10-16"}
+
+
+def test_so_o_fim_ao_lado_de_outros_numeros():
+    assert normalizar_validade("Jornal 1/2 - válido até 19/10", HOJE) == {"inicio": None, "fim": "2025-10-19"}
+
+
+def test_par_com_fim_antes_do_inicio_nao_e_periodo():
+    assert normalizar_validade("16/10/2025 a 10/10/2025", HOJE) is None
+
+
+def test_manifesto_pula_so_com_mesma_validade_urls_e_arquivos(tmp_path):
+    arquivo = tmp_path / "encarte_1.pdf"
+    arquivo.write_bytes(b"%PDF")
+    manifesto = Manifesto("teste_inalterado")
+    manifesto.registrar("loja", "Validade 10/10 a 16/10", ["u2", "u1"], [arquivo])
+
+    # A mesma validade escrita de outro jeito (nome de pasta) e as URLs em outra ordem
+    assert manifesto.inalterado("loja", "Validade__10_10_a_16_10", ["u1", "u2"])
+    assert not manifesto.inalterado("loja", "Validade 17/10 a 23/10", ["u1", "u2"])
+    assert not manifesto.inalterado("loja", "Validade 10/10 a 16/10", ["u1", "u3"])
+    arquivo.unlink()
+    assert not manifesto.inalterado("loja", "Validade 10/10 a 16/10", ["u1", "u2"])
+
+
+def test_manifesto_salvo_e_lido_de_novo():
+    manifesto = Manifesto("teste_salvar")
+    manifesto.registrar("loja", "Loja 24/7", ["u1"], [])
+    manifesto.salvar()
+    assert Manifesto("teste_salvar")._dados["loja"]["validade"] == {"texto": "Loja 24/7"}
+
+
+def test_tem_registro(monkeypatch):
+    manifesto = Manifesto("teste_registro")
+    assert not manifesto.tem_registro("loja")
+    manifesto.registrar("loja", "Validade 10/10 a 16/10", ["u1"], [])
+    assert manifesto.tem_registro("loja")
+    monkeypatch.setattr(modulo, "MANIFESTO_ATIVO", False)
+    assert not manifesto.tem_registro("loja")
@@ -0,0 +1,78 @@
+import random
+
+import pytest
+from PIL import Image, ImageDraw
+
+import similaridade
+from similaridade import IndicePerceptual, distancia, hashes
+
+
+def _pagina(semente: int) -> Image.Image:
+    aleatorio = random.Random(semente)
+    img = Image.new("RGB", (200, 280), "white")
+    desenho = ImageDraw.Draw(img)
+    for _ in range(12):
+        x, y = aleatorio.randrange(180), aleatorio.randrange(260)
+        desenho.rectangle((x, y, x + 40, y + 30), fill=tuple(aleatorio.randrange(256) for _ in range(3)))
+    return img
+
+
+def _hash(d: int, p: int) -> dict:
+    return {"dhash": f"{d:016x}", "phash": f"{p:016x}"}
+
+
+@pytest.fixture(params=["numpy", "python"])
+def indice(request, monkeypatch):
+    if request.param == "python":
+        monkeypatch.setattr(similaridade, "np", None)
+    elif similaridade.np is None:
+        pytest.skip("numpy não instalado")
+    return IndicePerceptual(f"teste_{request.node.name}")
+
+
+def test_mesma_imagem_mesmos_hashes():
+    assert hashes(_pagina(1)) == hashes(_pagina(1).resize((400, 560)))
+    a, b = hashes(_pagina(1)), hashes(_pagina(2))
+    assert distancia(int(a["dhash"], 16), int(b["dhash"], 16)) > similaridade.LIMITE_DHASH
+
+
+def test_procura_o_mais_parecido(indice, tmp_path):
+    loja_a, loja_b = tmp_path / "loja_a", tmp_path / "loja_b"
+    assert indice.adicionar(loja_a / "pag1.png", _hash(0, 0)) is None
+    assert indice.adicionar(loja_a / "pag2.png", _hash(0xFFFF, 0xFFFF)) is None
+    # A 4 bits de pag2 e longe de pag1
+    assert indice.adicionar(loja_b / "pag1.png", _hash(0xFFF0, 0xFFFF)) == str((loja_a / "pag2.png").resolve())
+    assert indice.procurar(_hash(0b1, 0)) == str((loja_a / "pag1.png").resolve())
+    assert indice.procurar(_hash(0xFFFFFFFF00000000, 0xFFFFFFFF00000000)) is None
+
+
+def test_muitas_paginas(indice, tmp_path):
+    aleatorio = random.Random(7)
+    paginas = [_hash(aleatorio.getrandbits(64), aleatorio.getrandbits(64)) for _ in range(300)]
+    for i, h in enumerate(paginas):
+        indice.adicionar(tmp_path / f"loja_{i % 3}" / f"pag{i}.png", h)
+    for i in (0, 150, 299):
+        assert indice.procurar(paginas[i]) == str((tmp_path / f"loja_{i % 3}" / f"pag{i}.png").resolve())
+
+
+def test_readicionar_atualiza_a_linha(indice, tmp_path):
+    caminho = tmp_path / "loja" / "pag1.png"
+    indice.adicionar(caminho, _hash(0, 0))
+    indice.adicionar(caminho, _hash(2 ** 64 - 1, 2 ** 64 - 1))
+    assert indice.procurar(_hash(0, 0)) is None
+    assert indice.procurar(_hash(2 ** 64 - 1, 2 ** 64 - 1)) == str(caminho.resolve())
+
+
+def test_salvo_e_carregado(tmp_path):
+    caminho = tmp_path / "loja" / "pag1.png"
+    caminho.parent.mkdir()
+    _pagina(3).save(caminho)
+    indice = IndicePerceptual("teste_salvo")
+    indice.adicionar(caminho, similaridade.hashes_arquivo(caminho))
+    indice.salvar()
+
+    carregado = IndicePerceptual("teste_salvo")
+    assert carregado.procurar(similaridade.hashes_arquivo(caminho)) == str(caminho.resolve())
+    caminho.unlink()
+    # Arquivos que sumiram do disco saem do índice
+    assert IndicePerceptual("teste_salvo").procurar(hashes(_pagina(3))) is None